@@ -1,4 +1,5 @@
 import argparse
+import os
 import sys
 from pathlib import Path
 from typing import Tuple
@@ -85,6 +86,19 @@ def parse_args() -> Tuple[str]:
         default=None,
         help="Use the training dataset to build a dspy optimized module",
     )
+    parser.add_argument(
+        "--workers",
+        "-W",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of processes which execute the sqls of the execution accuracy metric",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60,
+        help="Seconds after which the execution of a single case is killed and scored 0",
+    )
     return parser.parse_args()
 
 
@@ -95,11 +109,27 @@ class Evaluator:
         self._metrics = metrics
         self._failed_count = 0
         self._post_metrics = kwargs.get("post_metrics", [])
+        self._workers = kwargs.get("workers")
+        self._timeout = kwargs.get("timeout", 60)
 
     def eval(self, meta: dict, predictions: list) -> None:
+        test_cases = []
         for prediction in predictions:
             try:
-                test_case = LLMTestCase(**formatter(prediction, meta))
+                test_cases.append(LLMTestCase(**formatter(prediction, meta)))
+            except Exception:
+                self._failed_count += 1
+                traceback.print_exc()
+
+        # the metrics which execute sqls score all the test cases ahead in parallel
+        for metric in self._metrics:
+            if hasattr(metric, "prefetch"):
+                metric.prefetch(
+                    test_cases, workers=self._workers, timeout=self._timeout
+                )
+
+        for test_case in test_cases:
+            try:
                 result = evaluate(
                     [test_case], self._metrics, ignore_errors=True
                 ).test_results[0]
@@ -176,7 +206,7 @@ if __name__ == "__main__":
         meta["pipeline"], dataset, pipe_components, args.semantics, settings
     )
 
-    evaluator = Evaluator(**metrics)
+    evaluator = Evaluator(**metrics, workers=args.workers, timeout=args.timeout)
     evaluator.eval(meta, predictions)
     # if args.training_dataset:
     #     # todo: for now comment dspy related code
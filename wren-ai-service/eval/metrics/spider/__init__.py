@@ -1,12 +1,11 @@
 import asyncio
 import itertools
 import os
-import random
 import re
 import sqlite3
 from collections import defaultdict
 from itertools import chain, product
-from typing import Any, Iterator, List, Set, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Set, Tuple
 
 import sqlparse
 import tqdm
@@ -799,21 +798,18 @@ def get_cursor_from_path(sqlite_path: str):
     return cursor
 
 
-async def exec_on_db_(sqlite_path: str, query: str) -> Tuple[str, Any]:
-    query = replace_cur_year(query)
-    cursor = get_cursor_from_path(sqlite_path)
+def execute_on_db(cursor: sqlite3.Cursor, query: str) -> Tuple[str, Any]:
     try:
-        cursor.execute(query)
-        result = cursor.fetchall()
-        cursor.close()
-        cursor.connection.close()
-        return "result", result
+        cursor.execute(replace_cur_year(query))
+        return "result", cursor.fetchall()
     except Exception as e:
-        cursor.close()
-        cursor.connection.close()
         return "exception", e
 
 
+async def exec_on_db_(sqlite_path: str, query: str) -> Tuple[str, Any]:
+    return _execute_on_path(sqlite_path, query)
+
+
 TIMEOUT = 60
 
 
@@ -850,21 +846,86 @@ def quick_rej(result1: List[Tuple], result2: List[Tuple], order_matters: bool) -
         return set(s1) == set(s2)
 
 
-def get_constraint_permutation(tab1_sets_by_columns: List[Set], result2: List[Tuple]):
-    num_cols = len(result2[0])
-    perm_constraints = [{i for i in range(num_cols)} for _ in range(num_cols)]
-    if num_cols <= 3:
-        return product(*perm_constraints)
+def column_fingerprint(values: Tuple, order_matters: bool) -> int:
+    # a hash of the values of a column which a column permutation leaves unchanged:
+    # of the sequence if the order of the rows matters, of the multiset otherwise.
+    # columns with colliding hashes are only permuted with each other, and the rows
+    # are compared in the end anyway
+    if order_matters:
+        return hash(values)
+    return sum(map(hash, values))
 
-    # we sample 20 rows and constrain the space of permutations
-    for _ in range(20):
-        random_tab2_row = random.choice(result2)
 
-        for tab1_col in range(num_cols):
-            for tab2_col in set(perm_constraints[tab1_col]):
-                if random_tab2_row[tab2_col] not in tab1_sets_by_columns[tab1_col]:
-                    perm_constraints[tab1_col].remove(tab2_col)
-    return product(*perm_constraints)
+def group_columns(keys: List[Any]) -> Dict[Any, List[int]]:
+    groups = defaultdict(list)
+    for i, key in enumerate(keys):
+        groups[key].append(i)
+    return groups
+
+
+def get_constraint_permutation(
+    result1: List[Tuple], result2: List[Tuple], order_matters: bool
+) -> Iterator[Tuple]:
+    """
+    The column permutations of result2 which may make it equal to result1. A column
+    of result1 can only be matched with a column of result2 holding the same values,
+    so the columns are grouped by the fingerprints of their values and only the
+    columns within an ambiguous group, i.e. of several columns with the same values,
+    are permuted.
+    """
+    columns1, columns2 = list(zip(*result1)), list(zip(*result2))
+    keys1 = [column_fingerprint(column, order_matters) for column in columns1]
+    keys2 = [column_fingerprint(column, order_matters) for column in columns2]
+    groups1, groups2 = group_columns(keys1), group_columns(keys2)
+    if any(len(groups2.get(key, [])) != len(group) for key, group in groups1.items()):
+        return iter([])
+
+    ambiguous = [key for key, group in groups1.items() if len(group) > 1]
+    if ambiguous and not order_matters:
+        # the unambiguous columns pair up the values of the rows: the columns of an
+        # ambiguous group are refined by their values next to the unambiguous ones
+        anchors = [key for key, group in groups1.items() if len(group) == 1]
+        anchor1 = list(zip(*[columns1[groups1[key][0]] for key in anchors]))
+        anchor2 = list(zip(*[columns2[groups2[key][0]] for key in anchors]))
+        if anchors:
+            for key in ambiguous:
+                for i in groups1[key]:
+                    keys1[i] = (
+                        key,
+                        column_fingerprint(tuple(zip(anchor1, columns1[i])), False),
+                    )
+                for i in groups2[key]:
+                    keys2[i] = (
+                        key,
+                        column_fingerprint(tuple(zip(anchor2, columns2[i])), False),
+                    )
+            groups1 = group_columns(keys1)
+            groups2 = group_columns(keys2)
+            if any(
+                len(groups2.get(key, [])) != len(group)
+                for key, group in groups1.items()
+            ):
+                return iter([])
+
+    keys = list(groups1)
+    # columns with the same sequence of values are interchangeable when the order of
+    # the rows matters, so any assignment within a group is as good as another
+    candidates = [
+        [tuple(groups2[key])]
+        if order_matters or len(groups1[key]) == 1
+        else itertools.permutations(groups2[key])
+        for key in keys
+    ]
+
+    def permutations() -> Iterator[Tuple]:
+        for assignment in product(*candidates):
+            perm = [0] * len(columns1)
+            for key, columns in zip(keys, assignment):
+                for i, j in zip(groups1[key], columns):
+                    perm[i] = j
+            yield tuple(perm)
+
+    return permutations()
 
 
 # return whether two bag of relations are equivalent
@@ -906,14 +967,9 @@ def result_eq(result1: List[Tuple], result2: List[Tuple], order_matters: bool) -
     # s.t. result_1 is the same as result_2
     # we return true if we can find such column & row permutations
     # and false if we cannot
-    tab1_sets_by_columns = [{row[i] for row in result1} for i in range(num_cols)]
-
-    # on a high level, we enumerate all possible column permutations that might make result_1 == result_2
-    # we decrease the size of the column permutation space by the function get_constraint_permutation
-    # if one of the permutation make result_1, result_2 equivalent, then they are equivalent
-    for perm in get_constraint_permutation(tab1_sets_by_columns, result2):
-        if len(perm) != len(set(perm)):
-            continue
+    # the columns are matched by their values first, so that only the permutations
+    # of the columns with the same values are enumerated, see get_constraint_permutation
+    for perm in get_constraint_permutation(result1, result2, order_matters):
         if num_cols == 1:
             result2_perm = result2
         else:
@@ -921,12 +977,8 @@ def result_eq(result1: List[Tuple], result2: List[Tuple], order_matters: bool) -
         if order_matters:
             if result1 == result2_perm:
                 return True
-        else:
-            # in fact the first condition must hold if the second condition holds
-            # but the first is way more efficient implementation-wise
-            # and we use it to quickly reject impossible candidates
-            if set(result1) == set(result2_perm) and multiset_eq(result1, result2_perm):
-                return True
+        elif multiset_eq(result1, result2_perm):
+            return True
     return False
 
 
@@ -937,14 +989,21 @@ def result_eq(result1: List[Tuple], result2: List[Tuple], order_matters: bool) -
 # 0 if denotationally equivalent
 # 1 otherwise
 # the meaning of each auxillary argument can be seen in the parser definition in evaluation.py
-async def eval_exec_match(
+def exec_match(
     db: str,
     p_str: str,
     g_str: str,
     plug_value: bool = False,
     keep_distinct: bool = False,
     progress_bar_for_each_datapoint: bool = False,
+    execute: Callable[[str, str], Tuple[str, Any]] = None,
+    execute_gold: Callable[[str, str], Tuple[str, Any]] = None,
 ) -> int:
+    # `execute(db_path, query)` runs a query, e.g. on a pooled connection, and
+    # `execute_gold` runs the gold query, e.g. through a result cache
+    execute = execute or _execute_on_path
+    execute_gold = execute_gold or execute
+
     # post-process the prediction.
     # e.g. removing spaces between ">" and "="
     p_str, g_str = postprocess(p_str), postprocess(g_str)
@@ -987,8 +1046,8 @@ async def eval_exec_match(
             ranger = db_paths
 
         for db_path in ranger:
-            g_flag, g_denotation = await exec_on_db(db_path, g_str)
-            p_flag, p_denotation = await exec_on_db(db_path, pred)
+            g_flag, g_denotation = execute_gold(db_path, g_str)
+            p_flag, p_denotation = execute(db_path, pred)
 
             # we should expect the gold to be succesfully executed on the database
             assert g_flag != "exception", (
@@ -1011,3 +1070,30 @@ async def eval_exec_match(
 
     # none of the predictions passed
     return 0
+
+
+def _execute_on_path(sqlite_path: str, query: str) -> Tuple[str, Any]:
+    cursor = get_cursor_from_path(sqlite_path)
+    try:
+        return execute_on_db(cursor, query)
+    finally:
+        cursor.close()
+        cursor.connection.close()
+
+
+async def eval_exec_match(
+    db: str,
+    p_str: str,
+    g_str: str,
+    plug_value: bool = False,
+    keep_distinct: bool = False,
+    progress_bar_for_each_datapoint: bool = False,
+) -> int:
+    return exec_match(
+        db,
+        p_str,
+        g_str,
+        plug_value=plug_value,
+        keep_distinct=keep_distinct,
+        progress_bar_for_each_datapoint=progress_bar_for_each_datapoint,
+    )
@@ -1,21 +1,60 @@
 import asyncio
 import os
+from typing import Dict, List, Optional, Tuple
 
 from deepeval.metrics import BaseMetric
 from deepeval.test_case import LLMTestCase
 
 from eval.metrics.spider import eval_exec_match
+from eval.metrics.spider.parallel import TIMEOUT, ExecMatchPool
 
 
 class ExecutionAccuracy(BaseMetric):
     def __init__(
         self,
         db_dir: str = "./tools/dev/etc/spider1.0/database",
+        gold_cache_path: Optional[str] = "./outputs/cache/spider_gold_results.db",
     ):
         self.threshold = 0
         self.score = 0
 
         self.db_dir = db_dir
+        self.gold_cache_path = gold_cache_path
+        self._scores: Dict[Tuple[str, str, str], int] = {}
+
+    def _case(self, test_case: LLMTestCase) -> Tuple[str, str, str]:
+        db_name = test_case.additional_metadata["catalog"]
+        return (
+            os.path.join(self.db_dir, db_name, db_name + ".sqlite"),
+            test_case.actual_output,
+            test_case.expected_output,
+        )
+
+    def prefetch(
+        self,
+        test_cases: List[LLMTestCase],
+        workers: Optional[int] = None,
+        timeout: float = TIMEOUT,
+    ) -> None:
+        """
+        Scores the test cases ahead of `measure` in a pool of worker processes, with a
+        per case timeout, so measuring them only looks the scores up.
+        """
+        cases = list(
+            {
+                self._case(test_case)
+                for test_case in test_cases
+                if test_case.additional_metadata["enable_spider_metrics"]
+            }
+            - self._scores.keys()
+        )
+        if not cases:
+            return
+
+        pool = ExecMatchPool(workers, timeout, self.gold_cache_path)
+        self._scores.update(zip(cases, pool.run(cases)))
+        for index, error in pool.errors.items():
+            print(f"ExecutionAccuracy failed for {cases[index][1]!r}: {error}")
 
     def measure(self, test_case: LLMTestCase):
         return asyncio.run(self.a_measure(test_case))
@@ -25,14 +64,12 @@ class ExecutionAccuracy(BaseMetric):
             self.success = True
             return 0
 
-        db_name = test_case.additional_metadata["catalog"]
-        db = os.path.join(self.db_dir, db_name, db_name + ".sqlite")
-
-        self.score = await eval_exec_match(
-            db=db,
-            p_str=test_case.actual_output,
-            g_str=test_case.expected_output,
-        )
+        case = self._case(test_case)
+        if case in self._scores:
+            self.score = self._scores[case]
+        else:
+            db, p_str, g_str = case
+            self.score = await eval_exec_match(db=db, p_str=p_str, g_str=g_str)
 
         self.success = self.score >= self.threshold
 
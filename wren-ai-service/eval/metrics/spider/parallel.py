@@ -0,0 +1,253 @@
+import hashlib
+import multiprocessing
+import os
+import pickle
+import sqlite3
+import time
+from collections import deque
+from multiprocessing.connection import Connection, wait
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import tqdm
+
+from eval.metrics.spider import exec_match, execute_on_db
+
+TIMEOUT = 60
+
+
+class GoldResultCache:
+    """
+    Persists the results of the gold queries in SQLite, keyed by the database file and
+    the query, so that every gold query runs once across eval runs. A database file
+    which was modified in the meantime is a different key.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # shared by the worker processes, which wait for each other's writes
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS gold_results (key TEXT PRIMARY KEY, result BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(db_path: str, sql: str) -> str:
+        stat = os.stat(db_path)
+        return hashlib.sha256(
+            "\x1f".join(
+                [
+                    os.path.abspath(db_path),
+                    str(stat.st_size),
+                    str(stat.st_mtime_ns),
+                    sql,
+                ]
+            ).encode()
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Tuple]]:
+        row = self._conn.execute(
+            "SELECT result FROM gold_results WHERE key = ?", (key,)
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def set(self, key: str, result: List[Tuple]) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO gold_results VALUES (?, ?)",
+            (key, pickle.dumps(result)),
+        )
+        self._conn.commit()
+
+
+class _Worker:
+    """
+    The state of a worker process: one read-only connection per database, opened in
+    immutable mode as the databases never change during an eval run, and the gold
+    result cache.
+    """
+
+    def __init__(self, cache_path: Optional[str]):
+        self._connections: Dict[str, sqlite3.Connection] = {}
+        self._cache = GoldResultCache(cache_path) if cache_path else None
+
+    def _cursor(self, db_path: str) -> sqlite3.Cursor:
+        if db_path not in self._connections:
+            connection = sqlite3.connect(
+                f"file:{quote(os.path.abspath(db_path))}?mode=ro&immutable=1",
+                uri=True,
+            )
+            connection.text_factory = lambda b: b.decode(errors="ignore")
+            self._connections[db_path] = connection
+        return self._connections[db_path].cursor()
+
+    def execute(self, db_path: str, query: str) -> Tuple[str, Any]:
+        cursor = self._cursor(db_path)
+        try:
+            return execute_on_db(cursor, query)
+        finally:
+            cursor.close()
+
+    def execute_gold(self, db_path: str, query: str) -> Tuple[str, Any]:
+        if self._cache is None:
+            return self.execute(db_path, query)
+
+        key = GoldResultCache.key(db_path, query)
+        if (result := self._cache.get(key)) is not None:
+            return "result", result
+
+        flag, result = self.execute(db_path, query)
+        if flag == "result":
+            self._cache.set(key, result)
+        return flag, result
+
+    def score(self, db: str, pred: str, gold: str, kwargs: Dict[str, Any]) -> int:
+        return exec_match(
+            db,
+            pred,
+            gold,
+            execute=self.execute,
+            execute_gold=self.execute_gold,
+            **kwargs,
+        )
+
+
+def _work(connection: Connection, cache_path: Optional[str]) -> None:
+    worker = _Worker(cache_path)
+    # the timeouts of the cases only start once the worker is up, as a spawned process
+    # first imports the eval modules
+    connection.send("ready")
+    while (task := connection.recv()) is not None:
+        index, (db, pred, gold, kwargs) = task
+        try:
+            connection.send((index, worker.score(db, pred, gold, kwargs), None))
+        except Exception as e:
+            connection.send((index, 0, repr(e)))
+
+
+class ExecMatchPool:
+    """
+    Computes the execution accuracy of many (db, predicted sql, gold sql) cases in a
+    pool of worker processes, see `exec_match`. A case which takes longer than
+    `timeout` seconds, e.g. a predicted query with an accidental cross join, is scored
+    0 and its worker is killed and replaced, so it can't hold up the rest of the run.
+    The startup of a worker doesn't count towards the timeout of its first case.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        timeout: float = TIMEOUT,
+        cache_path: Optional[str] = None,
+    ):
+        self._workers = workers or os.cpu_count() or 1
+        self._timeout = timeout
+        self._cache_path = cache_path
+        # the parent process may run threads, e.g. for langfuse, which forking doesn't support
+        self._context = multiprocessing.get_context("spawn")
+        self.errors: Dict[int, str] = {}
+
+    def _start(self) -> Tuple[multiprocessing.Process, Connection]:
+        parent, child = self._context.Pipe()
+        process = self._context.Process(
+            target=_work, args=(child, self._cache_path), daemon=True
+        )
+        process.start()
+        child.close()
+        return process, parent
+
+    def run(
+        self,
+        cases: List[Tuple[str, str, str]],
+        progress_bar: bool = True,
+        **kwargs,
+    ) -> List[int]:
+        scores = [0] * len(cases)
+        self.errors = {}
+        pending = deque(enumerate(cases))
+        # connection -> (process, index of the running case, deadline)
+        running: Dict[Connection, Tuple[multiprocessing.Process, int, float]] = {}
+        # the workers which aren't ready yet, see `_work`
+        starting: Dict[Connection, multiprocessing.Process] = {}
+        progress = tqdm.tqdm(
+            total=len(cases), disable=not progress_bar, desc="Execution accuracy"
+        )
+
+        def assign(process: multiprocessing.Process, connection: Connection):
+            if not pending:
+                connection.send(None)
+                connection.close()
+                process.join()
+                return
+            index, (db, pred, gold) = pending.popleft()
+            connection.send((index, (db, pred, gold, kwargs)))
+            running[connection] = (process, index, time.monotonic() + self._timeout)
+
+        def start():
+            process, connection = self._start()
+            starting[connection] = process
+
+        def finish(index: int, score: int, error: Optional[str]):
+            scores[index] = score
+            if error:
+                self.errors[index] = error
+            progress.update()
+
+        for _ in range(min(self._workers, len(cases))):
+            start()
+
+        try:
+            while running or starting:
+                deadlines = [deadline for _, _, deadline in running.values()]
+                ready = wait(
+                    list(running) + list(starting),
+                    timeout=(
+                        max(0.0, min(deadlines) - time.monotonic())
+                        if deadlines
+                        else None
+                    ),
+                )
+
+                for connection in ready:
+                    if (process := starting.pop(connection, None)) is not None:
+                        try:
+                            connection.recv()
+                        except (EOFError, OSError):
+                            process.join()
+                            connection.close()
+                            raise RuntimeError(
+                                f"An execution accuracy worker failed to start, exit code {process.exitcode}"
+                            )
+                        assign(process, connection)
+                        continue
+
+                    process, index, _ = running.pop(connection)
+                    try:
+                        finish(*connection.recv())
+                        assign(process, connection)
+                    except (EOFError, OSError):
+                        # the worker died, e.g. out of memory
+                        finish(index, 0, "worker exited")
+                        process.join()
+                        start()
+
+                now = time.monotonic()
+                for connection, (process, index, deadline) in list(running.items()):
+                    if deadline <= now:
+                        del running[connection]
+                        process.kill()
+                        process.join()
+                        connection.close()
+                        finish(index, 0, f"timed out after {self._timeout}s")
+                        start()
+        finally:
+            for connection, (process, _, _) in running.items():
+                process.kill()
+                connection.close()
+            for connection, process in starting.items():
+                process.kill()
+                connection.close()
+            progress.close()
+
+        return scores
@@ -10,7 +10,6 @@ import aiohttp
 import orjson
 import psycopg2
 import requests
-import sqlglot
 import tomlkit
 import yaml
 from dotenv import load_dotenv
@@ -19,6 +18,7 @@ from tomlkit import parse
 
 import docker
 from eval import WREN_ENGINE_API_URL, EvalSettings
+from src.core.sql import quote_sql
 from src.providers.engine.wren import WrenEngine
 
 load_dotenv(".env", override=True)
@@ -26,7 +26,7 @@ load_dotenv(".env", override=True)
 
 def add_quotes(sql: str) -> Tuple[str, bool]:
     try:
-        quoted_sql = sqlglot.transpile(sql, read="trino", identify=True)[0]
+        quoted_sql = quote_sql(sql, dialect="trino")
         return quoted_sql, True
     except Exception as e:
         print(f"Error in adding quotes to SQL: {sql}")
@@ -4,10 +4,11 @@ import uvicorn
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import ORJSONResponse, RedirectResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse, RedirectResponse
 from langfuse.decorators import langfuse_context
 
 from src.config import settings
+from src.core import metrics
 from src.globals import (
     create_service_container,
     create_service_metadata,
@@ -31,6 +32,7 @@ async def lifespan(app: FastAPI):
     pipe_components = generate_components(settings.components)
     app.state.service_container = create_service_container(pipe_components, settings)
     app.state.service_metadata = create_service_metadata(pipe_components)
+    await app.state.service_container.semantics_preparation_service.resume_jobs()
     init_langfuse(settings)
 
     yield
@@ -87,6 +89,11 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "src.__main__:app",
@@ -1,4 +1,5 @@
 import logging
+from typing import Literal, Optional
 
 import yaml
 from dotenv import load_dotenv
@@ -42,6 +43,8 @@ class Settings(BaseSettings):
     allow_sql_functions_retrieval: bool = Field(default=True)
     max_histories: int = Field(default=5)
     max_sql_correction_retries: int = Field(default=3)
+    # the corrections generated and dry run concurrently on every retry, the first valid one is kept
+    sql_correction_candidates: int = Field(default=1)
 
     # engine config
     engine_timeout: float = Field(default=30.0)
@@ -56,6 +59,24 @@ class Settings(BaseSettings):
         """,
     )
 
+    # query result cache config
+    # the results of the sqls executed for charts, chart adjustments and sql answers are shared between them
+    # set query_result_cache_max_size_mb to 0 to disable the cache
+    query_result_cache_max_size_mb: int = Field(default=64)
+    query_result_cache_ttl: int = Field(default=300)  # unit: seconds
+    query_result_cache_compression: Optional[Literal["zstd"]] = Field(default=None)
+    # fetch the sql results for charts and sql answers as Arrow tables, requires the pyarrow package
+    columnar_query_results: bool = Field(default=False)
+
+    # chart data config
+    # the rows embedded in the charts when remove_data_from_chart_schema is false are reduced to these sizes
+    chart_data_max_points: int = Field(default=1000)
+    chart_data_max_categories: int = Field(default=10)
+
+    # sql pre-validation config
+    # the generated sqls are checked against the deployed mdl before the engine dry run
+    enable_sql_prevalidation: bool = Field(default=True)
+
     # user guide config
     is_oss: bool = Field(default=True)
     doc_endpoint: str = Field(default="https://docs.getwren.ai")
@@ -75,6 +96,12 @@ class Settings(BaseSettings):
 
     sql_pairs_path: str = Field(default="sql_pairs.json")
 
+    # indexing job queue config
+    # the indexing jobs and the active index generation of each project are kept in this file, so that unfinished jobs
+    # are resumed and the partially written generations stay hidden after a restart; ":memory:" loses them on restart
+    indexing_job_store_path: str = Field(default="indexing_jobs.db")
+    indexing_max_concurrency: int = Field(default=2)
+
     def __init__(self):
         load_dotenv(".env.dev", override=True)
         super().__init__()
@@ -0,0 +1,201 @@
+"""
+Columnar helpers for SQL results held as Arrow tables, the opt-in alternative to the
+`{"columns": [...], "data": [[...], ...]}` dictionaries returned by the engines, see
+`DataFetcher`. Sampling, distinct values and size budgeting run on the Arrow buffers,
+and only the rows which end up in a prompt or a chart are converted to Python objects.
+
+pyarrow is an optional dependency which is imported when a columnar result is built.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+    except ImportError as e:
+        raise ImportError(
+            "Columnar query results require pyarrow, install it with `pip install pyarrow`"
+        ) from e
+    return pyarrow
+
+
+def is_table(data: Any) -> bool:
+    # without importing pyarrow for the dictionary results
+    return type(data).__module__.startswith("pyarrow") and hasattr(data, "num_rows")
+
+
+def from_ipc(data: bytes):
+    pa = _pyarrow()
+    return pa.ipc.open_stream(pa.py_buffer(data)).read_all()
+
+
+def to_ipc(table) -> bytes:
+    pa = _pyarrow()
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def from_json(data: Optional[Dict[str, Any]]):
+    """
+    Decode an engine result of the `{"columns": [...], "data": [[...], ...]}` shape
+    into an Arrow table, one array per column. A column whose values don't share a
+    type, e.g. numbers and strings, is kept as strings.
+    """
+    pa = _pyarrow()
+    data = data or {}
+    names = [
+        column.get("name", "") if isinstance(column, dict) else column
+        for column in data.get("columns", [])
+    ]
+    rows = data.get("data", [])
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+
+    arrays = []
+    for values in columns:
+        try:
+            arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays.append(
+                pa.array([None if value is None else str(value) for value in values])
+            )
+    return pa.table(arrays, names=names) if names else pa.table({})
+
+
+def to_json_types(table):
+    """
+    Cast the columns whose values aren't JSON types, e.g. timestamps and decimals.
+    """
+    pa = _pyarrow()
+    for i, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+        elif pa.types.is_temporal(field.type) or pa.types.is_binary(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.string()))
+    return table
+
+
+def to_records(table) -> List[Dict[str, Any]]:
+    return to_json_types(table).to_pylist()
+
+
+def to_sql_data(table) -> Dict[str, Any]:
+    table = to_json_types(table)
+    return {
+        "columns": [
+            {"name": field.name, "type": str(field.type)} for field in table.schema
+        ],
+        "data": [list(row.values()) for row in table.to_pylist()],
+    }
+
+
+def distinct_values(table, size: int) -> Dict[str, List[Any]]:
+    pa = _pyarrow()
+    table = to_json_types(table)
+    return {
+        name: pa.compute.unique(table.column(name)).slice(0, size).to_pylist()
+        for name in table.column_names
+    }
+
+
+def strata(
+    table, size: int, is_temporal: Callable[[Any], bool]
+) -> Tuple[List[int], List[List[int]]]:
+    """
+    The rows which a sample of the table should cover: the indices of the earliest and
+    latest rows of its temporal columns, and of the first rows of the first `size`
+    distinct values of each of its categorical columns, i.e. string and boolean
+    columns. A string column is temporal when `is_temporal` holds for its first value.
+    """
+    pa = _pyarrow()
+    pc = pa.compute
+    index = pa.array(np.arange(table.num_rows))
+    extremes, representatives = [], []
+    for column in table.columns:
+        values = column.drop_null()
+        if len(values) == 0:
+            continue
+        is_string = pa.types.is_string(column.type) or pa.types.is_large_string(
+            column.type
+        )
+        if pa.types.is_temporal(column.type) or (
+            is_string and is_temporal(values[0].as_py())
+        ):
+            min_max = pc.min_max(values)
+            extremes += [
+                pc.index(column, min_max["min"]).as_py(),
+                pc.index(column, min_max["max"]).as_py(),
+            ]
+        elif is_string or pa.types.is_boolean(column.type):
+            first = (
+                pa.table({"value": column, "index": index})
+                .group_by("value")
+                .aggregate([("index", "min")])
+                .sort_by("index_min")
+            )
+            representatives.append(first.column("index_min").slice(0, size).to_pylist())
+    return extremes, representatives
+
+
+def row_lengths(table):
+    """
+    The length of each row rendered as text, i.e. the sum of the lengths of its
+    values cast to strings, as a numpy array.
+    """
+    pa = _pyarrow()
+    pc = pa.compute
+    lengths = pa.array([0] * table.num_rows, pa.int64())
+    for column in to_json_types(table).columns:
+        if pa.types.is_nested(column.type):
+            column = pa.array([str(value) for value in column.to_pylist()])
+        column_lengths = pc.utf8_length(column.cast(pa.string())).cast(pa.int64())
+        # "None" and the separator between the values
+        lengths = pc.add(lengths, pc.add(pc.fill_null(column_lengths, 4), 2))
+    return lengths.to_numpy(zero_copy_only=False)
+
+
+def fit_rows(
+    table, count_tokens: Callable[[Any], int], max_tokens: int
+) -> Tuple[int, int]:
+    """
+    The largest number of leading rows of the table whose tokens, counted by
+    `count_tokens` on a slice of the table, fit in `max_tokens`, and their tokens.
+
+    The row lengths, computed on the Arrow buffers, locate the first guess of the
+    binary search, so that the tokens are usually counted a few times only.
+    """
+    tokens = count_tokens(table)
+    if tokens <= max_tokens or table.num_rows == 0:
+        return table.num_rows, tokens
+
+    lengths = np.cumsum(row_lengths(table))
+    chars_per_token = max(lengths[-1], 1) / tokens
+    guess = int(np.searchsorted(lengths, max_tokens * chars_per_token, side="right"))
+
+    # `fits` rows fit and `exceeds` rows don't
+    fits, fits_tokens = 0, count_tokens(table.slice(0, 0))
+    exceeds = table.num_rows
+    probe, probes = guess, 0
+    while fits + 1 < exceeds:
+        probe = min(max(probe, fits + 1), exceeds - 1)
+        tokens = count_tokens(table.slice(0, probe))
+        if tokens <= max_tokens:
+            fits, fits_tokens = probe, tokens
+        else:
+            exceeds = probe
+        probes += 1
+        # the guess is corrected once by the tokens of its rows, then bisected
+        if probes == 1:
+            probe = int(probe * max_tokens / max(tokens, 1))
+        else:
+            probe = (fits + exceeds) // 2
+
+    return fits, fits_tokens
@@ -4,9 +4,10 @@ from abc import ABCMeta, abstractmethod
 from typing import Any, Dict, Optional, Tuple
 
 import aiohttp
-import sqlglot
 from pydantic import BaseModel
 
+from src.core.sql import quote_sql
+
 logger = logging.getLogger("wren-ai-service")
 
 
@@ -52,9 +53,7 @@ def remove_limit_statement(sql: str) -> str:
 
 def add_quotes(sql: str) -> Tuple[str, str]:
     try:
-        quoted_sql = sqlglot.transpile(
-            sql, read="trino", identify=True, error_level=sqlglot.ErrorLevel.RAISE
-        )[0]
+        quoted_sql = quote_sql(sql, dialect="trino")
     except Exception as e:
         logger.exception(f"Error in sqlglot.transpile to {sql}: {e}")
 
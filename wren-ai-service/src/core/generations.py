@@ -0,0 +1,60 @@
+import logging
+from typing import Dict, FrozenSet, Optional
+
+logger = logging.getLogger("wren-ai-service")
+
+
+class IndexGenerations:
+    """
+    Tracks which generation of the indexed documents is visible to the retrievers.
+
+    A full re-index writes its documents as a new generation, i.e. tagged with a
+    `generation` meta field, while the previous generation keeps serving:
+
+    - `stage`: the documents of the new generation are hidden while they are written
+    - `activate`: flips a project to the new generation at once; the documents of the
+      project from any other generation are hidden until they are garbage collected
+    - `release`: called once the old generations of the project have been deleted
+    - `discard`: called once the documents of a failed generation have been deleted
+
+    Documents without a `generation` field, e.g. sql pairs and instructions, are
+    never hidden. The document stores apply the visibility rules on every query, see
+    `AsyncQdrantDocumentStore`.
+    """
+
+    def __init__(self):
+        self._staged: set[str] = set()
+        self._active: Dict[str, str] = {}
+
+    @property
+    def staged(self) -> FrozenSet[str]:
+        return frozenset(self._staged)
+
+    @property
+    def retiring(self) -> Dict[str, str]:
+        """
+        The active generation of the projects whose old generations are not deleted
+        yet, keyed by project id ("" for documents without a project id).
+        """
+        return dict(self._active)
+
+    def stage(self, generation: str) -> None:
+        self._staged.add(generation)
+
+    def activate(self, project_id: Optional[str], generation: str) -> None:
+        self._staged.discard(generation)
+        self._active[project_id or ""] = generation
+        logger.info(
+            f"Project ID: {project_id}, Activated index generation {generation}"
+        )
+
+    def release(self, project_id: Optional[str], generation: str) -> None:
+        # a newer generation may have been activated in the meantime
+        if self._active.get(project_id or "") == generation:
+            del self._active[project_id or ""]
+
+    def discard(self, generation: str) -> None:
+        self._staged.discard(generation)
+
+
+INDEX_GENERATIONS = IndexGenerations()
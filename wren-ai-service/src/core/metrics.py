@@ -0,0 +1,448 @@
+"""
+In-process metrics exposed at `/metrics` in the Prometheus text format.
+
+The metrics are kept in plain dictionaries guarded by a lock, so recording a value
+is a dictionary lookup and a few additions; the text format is only built when
+`/metrics` is scraped. Quantiles (p50/p95/p99) are computed on the Prometheus side
+from the histogram buckets, e.g.
+
+    histogram_quantile(0.95, sum by (le, stage) (rate(wren_ai_stage_duration_seconds_bucket[5m])))
+"""
+
+import asyncio
+import functools
+import inspect
+import threading
+import time
+import weakref
+from abc import ABCMeta, abstractmethod
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from cachetools import TTLCache
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    20.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, "_Metric"] = {}
+
+    def register(self, metric: "_Metric") -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric(metaclass=ABCMeta):
+    type: str = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        registry: Optional[Registry] = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @abstractmethod
+    def render(self) -> List[str]:
+        ...
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """
+    A gauge can either be set directly, or computed at scrape time by `collect`,
+    a callable returning a mapping of label values to the current value.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        *args,
+        collect: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._collect = collect
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        values = self._collect() if self._collect else self._values
+        return values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        if self._collect:
+            values = list(self._collect().items())
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._bounds = tuple(sorted(buckets)) + (float("inf"),)
+        # per label values: [non-cumulative bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            if (state := self._values.get(key)) is None:
+                state = self._values[key] = [0] * (len(self._bounds) + 2)
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return int(state[-1]) if state else 0
+
+    def sum(self, **labels) -> float:
+        state = self._values.get(self._key(labels))
+        return state[-2] if state else 0.0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(state)) for key, state in self._values.items()]
+
+        lines = []
+        bucket_labelnames = self.labelnames + ("le",)
+        for key, state in values:
+            cumulative = 0
+            for bound, count in zip(self._bounds, state):
+                cumulative += count
+                labels = _format_labels(
+                    bucket_labelnames, key + (_format_value(bound),)
+                )
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(state[-1])}")
+        return lines
+
+
+STAGE_DURATION = Histogram(
+    "wren_ai_stage_duration_seconds",
+    "Duration of pipeline nodes, pipelines and service calls decorated with @observe",
+    ("module", "stage", "status"),
+)
+PROVIDER_DURATION = Histogram(
+    "wren_ai_provider_request_duration_seconds",
+    "Duration of requests to the LLM, embedder, document store and engine providers",
+    ("provider", "name", "model", "operation", "status"),
+)
+TOKENS = Counter(
+    "wren_ai_tokens_total",
+    "Number of tokens consumed by the LLM and embedder providers",
+    ("provider", "model", "type"),
+)
+CACHE_REQUESTS = Counter(
+    "wren_ai_cache_requests_total",
+    "Number of cache lookups by result (hit or miss)",
+    ("cache", "result"),
+)
+SQL_VALIDATIONS = Counter(
+    "wren_ai_sql_validations_total",
+    "Number of generated SQLs by the result of their local validation and engine dry "
+    "run: rejected, then passed, dry_run (failed) or time_out",
+    ("result",),
+)
+STATUS_TRANSITIONS = Counter(
+    "wren_ai_status_transitions_total",
+    "Number of service status transitions",
+    ("service", "status"),
+)
+STATUS_DURATION = Histogram(
+    "wren_ai_status_duration_seconds",
+    "Time spent by a request in a service status before moving to the next one",
+    ("service", "status"),
+)
+
+# caches are unhashable mappings, so they are tracked by a list of weak references
+_status_caches: List[weakref.ref] = []
+
+
+def _collect_in_progress() -> Dict[Tuple[str, ...], float]:
+    values: Dict[Tuple[str, ...], float] = {}
+    _status_caches[:] = [ref for ref in _status_caches if ref() is not None]
+    for ref in list(_status_caches):
+        if (cache := ref()) is None:
+            continue
+        for key, count in cache.in_progress().items():
+            values[key] = values.get(key, 0) + count
+    return values
+
+
+IN_PROGRESS = Gauge(
+    "wren_ai_in_progress_requests",
+    "Number of requests currently in a non-terminal service status (queue depth)",
+    ("service", "status"),
+    collect=_collect_in_progress,
+)
+
+
+def _instrument(func: Callable, record: Callable[[float, str, Any], None]) -> Callable:
+    """
+    Wrap a sync or async function, so that `record(elapsed, status, result)` is
+    called once it returns or raises; status is one of success, error, cancelled.
+    """
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            status, result = "success", None
+            try:
+                result = await func(*args, **kwargs)
+                return result
+            except asyncio.CancelledError:
+                status = "cancelled"
+                raise
+            except BaseException:
+                status = "error"
+                raise
+            finally:
+                record(time.perf_counter() - start, status, result)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def sync_wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        status, result = "success", None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            record(time.perf_counter() - start, status, result)
+
+    return sync_wrapper
+
+
+def track_stage(stage: str, module: str) -> Callable:
+    def decorator(func: Callable) -> Callable:
+        def record(elapsed: float, status: str, _) -> None:
+            STAGE_DURATION.observe(elapsed, module=module, stage=stage, status=status)
+
+        return _instrument(func, record)
+
+    return decorator
+
+
+def record_usage(provider: str, result: Any) -> None:
+    """
+    Record the token usage found in the `meta` of a generator or embedder result,
+    which is a list of dicts for generators and a dict for embedders.
+    """
+    if not isinstance(result, dict):
+        return
+
+    meta = result.get("meta")
+    for item in meta if isinstance(meta, list) else [meta]:
+        if not isinstance(item, dict) or not (usage := item.get("usage")):
+            continue
+        model = item.get("model", "")
+        for _type in ("prompt_tokens", "completion_tokens"):
+            if tokens := usage.get(_type):
+                TOKENS.inc(tokens, provider=provider, model=model, type=_type)
+
+
+def track_provider(
+    provider: str, name: str, operation: str, model: str = ""
+) -> Callable:
+    """
+    Record the duration of a provider call, e.g.
+
+    ```python
+    @track_provider("engine", "wren_ibis", "execute_sql")
+    async def execute_sql(...):
+        ...
+    ```
+
+    `name` is the name of the provider, e.g. `litellm_llm`, and `model` the model it
+    calls, if any. The token usage of LLM and embedder results is recorded as well.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        def record(elapsed: float, status: str, result: Any) -> None:
+            PROVIDER_DURATION.observe(
+                elapsed,
+                provider=provider,
+                name=name,
+                model=model,
+                operation=operation,
+                status=status,
+            )
+            if result is not None and provider in ("llm", "embedder"):
+                record_usage(provider, result)
+
+        return _instrument(func, record)
+
+    return decorator
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_sql_validation(result: str) -> None:
+    """
+    The share of the failed SQLs caught without the engine is
+    rejected / (rejected + dry_run).
+    """
+    SQL_VALIDATIONS.inc(result=result)
+
+
+class StatusTrackingCache(TTLCache):
+    """
+    A TTLCache for service results, e.g. `AskResultResponse`, that records every
+    status transition and the time spent in the previous status. Requests in a
+    non-terminal status are reported by the `wren_ai_in_progress_requests` gauge.
+    """
+
+    TERMINAL_STATUSES = ("finished", "failed", "stopped")
+
+    def __init__(self, service: str, maxsize: int, ttl: int):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self._service = service
+        self._since = TTLCache(maxsize=maxsize, ttl=ttl)
+        _status_caches.append(weakref.ref(self))
+
+    def __setitem__(self, key, value):
+        status = getattr(value, "status", None)
+        previous = self.get(key)
+        previous_status = getattr(previous, "status", None)
+        super().__setitem__(key, value)
+
+        if status is None or status == previous_status:
+            return
+
+        now = time.perf_counter()
+        if previous_status is not None and (since := self._since.get(key)):
+            STATUS_DURATION.observe(
+                now - since, service=self._service, status=previous_status
+            )
+        STATUS_TRANSITIONS.inc(service=self._service, status=status)
+
+        if status in self.TERMINAL_STATUSES:
+            self._since.pop(key, None)
+        else:
+            self._since[key] = now
+
+    def in_progress(self) -> Dict[Tuple[str, ...], int]:
+        counts: Dict[Tuple[str, ...], int] = {}
+        for value in list(self.values()):
+            status = getattr(value, "status", None)
+            if status is not None and status not in self.TERMINAL_STATUSES:
+                key = (self._service, status)
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,261 @@
+"""
+Column profiles of SQL results, which summarize all the rows of a result in a size
+bounded by its number of columns, for the prompts which can't take every row, see
+`summarize_sql_data`.
+
+The profiles are computed with vectorized NumPy/pandas kernels on the columns: the
+distinct values are estimated with a HyperLogLog sketch and the most frequent values
+are kept by a Misra-Gries summary, both fed with the 64-bit hashes of the values.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import orjson
+import pandas as pd
+
+from src.core import arrow
+
+NUMERIC_TYPES = ("integer", "floating", "mixed-integer-float", "decimal")
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def _hashable(value: Any) -> Any:
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        # the arrays, structs and JSON values are hashed by their serialization
+        return orjson.dumps(
+            value,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+            default=str,
+        )
+
+
+def hash_values(values: np.ndarray) -> np.ndarray:
+    # numbers are hashed as floats, so that 1 and 1.0 are the same value
+    if values.dtype != object:
+        values = values.astype(np.float64)
+    try:
+        return pd.util.hash_array(values)
+    except TypeError:
+        hashable = np.empty(len(values), dtype=object)
+        hashable[:] = [_hashable(value) for value in values]
+        return pd.util.hash_array(hashable)
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    with np.errstate(divide="ignore"):
+        return np.where(
+            high > 0,
+            33 + np.floor(np.log2(high)),
+            np.where(low > 0, 1 + np.floor(np.log2(low)), 0),
+        ).astype(np.int64)
+
+
+class HyperLogLog:
+    """
+    Estimates the number of distinct hashes with 2^p registers, i.e. a relative
+    error of about 1.04 / sqrt(2^p); small cardinalities are counted linearly.
+    """
+
+    def __init__(self, p: int = 12):
+        self._p = p
+        self._registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def add(self, hashes: np.ndarray) -> None:
+        hashes = hashes.astype(np.uint64, copy=False)
+        index = (hashes >> np.uint64(64 - self._p)).astype(np.int64)
+        rest = hashes << np.uint64(self._p)
+        # the position of the first 1 bit after the index bits
+        rank = np.minimum(64 - _bit_length(rest) + 1, 64 - self._p + 1)
+        np.maximum.at(self._registers, index, rank.astype(np.uint8))
+
+    def count(self) -> int:
+        m = len(self._registers)
+        estimate = (
+            0.7213
+            / (1 + 1.079 / m)
+            * m
+            * m
+            / np.sum(np.exp2(-self._registers.astype(float)))
+        )
+        zeros = int(np.count_nonzero(self._registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class HeavyHitters:
+    """
+    A Misra-Gries summary of at most `capacity` counters, merged with the exact counts
+    of each batch of values. A value more frequent than n / (capacity + 1) is kept,
+    and its count is underestimated by at most that much.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._capacity = capacity
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._counts = np.empty(0, dtype=np.int64)
+        self._values = np.empty(0, dtype=object)
+
+    def add(self, hashes: np.ndarray, values: np.ndarray) -> None:
+        all_hashes = np.concatenate([self._hashes, hashes.astype(np.uint64)])
+        all_counts = np.concatenate([self._counts, np.ones(len(hashes), np.int64)])
+        all_values = np.concatenate([self._values, values.astype(object)])
+
+        keys, first, inverse = np.unique(
+            all_hashes, return_index=True, return_inverse=True
+        )
+        counts = np.bincount(inverse, weights=all_counts).astype(np.int64)
+        values = all_values[first]
+
+        if len(keys) > self._capacity:
+            threshold = np.partition(counts, -(self._capacity + 1))[
+                -(self._capacity + 1)
+            ]
+            counts = counts - threshold
+            kept = counts > 0
+            keys, counts, values = keys[kept], counts[kept], values[kept]
+
+        self._hashes, self._counts, self._values = keys, counts, values
+
+    def top(self, k: int) -> List[Tuple[Any, int]]:
+        order = np.argsort(-self._counts, kind="stable")[:k]
+        return [(self._values[i], int(self._counts[i])) for i in order]
+
+
+def _scalar(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _number(value: float, kind: str) -> Any:
+    return int(value) if kind == "integer" else float(value)
+
+
+def profile_column(
+    name: str,
+    values: np.ndarray,
+    top_k: int = 5,
+    batch_size: int = 4096,
+) -> Dict[str, Any]:
+    values = np.asarray(values, dtype=object) if values.dtype.kind in "OUS" else values
+    nulls = pd.isna(values)
+    present = values[~nulls]
+    kind = pd.api.types.infer_dtype(present, skipna=True) if len(present) else "empty"
+    numeric = kind in NUMERIC_TYPES
+    if numeric:
+        present = present.astype(np.float64)
+
+    profile = {
+        "name": name,
+        "type": kind,
+        "count": int(len(values)),
+        "nulls": int(nulls.sum()),
+    }
+    if not len(present):
+        return profile
+
+    sketch, hitters = HyperLogLog(), HeavyHitters()
+    for start in range(0, len(present), batch_size):
+        batch = present[start : start + batch_size]
+        hashes = hash_values(batch)
+        sketch.add(hashes)
+        hitters.add(hashes, batch)
+    profile["distinct"] = sketch.count()
+
+    if numeric:
+        quantiles = np.quantile(present, QUANTILES)
+        profile.update(
+            {
+                "min": _number(present.min(), kind),
+                "max": _number(present.max(), kind),
+                "mean": round(float(present.mean()), 6),
+                "quantiles": {
+                    f"p{int(q * 100)}": round(float(value), 6)
+                    for q, value in zip(QUANTILES, quantiles)
+                },
+            }
+        )
+    else:
+        try:
+            profile.update(
+                {"min": _scalar(present.min()), "max": _scalar(present.max())}
+            )
+        except TypeError:
+            # values of different types which can't be compared
+            pass
+
+    profile["top_values"] = [
+        {"value": _number(value, kind) if numeric else _scalar(value), "count": count}
+        for value, count in hitters.top(top_k)
+        if count > 1
+    ]
+    return profile
+
+
+def sample_indices(num_rows: int, size: int, head: int = 5) -> np.ndarray:
+    """
+    The first `head` rows, which answer the questions on ordered results, and rows
+    evenly spaced over the rest of the result, in their original order.
+    """
+    if num_rows <= size:
+        return np.arange(num_rows)
+    head = min(head, size)
+    spread = np.linspace(head, num_rows - 1, size - head).round().astype(np.int64)
+    return np.unique(np.concatenate([np.arange(head), spread]))
+
+
+def _columns(sql_data: Any) -> Tuple[List[str], List[np.ndarray], int]:
+    if arrow.is_table(sql_data):
+        return (
+            sql_data.column_names,
+            [
+                column.to_numpy(zero_copy_only=False)
+                for column in arrow.to_json_types(sql_data).columns
+            ],
+            sql_data.num_rows,
+        )
+
+    names = [
+        column.get("name", "") if isinstance(column, dict) else column
+        for column in sql_data.get("columns", [])
+    ]
+    rows = sql_data.get("data", [])
+    columns = [np.empty(len(rows), dtype=object) for _ in names]
+    for i, column in enumerate(zip(*rows)):
+        columns[i][:] = column
+    return names, columns, len(rows)
+
+
+def summarize_sql_data(
+    sql_data: Any,
+    sample_size: int = 10,
+    top_k: int = 5,
+) -> Dict[str, Any]:
+    """
+    Replace the rows of a SQL result, a `{"columns", "data"}` dictionary or an Arrow
+    table, by the profiles of its columns and a sample of its rows.
+    """
+    names, columns, num_rows = _columns(sql_data)
+    indices = sample_indices(num_rows, sample_size)
+
+    if arrow.is_table(sql_data):
+        summary = arrow.to_sql_data(sql_data.take(indices))
+    else:
+        rows = sql_data.get("data", [])
+        summary = {
+            "columns": sql_data.get("columns", []),
+            "data": [rows[i] for i in indices],
+        }
+
+    return {
+        **summary,
+        "row_count": num_rows,
+        "column_profiles": [
+            profile_column(name, column, top_k) for name, column in zip(names, columns)
+        ],
+    }
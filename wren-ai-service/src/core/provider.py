@@ -1,4 +1,5 @@
 from abc import ABCMeta, abstractmethod
+from typing import Optional
 
 from haystack.document_stores.types import DocumentStore
 
@@ -30,6 +31,15 @@ class EmbedderProvider(metaclass=ABCMeta):
     def get_model(self):
         return self._embedding_model
 
+    def get_dimension(self) -> Optional[int]:
+        """
+        The dimension of the embeddings returned by the embedders, i.e. the target
+        dimension if they are truncated, or None if it's unknown.
+        """
+        return getattr(self, "_target_dimension", None) or getattr(
+            self, "_dimension", None
+        )
+
 
 class DocumentStoreProvider(metaclass=ABCMeta):
     @abstractmethod
@@ -39,3 +49,16 @@ class DocumentStoreProvider(metaclass=ABCMeta):
     @abstractmethod
     def get_retriever(self, *args, **kwargs):
         ...
+
+    def get_embedding_dimension(self) -> Optional[int]:
+        return getattr(self, "_embedding_model_dim", None) or None
+
+
+def validate_target_dimension(
+    target_dimension: Optional[int], dimension: Optional[int]
+) -> Optional[int]:
+    if target_dimension and dimension and target_dimension > dimension:
+        raise ValueError(
+            f"target_dimension {target_dimension} is larger than the embedding model dimension {dimension}"
+        )
+    return target_dimension
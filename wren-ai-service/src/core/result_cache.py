@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import orjson
+
+from src.core import arrow
+from src.core.metrics import record_cache
+from src.core.sql import sql_fingerprint
+
+logger = logging.getLogger("wren-ai-service")
+
+
+class QueryResultCache:
+    """
+    Caches the results of the SQLs executed by the engine, so that the chart, chart
+    adjustment and SQL answer requests for the same answer fetch its data once. The
+    results are keyed by the project, the MDL deployed for the project, the fingerprint
+    of the SQL and the row limit, see `key`.
+
+    - the results are stored serialized, as JSON or as Arrow IPC for the columnar
+      results, optionally compressed with zstd, and the least recently used ones are
+      evicted once they exceed `max_size` bytes
+    - a result expires `ttl` seconds after it was fetched
+    - concurrent requests for the same key share a single fetch
+
+    The MDL of a project is set by `set_mdl_hash` when it is deployed; the results of
+    the previous MDL of the project are dropped.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 64 * 2**20,
+        ttl: float = 300,
+        compression: Optional[str] = None,
+    ):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._size = 0
+        # key -> (expires at, serialized result, whether it is an Arrow table)
+        self._entries: OrderedDict[Hashable, Tuple[float, bytes, bool]] = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._mdl_hashes: Dict[str, str] = {}
+        self._compressor = self._decompressor = None
+
+        if compression == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                logger.warning(
+                    "zstandard is not installed, the query results are cached uncompressed. "
+                    "Install it with `pip install zstandard` to compress them."
+                )
+            else:
+                self._compressor = zstandard.ZstdCompressor(level=3)
+                self._decompressor = zstandard.ZstdDecompressor()
+        elif compression is not None:
+            raise ValueError(
+                f"Unsupported query result cache compression: {compression}"
+            )
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def set_mdl_hash(self, project_id: Optional[str], mdl_hash: str) -> None:
+        project_id = project_id or ""
+        if self._mdl_hashes.get(project_id) == mdl_hash:
+            return
+
+        self._mdl_hashes[project_id] = mdl_hash
+        for key in [key for key in self._entries if key[0] == project_id]:
+            self._remove(key)
+
+    def key(
+        self, project_id: Optional[str], sql: str, limit: Optional[int]
+    ) -> Tuple[str, Optional[str], str, Optional[int]]:
+        project_id = project_id or ""
+        return project_id, self._mdl_hashes.get(project_id), sql_fingerprint(sql), limit
+
+    def _remove(self, key: Hashable) -> None:
+        _, data, _ = self._entries.pop(key)
+        self._size -= len(data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if (entry := self._entries.get(key)) is None:
+            return None
+        expires_at, data, columnar = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        if self._decompressor is not None:
+            data = self._decompressor.decompress(data)
+        if columnar:
+            return arrow.from_ipc(data)
+        # a new copy of the result for every caller, which may modify it
+        return orjson.loads(data)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        columnar = arrow.is_table(value)
+        data = arrow.to_ipc(value) if columnar else orjson.dumps(value)
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        if len(data) > self._max_size:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self._ttl, data, columnar)
+        self._size += len(data)
+        while self._size > self._max_size:
+            self._remove(next(iter(self._entries)))
+
+    async def get_or_fetch(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Tuple[Any, bool]]],
+    ) -> Any:
+        """
+        Return the cached result of the key, or fetch it. `fetch` returns the result
+        and whether it can be cached, e.g. not for a failed query. Concurrent callers
+        for the same key wait for the same fetch, which isn't cancelled when one of
+        them is.
+        """
+        if (value := self.get(key)) is not None:
+            record_cache("query_result", True)
+            return value
+        record_cache("query_result", False)
+
+        if (task := self._inflight.get(key)) is None:
+
+            async def _fetch():
+                try:
+                    value, cacheable = await fetch()
+                    if cacheable:
+                        self.set(key, value)
+                    return value
+                finally:
+                    del self._inflight[key]
+
+            task = self._inflight[key] = asyncio.create_task(_fetch())
+
+        value = await asyncio.shield(task)
+        # the Arrow tables are immutable
+        return value if arrow.is_table(value) else orjson.loads(orjson.dumps(value))
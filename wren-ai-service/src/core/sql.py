@@ -0,0 +1,145 @@
+"""
+Memoized sqlglot parsing of the SQLs handled by the service.
+
+The same SQL is parsed several times over its lifetime: quoted by `add_quotes` for
+every generation and correction, checked by the SQL validator, and keyed in the SQL
+keyed caches, see `sql_fingerprint`. sqlglot parses in pure Python, which takes
+milliseconds for large SQLs, so the parsed expressions and the quoted SQLs are kept
+in a bounded LRU cache keyed by the SQL and its dialect.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+
+from src.core.metrics import record_cache
+
+# quoted strings and identifiers are kept as they are, whitespace elsewhere is collapsed
+_SQL_TOKENS = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    return _SQL_TOKENS.sub(lambda m: m.group(1) or " ", sql).strip().rstrip(";").strip()
+
+
+class _Entry:
+    __slots__ = ("expression", "error", "quoted", "parsed")
+
+    def __init__(self):
+        self.expression: Optional[exp.Expression] = None
+        self.error: Optional[Exception] = None
+        self.quoted: Optional[str] = None
+        self.parsed = False
+
+
+class SQLParseCache:
+    """
+    An LRU cache of at most `max_size` SQLs, with their first statement parsed by
+    sqlglot, or the error of the parser, and quoted. The expressions are copied for
+    every caller, which may modify them.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self._max_size = max_size
+        self._entries: OrderedDict[Tuple[str, Optional[str]], _Entry] = OrderedDict()
+        # the pipelines may parse SQLs from other threads
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _entry(self, sql: str, dialect: Optional[str]) -> _Entry:
+        key = (sql, dialect)
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+            entry = self._entries[key] = _Entry()
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+            return entry
+
+    def _parse(self, sql: str, dialect: Optional[str]) -> _Entry:
+        entry = self._entry(sql, dialect)
+        record_cache("sql_parse", entry.parsed)
+        if not entry.parsed:
+            try:
+                entry.expression = sqlglot.parse(
+                    sql, read=dialect, error_level=sqlglot.ErrorLevel.RAISE
+                )[0]
+            except Exception as e:
+                entry.error = e
+            entry.parsed = True
+        return entry
+
+    def parse(self, sql: str, dialect: Optional[str] = "trino") -> exp.Expression:
+        """
+        The first statement of the SQL, as `sqlglot.parse_one`; raises the error of
+        the parser.
+        """
+        entry = self._parse(sql, dialect)
+        if entry.error is not None:
+            raise entry.error
+        if entry.expression is None:
+            raise sqlglot.errors.ParseError("No expression was parsed from ''")
+        return entry.expression.copy()
+
+    def quote(self, sql: str, dialect: Optional[str] = "trino") -> str:
+        """
+        The first statement of the SQL with all its identifiers quoted, as
+        `sqlglot.transpile(sql, read=dialect, identify=True)[0]`; raises the error of
+        the parser.
+        """
+        entry = self._entry(sql, dialect)
+        if entry.quoted is None:
+            entry = self._parse(sql, dialect)
+            if entry.error is not None:
+                raise entry.error
+            entry.quoted = (
+                entry.expression.sql(dialect=dialect, identify=True)
+                if entry.expression is not None
+                else ""
+            )
+            # the quoted SQLs are quoted again, e.g. by the SQL keyed caches
+            self._entry(entry.quoted, dialect).quoted = entry.quoted
+        else:
+            record_cache("sql_parse", True)
+        return entry.quoted
+
+    def fingerprint(self, sql: str, dialect: Optional[str] = "trino") -> str:
+        """
+        A key of the SQL which is the same for the SQLs which only differ by the
+        quotes of their identifiers, the case of their keywords, their whitespace or
+        their trailing semicolon. The literals are kept, as the SQLs which differ by
+        a literal differ by their results.
+        """
+        try:
+            canonical = self.quote(sql, dialect)
+        except Exception:
+            canonical = normalize_sql(sql)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+SQL_PARSE_CACHE = SQLParseCache()
+
+
+def parse_sql(sql: str, dialect: Optional[str] = "trino") -> exp.Expression:
+    return SQL_PARSE_CACHE.parse(sql, dialect)
+
+
+def quote_sql(sql: str, dialect: Optional[str] = "trino") -> str:
+    return SQL_PARSE_CACHE.quote(sql, dialect)
+
+
+def sql_fingerprint(sql: str, dialect: Optional[str] = "trino") -> str:
+    return SQL_PARSE_CACHE.fingerprint(sql, dialect)
@@ -6,7 +6,9 @@ import toml
 from src.config import Settings
 from src.core.pipeline import PipelineComponent
 from src.core.provider import EmbedderProvider, LLMProvider
+from src.core.result_cache import QueryResultCache
 from src.pipelines import generation, indexing, retrieval
+from src.pipelines.generation.utils.sql import SQLValidator
 from src.utils import fetch_wren_ai_docs
 from src.web.v1 import services
 
@@ -43,6 +45,16 @@ def create_service_container(
         "maxsize": settings.query_cache_maxsize,
         "ttl": settings.query_cache_ttl,
     }
+    result_cache = (
+        QueryResultCache(
+            max_size=settings.query_result_cache_max_size_mb * 2**20,
+            ttl=settings.query_result_cache_ttl,
+            compression=settings.query_result_cache_compression,
+        )
+        if settings.query_result_cache_max_size_mb > 0
+        else None
+    )
+    sql_validator = SQLValidator() if settings.enable_sql_prevalidation else None
     wren_ai_docs = fetch_wren_ai_docs(settings.doc_endpoint, settings.is_oss)
     if not wren_ai_docs:
         logger.warning("Failed to fetch Wren AI docs or response was empty.")
@@ -79,6 +91,10 @@ def create_service_container(
                     **pipe_components["project_meta_indexing"],
                 ),
             },
+            job_store_path=settings.indexing_job_store_path,
+            max_concurrency=settings.indexing_max_concurrency,
+            result_cache=result_cache,
+            sql_validator=sql_validator,
             **query_cache,
         ),
         ask_service=services.AskService(
@@ -119,6 +135,7 @@ def create_service_container(
                 "sql_generation": generation.SQLGeneration(
                     **pipe_components["sql_generation"],
                     engine_timeout=settings.engine_timeout,
+                    sql_validator=sql_validator,
                 ),
                 "sql_generation_reasoning": generation.SQLGenerationReasoning(
                     **pipe_components["sql_generation_reasoning"],
@@ -129,14 +146,18 @@ def create_service_container(
                 "sql_correction": generation.SQLCorrection(
                     **pipe_components["sql_correction"],
                     engine_timeout=settings.engine_timeout,
+                    sql_validator=sql_validator,
+                    candidates=settings.sql_correction_candidates,
                 ),
                 "followup_sql_generation": generation.FollowUpSQLGeneration(
                     **pipe_components["followup_sql_generation"],
                     engine_timeout=settings.engine_timeout,
+                    sql_validator=sql_validator,
                 ),
                 "sql_regeneration": generation.SQLRegeneration(
                     **pipe_components["sql_regeneration"],
                     engine_timeout=settings.engine_timeout,
+                    sql_validator=sql_validator,
                 ),
                 "sql_functions_retrieval": retrieval.SqlFunctions(
                     **pipe_components["sql_functions_retrieval"],
@@ -156,9 +177,13 @@ def create_service_container(
                 "sql_executor": retrieval.SQLExecutor(
                     **pipe_components["sql_executor"],
                     engine_timeout=settings.engine_timeout,
+                    result_cache=result_cache,
+                    columnar=settings.columnar_query_results,
                 ),
                 "chart_generation": generation.ChartGeneration(
                     **pipe_components["chart_generation"],
+                    chart_data_max_points=settings.chart_data_max_points,
+                    chart_data_max_categories=settings.chart_data_max_categories,
                 ),
             },
             **query_cache,
@@ -168,15 +193,25 @@ def create_service_container(
                 "sql_executor": retrieval.SQLExecutor(
                     **pipe_components["sql_executor"],
                     engine_timeout=settings.engine_timeout,
+                    result_cache=result_cache,
+                    columnar=settings.columnar_query_results,
                 ),
                 "chart_adjustment": generation.ChartAdjustment(
                     **pipe_components["chart_adjustment"],
+                    chart_data_max_points=settings.chart_data_max_points,
+                    chart_data_max_categories=settings.chart_data_max_categories,
                 ),
             },
             **query_cache,
         ),
         sql_answer_service=services.SqlAnswerService(
             pipelines={
+                "sql_executor": retrieval.SQLExecutor(
+                    **pipe_components["sql_executor"],
+                    engine_timeout=settings.engine_timeout,
+                    result_cache=result_cache,
+                    columnar=settings.columnar_query_results,
+                ),
                 "preprocess_sql_data": retrieval.PreprocessSqlData(
                     **pipe_components["preprocess_sql_data"],
                 ),
@@ -209,6 +244,7 @@ def create_service_container(
                 "sql_generation": generation.SQLGeneration(
                     **pipe_components["question_recommendation_sql_generation"],
                     engine_timeout=settings.engine_timeout,
+                    sql_validator=sql_validator,
                 ),
                 "sql_pairs_retrieval": retrieval.SqlPairsRetrieval(
                     **pipe_components["sql_pairs_retrieval"],
@@ -266,6 +302,8 @@ def create_service_container(
                 "sql_correction": generation.SQLCorrection(
                     **pipe_components["sql_correction"],
                     engine_timeout=settings.engine_timeout,
+                    sql_validator=sql_validator,
+                    candidates=settings.sql_correction_candidates,
                 ),
             },
             **query_cache,
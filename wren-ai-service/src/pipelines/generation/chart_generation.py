@@ -2,21 +2,21 @@ import logging
 import sys
 from typing import Any, Dict, Optional
 
-import orjson
 from hamilton import base
 from hamilton.async_driver import AsyncDriver
 from haystack.components.builders.prompt_builder import PromptBuilder
-from langfuse.decorators import observe
 
 from src.core.pipeline import BasicPipeline
 from src.core.provider import LLMProvider
 from src.pipelines.generation.utils.chart import (
     ChartDataPreprocessor,
+    ChartDataReducer,
     ChartGenerationPostProcessor,
     ChartGenerationResults,
     chart_generation_instructions,
+    sample_seed,
 )
-from src.utils import trace_cost
+from src.utils import observe, trace_cost
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -56,9 +56,9 @@ Please think step by step
 ## Start of Pipeline
 @observe(capture_input=False)
 def preprocess_data(
-    data: Dict[str, Any], chart_data_preprocessor: ChartDataPreprocessor
+    data: Dict[str, Any], sql: str, chart_data_preprocessor: ChartDataPreprocessor
 ) -> dict:
-    return chart_data_preprocessor.run(data)
+    return chart_data_preprocessor.run(data, seed=sample_seed(sql))
 
 
 @observe(capture_input=False)
@@ -92,16 +92,16 @@ async def generate_chart(prompt: dict, generator: Any, generator_name: str) -> d
 @observe(capture_input=False)
 def post_process(
     generate_chart: dict,
-    vega_schema: Dict[str, Any],
     remove_data_from_chart_schema: bool,
     preprocess_data: dict,
+    data: Dict[str, Any],
     post_processor: ChartGenerationPostProcessor,
 ) -> dict:
     return post_processor.run(
         generate_chart.get("replies"),
-        vega_schema,
         preprocess_data["sample_data"],
         remove_data_from_chart_schema,
+        data,
     )
 
 
@@ -121,6 +121,8 @@ class ChartGeneration(BasicPipeline):
     def __init__(
         self,
         llm_provider: LLMProvider,
+        chart_data_max_points: int = 1000,
+        chart_data_max_categories: int = 10,
         **kwargs,
     ):
         self._components = {
@@ -133,14 +135,12 @@ class ChartGeneration(BasicPipeline):
             ),
             "generator_name": llm_provider.get_model(),
             "chart_data_preprocessor": ChartDataPreprocessor(),
-            "post_processor": ChartGenerationPostProcessor(),
-        }
-
-        with open("src/pipelines/generation/utils/vega-lite-schema-v5.json", "r") as f:
-            _vega_schema = orjson.loads(f.read())
-
-        self._configs = {
-            "vega_schema": _vega_schema,
+            "post_processor": ChartGenerationPostProcessor(
+                ChartDataReducer(
+                    max_points=chart_data_max_points,
+                    max_categories=chart_data_max_categories,
+                )
+            ),
         }
 
         super().__init__(
@@ -168,7 +168,6 @@ class ChartGeneration(BasicPipeline):
                 "remove_data_from_chart_schema": remove_data_from_chart_schema,
                 "custom_instruction": custom_instruction or "",
                 **self._components,
-                **self._configs,
             },
         )
 
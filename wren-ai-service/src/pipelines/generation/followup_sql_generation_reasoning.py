@@ -3,10 +3,10 @@ import logging
 import sys
 from typing import Any, Optional
 
+from cachetools import TTLCache
 from hamilton import base
 from hamilton.async_driver import AsyncDriver
 from haystack.components.builders.prompt_builder import PromptBuilder
-from langfuse.decorators import observe
 
 from src.core.pipeline import BasicPipeline
 from src.core.provider import LLMProvider
@@ -14,7 +14,7 @@ from src.pipelines.generation.utils.sql import (
     construct_instructions,
     sql_generation_reasoning_system_prompt,
 )
-from src.utils import trace_cost
+from src.utils import observe, trace_cost
 from src.web.v1.services import Configuration
 from src.web.v1.services.ask import AskHistory
 
@@ -114,6 +114,8 @@ class FollowUpSQLGenerationReasoning(BasicPipeline):
         **kwargs,
     ):
         self._user_queues = {}
+        # the ids of the stopped queries, whose late chunks are dropped
+        self._stopped_query_ids = TTLCache(maxsize=100_000, ttl=120)
         self._components = {
             "generator": llm_provider.get_generator(
                 system_prompt=sql_generation_reasoning_system_prompt,
@@ -130,6 +132,9 @@ class FollowUpSQLGenerationReasoning(BasicPipeline):
         )
 
     def _streaming_callback(self, chunk, query_id):
+        if query_id in self._stopped_query_ids:
+            return
+
         if query_id not in self._user_queues:
             self._user_queues[query_id] = asyncio.Queue()
 
@@ -138,23 +143,32 @@ class FollowUpSQLGenerationReasoning(BasicPipeline):
         if chunk.meta.get("finish_reason"):
             asyncio.create_task(self._user_queues[query_id].put("<DONE>"))
 
+    def stop_streaming_results(self, query_id):
+        # the clients waiting for the results of a stopped query are released, and
+        # the queue is dropped even if no client is reading it
+        self._stopped_query_ids[query_id] = True
+        if (queue := self._user_queues.pop(query_id, None)) is not None:
+            queue.put_nowait("<DONE>")
+
     async def get_streaming_results(self, query_id):
-        async def _get_streaming_results(query_id):
-            return await self._user_queues[query_id].get()
+        if query_id in self._stopped_query_ids:
+            return
 
         if query_id not in self._user_queues:
             self._user_queues[query_id] = asyncio.Queue()
 
+        # the queue is popped when the query is stopped, so it's kept here
+        queue = self._user_queues[query_id]
         while True:
             try:
                 # Wait for an item from the user's queue
                 self._streaming_results = await asyncio.wait_for(
-                    _get_streaming_results(query_id), timeout=120
+                    queue.get(), timeout=120
                 )
                 if (
                     self._streaming_results == "<DONE>"
                 ):  # Check for end-of-stream signal
-                    del self._user_queues[query_id]
+                    self._user_queues.pop(query_id, None)
                     break
                 if self._streaming_results:  # Check if there are results to yield
                     yield self._streaming_results
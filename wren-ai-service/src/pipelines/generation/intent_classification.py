@@ -8,14 +8,13 @@ from hamilton import base
 from hamilton.async_driver import AsyncDriver
 from haystack import Document
 from haystack.components.builders.prompt_builder import PromptBuilder
-from langfuse.decorators import observe
 from pydantic import BaseModel
 
 from src.core.pipeline import BasicPipeline
 from src.core.provider import DocumentStoreProvider, EmbedderProvider, LLMProvider
 from src.pipelines.common import build_table_ddl
 from src.pipelines.generation.utils.sql import construct_instructions
-from src.utils import trace_cost
+from src.utils import observe, trace_cost
 from src.web.v1.services import Configuration
 from src.web.v1.services.ask import AskHistory
 
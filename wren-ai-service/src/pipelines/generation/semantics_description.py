@@ -6,12 +6,11 @@ import orjson
 from hamilton import base
 from hamilton.async_driver import AsyncDriver
 from haystack.components.builders.prompt_builder import PromptBuilder
-from langfuse.decorators import observe
 from pydantic import BaseModel
 
 from src.core.pipeline import BasicPipeline
 from src.core.provider import LLMProvider
-from src.utils import trace_cost
+from src.utils import observe, trace_cost
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -1,12 +1,13 @@
+import asyncio
 import logging
 import sys
 from typing import Any, Dict, List, Optional
 
+import aiohttp
 from hamilton import base
 from hamilton.async_driver import AsyncDriver
 from haystack import Document
 from haystack.components.builders.prompt_builder import PromptBuilder
-from langfuse.decorators import observe
 
 from src.core.engine import Engine
 from src.core.pipeline import BasicPipeline
@@ -15,8 +16,9 @@ from src.pipelines.generation.utils.sql import (
     SQL_GENERATION_MODEL_KWARGS,
     TEXT_TO_SQL_RULES,
     SQLGenPostProcessor,
+    SQLValidator,
 )
-from src.utils import trace_cost
+from src.utils import observe, trace_cost
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -66,37 +68,122 @@ def prompt(
     )
 
 
-@observe(as_type="generation", capture_input=False)
+@observe(name="generate_sql_correction", as_type="generation", capture_input=False)
 @trace_cost
-async def generate_sql_correction(
-    prompt: dict, generator: Any, generator_name: str
+async def _generate_sql_correction(
+    prompt: dict,
+    generator: Any,
+    generator_name: str,
+    generation_kwargs: Optional[Dict[str, Any]] = None,
 ) -> dict:
-    return await generator(prompt=prompt.get("prompt")), generator_name
+    return (
+        await generator(
+            prompt=prompt.get("prompt"), generation_kwargs=generation_kwargs
+        ),
+        generator_name,
+    )
 
 
-@observe(capture_input=False)
-async def post_process(
-    generate_sql_correction: dict,
+async def _correct(
+    prompt: dict,
+    generator: Any,
+    generator_name: str,
+    generation_kwargs: Optional[Dict[str, Any]],
     post_processor: SQLGenPostProcessor,
     engine_timeout: float,
+    session: aiohttp.ClientSession,
     project_id: str | None = None,
 ) -> dict:
+    generate_sql_correction = await _generate_sql_correction(
+        prompt, generator, generator_name, generation_kwargs
+    )
     return await post_processor.run(
         generate_sql_correction.get("replies"),
         timeout=engine_timeout,
         project_id=project_id,
+        session=session,
     )
 
 
+@observe(capture_input=False)
+async def post_process(
+    prompt: dict,
+    generator: Any,
+    generator_name: str,
+    post_processor: SQLGenPostProcessor,
+    engine_timeout: float,
+    candidates: List[Optional[Dict[str, Any]]],
+    project_id: str | None = None,
+) -> dict:
+    """
+    Generates and dry runs the corrections of all the candidates concurrently, and
+    returns the first valid one, the others are cancelled. If none is valid, returns
+    the invalid result of the first candidate which has one, and if every candidate
+    raised, raises the error of the first one, as a single correction does.
+    """
+    async with aiohttp.ClientSession() as session:
+        tasks = [
+            asyncio.create_task(
+                _correct(
+                    prompt,
+                    generator,
+                    generator_name,
+                    generation_kwargs,
+                    post_processor,
+                    engine_timeout,
+                    session,
+                    project_id,
+                )
+            )
+            for generation_kwargs in candidates
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                try:
+                    result = await task
+                except Exception:
+                    continue
+                if result["valid_generation_result"]:
+                    return result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    errors = [task.exception() for task in tasks if task.exception() is not None]
+    if len(errors) == len(tasks):
+        raise errors[0]
+    for error in errors:
+        logger.warning(f"Error in a SQL correction candidate: {error}")
+
+    for task in tasks:
+        if task.exception() is None and task.result()["invalid_generation_result"]:
+            return task.result()
+    return {"valid_generation_result": {}, "invalid_generation_result": {}}
+
+
 ## End of Pipeline
 
 
+def _candidates(count: int) -> List[Optional[Dict[str, Any]]]:
+    """
+    The generation kwargs of the correction candidates: the first one uses the
+    kwargs of the model, the others increasing temperatures, for diverse corrections.
+    """
+    return [None] + [
+        {"temperature": round(0.5 + 0.5 * i / max(count - 2, 1), 2)}
+        for i in range(count - 1)
+    ]
+
+
 class SQLCorrection(BasicPipeline):
     def __init__(
         self,
         llm_provider: LLMProvider,
         engine: Engine,
         engine_timeout: Optional[float] = 30.0,
+        sql_validator: Optional[SQLValidator] = None,
+        candidates: int = 1,
         **kwargs,
     ):
         self._components = {
@@ -108,11 +195,14 @@ class SQLCorrection(BasicPipeline):
             "prompt_builder": PromptBuilder(
                 template=sql_correction_user_prompt_template
             ),
-            "post_processor": SQLGenPostProcessor(engine=engine),
+            "post_processor": SQLGenPostProcessor(
+                engine=engine, sql_validator=sql_validator
+            ),
         }
 
         self._configs = {
             "engine_timeout": engine_timeout,
+            "candidates": _candidates(max(candidates, 1)),
         }
 
         super().__init__(
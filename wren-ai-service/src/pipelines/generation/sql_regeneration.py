@@ -5,7 +5,6 @@ from typing import Any, Optional
 from hamilton import base
 from hamilton.async_driver import AsyncDriver
 from haystack.components.builders.prompt_builder import PromptBuilder
-from langfuse.decorators import observe
 
 from src.core.engine import Engine
 from src.core.pipeline import BasicPipeline
@@ -14,12 +13,13 @@ from src.pipelines.generation.utils.sql import (
     SQL_GENERATION_MODEL_KWARGS,
     TEXT_TO_SQL_RULES,
     SQLGenPostProcessor,
+    SQLValidator,
     calculated_field_instructions,
     construct_instructions,
     metric_instructions,
 )
 from src.pipelines.retrieval.sql_functions import SqlFunction
-from src.utils import trace_cost
+from src.utils import observe, trace_cost
 from src.web.v1.services import Configuration
 
 logger = logging.getLogger("wren-ai-service")
@@ -151,6 +151,7 @@ class SQLRegeneration(BasicPipeline):
         llm_provider: LLMProvider,
         engine: Engine,
         engine_timeout: Optional[float] = 30.0,
+        sql_validator: Optional[SQLValidator] = None,
         **kwargs,
     ):
         self._components = {
@@ -162,7 +163,9 @@ class SQLRegeneration(BasicPipeline):
             "prompt_builder": PromptBuilder(
                 template=sql_regeneration_user_prompt_template
             ),
-            "post_processor": SQLGenPostProcessor(engine=engine),
+            "post_processor": SQLGenPostProcessor(
+                engine=engine, sql_validator=sql_validator
+            ),
         }
 
         self._configs = {
@@ -1,12 +1,21 @@
+import functools
+import itertools
 import logging
-from typing import Any, Dict, Literal, Optional
+import random
+import re
+from typing import Any, Dict, List, Literal, Optional
 
+import numpy as np
 import orjson
 import pandas as pd
 from haystack import component
-from jsonschema import validate
 from jsonschema.exceptions import ValidationError
+from jsonschema.validators import validator_for
 from pydantic import BaseModel, Field
+from pydantic import ValidationError as PydanticValidationError
+
+from src.core import arrow
+from src.core.sql import sql_fingerprint
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -244,8 +253,54 @@ chart_generation_instructions = """
 """
 
 
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+
+def _is_temporal(value: Any) -> bool:
+    return isinstance(value, str) and _ISO_DATE.match(value) is not None
+
+
+def sample_seed(sql: str) -> int:
+    """
+    The seed of the chart data samples of a SQL, so that the same question and SQL
+    give the same prompt.
+    """
+    return int(sql_fingerprint(sql)[:16], 16)
+
+
+def sample_indices(
+    num_rows: int,
+    count: int,
+    extremes: List[int],
+    representatives: List[List[int]],
+    rng: random.Random,
+) -> List[int]:
+    """
+    The sorted indices of `count` rows: the rows of the temporal extremes first, then
+    the representatives of the categorical values, taking the first value of each
+    column, then the second one, etc., and uniformly sampled rows for the rest.
+    """
+    if num_rows <= count:
+        return list(range(num_rows))
+
+    selected = dict.fromkeys(extremes)
+    for values in itertools.zip_longest(*representatives):
+        selected.update(dict.fromkeys(index for index in values if index is not None))
+    selected = set(list(selected)[:count])
+    while len(selected) < count:
+        selected.add(rng.randrange(num_rows))
+    return sorted(selected)
+
+
 @component
 class ChartDataPreprocessor:
+    """
+    Samples the rows of a SQL result for the chart prompts, which cover the temporal
+    range of the result and its categorical values. The samples are deterministic for
+    a given `seed`, see `sample_seed`, and are drawn from the columns of the rows
+    without building a DataFrame.
+    """
+
     @component.output_types(
         sample_data=list[dict],
         sample_column_values=dict[str, Any],
@@ -255,40 +310,419 @@ class ChartDataPreprocessor:
         data: Dict[str, Any],
         sample_data_count: int = 15,
         sample_column_size: int = 5,
+        seed: Optional[int] = None,
     ):
+        rng = random.Random(seed)
+
+        if arrow.is_table(data):
+            extremes, representatives = arrow.strata(
+                data, sample_column_size, _is_temporal
+            )
+            indices = sample_indices(
+                data.num_rows, sample_data_count, extremes, representatives, rng
+            )
+            return {
+                "sample_data": arrow.to_records(data.take(indices)),
+                "sample_column_values": arrow.distinct_values(data, sample_column_size),
+            }
+
         columns = [
             column.get("name", "") if isinstance(column, dict) else column
             for column in data.get("columns", [])
         ]
-        data = data.get("data", [])
+        rows = data.get("data", [])
+
+        # the first distinct values of each column and the rows where they are first
+        # seen, and the rows of the earliest and latest values of the temporal columns
+        first_rows, extremes, representatives = [], [], []
+        for values in zip(*rows) if rows else [()] * len(columns):
+            seen = {}
+            for index, value in enumerate(values):
+                if len(seen) >= sample_column_size:
+                    break
+                try:
+                    seen.setdefault(value, index)
+                except TypeError:
+                    # e.g. lists, which aren't categorical values
+                    pass
+            first_rows.append(seen)
+
+            first = next((value for value in values if value is not None), None)
+            if _is_temporal(first):
+                times = [value for value in values if isinstance(value, str)]
+                extremes += [values.index(min(times)), values.index(max(times))]
+            elif isinstance(first, (str, bool)):
+                representatives.append(
+                    [index for value, index in seen.items() if value is not None]
+                )
+
+        indices = sample_indices(
+            len(rows), sample_data_count, extremes, representatives, rng
+        )
 
-        df = pd.DataFrame(data, columns=columns)
-        sample_column_values = {
-            col: list(df[col].unique())[:sample_column_size] for col in df.columns
+        return {
+            "sample_data": [dict(zip(columns, rows[index])) for index in indices],
+            "sample_column_values": {
+                column: list(seen) for column, seen in zip(columns, first_rows)
+            },
         }
 
-        if len(df) > sample_data_count:
-            sample_data = df.sample(n=sample_data_count).to_dict(orient="records")
+
+# the Vega-Lite time units to which temporal fields are truncated, as pandas periods
+TIME_UNIT_PERIODS = {
+    "year": "Y",
+    "yearquarter": "Q",
+    "yearmonth": "M",
+    "yearweek": "W-SAT",  # the weeks of Vega-Lite start on Sunday
+    "yearmonthdate": "D",
+    "yearmonthdatehours": "h",
+    "yearmonthdatehoursminutes": "min",
+    "yearmonthdatehoursminutesseconds": "s",
+}
+# aggregates which give the same value once applied again on their own result
+IDEMPOTENT_AGGREGATES = {
+    "sum": "sum",
+    "mean": "mean",
+    "average": "mean",
+    "min": "min",
+    "max": "max",
+    "median": "median",
+}
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    The indices of the points kept by the Largest-Triangle-Three-Buckets downsampling
+    of a series sorted by x: the first and last points, and in each of the
+    `threshold - 2` buckets in between, the point forming the largest triangle with the
+    point kept in the previous bucket and the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x, y = x.astype(np.float64), np.nan_to_num(y.astype(np.float64))
+    bounds = 1 + (np.arange(threshold - 1) * (n - 2)) // (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = bounds[i], bounds[i + 1]
+        next_start, next_end = (
+            (bounds[i + 1], bounds[i + 2]) if i + 2 < len(bounds) else (n - 1, n)
+        )
+        next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = indices[i + 1] = start + int(np.argmax(areas))
+
+    return indices
+
+
+def _time_unit(encoding: Dict[str, Any]) -> Optional[str]:
+    unit = encoding.get("timeUnit")
+    if isinstance(unit, dict):
+        unit = unit.get("unit")
+    if not isinstance(unit, str):
+        return None
+    return unit.removeprefix("utc")
+
+
+@component
+class ChartDataReducer:
+    """
+    Reduces the rows of a SQL result embedded in a Vega-Lite chart to at most
+    `max_points` rows, based on the encoding of the chart:
+
+    - a temporal x or y with a time unit is truncated to it and the rows are
+      pre-aggregated, when the quantitative channels have an aggregate which gives the
+      same chart once applied again, e.g. sum or mean
+    - the series of line and area charts are downsampled with LTTB
+    - the categories of bar and pie charts beyond the `max_categories - 1` largest ones
+      are merged into an "Other" category, when their values are summed
+
+    The rows keep the fields used by the chart only. A chart whose rows can't be
+    reduced this way is sampled evenly down to `max_points` rows.
+    """
+
+    def __init__(self, max_points: int = 1000, max_categories: int = 10):
+        self._max_points = max_points
+        self._max_categories = max_categories
+
+    @staticmethod
+    def _dataframe(data: Dict[str, Any]) -> pd.DataFrame:
+        if arrow.is_table(data):
+            return arrow.to_json_types(data).to_pandas()
+
+        columns = [
+            column.get("name", "") if isinstance(column, dict) else column
+            for column in data.get("columns", [])
+        ]
+        return pd.DataFrame(data.get("data", []), columns=columns)
+
+    def _aggregate_time(
+        self,
+        df: pd.DataFrame,
+        channels: Dict[str, Dict[str, Any]],
+        measures: Dict[str, str],
+    ) -> pd.DataFrame:
+        temporal = [
+            channel
+            for channel in ("x", "y")
+            if channel in channels
+            and channels[channel].get("type") == "temporal"
+            and _time_unit(channels[channel]) in TIME_UNIT_PERIODS
+        ]
+        if not temporal or not measures:
+            return df
+
+        field = channels[temporal[0]]["field"]
+        unit = _time_unit(channels[temporal[0]])
+        if field in measures:
+            return df
+        try:
+            times = pd.to_datetime(df[field], errors="coerce")
+        except (TypeError, ValueError):
+            # e.g. times with different offsets
+            return df
+        if times.isna().sum() > df[field].isna().sum():
+            return df
+
+        # dates are formatted the same way as the original values, which are parsed
+        # as UTC or local times by the browser depending on whether they have a time
+        has_time = TIME_UNIT_PERIODS[unit] in ("h", "min", "s") or bool(
+            df[field].dropna().astype(str).str.len().gt(10).any()
+        )
+        truncated = times.dt.to_period(TIME_UNIT_PERIODS[unit]).dt.start_time
+        df = df.assign(
+            **{
+                field: truncated.dt.strftime(
+                    "%Y-%m-%d %H:%M:%S" if has_time else "%Y-%m-%d"
+                )
+            }
+        )
+
+        df = df.assign(
+            **{
+                measure: pd.to_numeric(df[measure], errors="coerce")
+                for measure in measures
+            }
+        )
+        keys = [column for column in df.columns if column not in measures]
+        return (
+            df.groupby(keys, dropna=False, sort=False)
+            .agg(measures)
+            .reset_index()[list(df.columns)]
+        )
+
+    def _downsample_lines(
+        self,
+        df: pd.DataFrame,
+        channels: Dict[str, Dict[str, Any]],
+        measures: List[str],
+    ) -> pd.DataFrame:
+        x = channels.get("x", {})
+        if (
+            len(df) <= self._max_points
+            or x.get("type") not in ("temporal", "quantitative")
+            or not measures
+        ):
+            return df
+
+        keys = [column for column in df.columns if column not in measures]
+        if x["field"] not in keys or df.duplicated(keys).any():
+            # several rows per point, which are aggregated by the chart
+            return df
+
+        if x["type"] == "temporal":
+            positions = pd.to_datetime(df[x["field"]], errors="coerce")
+            if positions.isna().any():
+                return df
+            positions = positions.astype("int64")
+        else:
+            positions = pd.to_numeric(df[x["field"]], errors="coerce")
+        df = df.assign(__position=positions.to_numpy()).sort_values(
+            "__position", kind="stable"
+        )
+
+        series = [column for column in keys if column != x["field"]]
+        groups = (
+            list(df.groupby(series, dropna=False, sort=False).indices.values())
+            if series
+            else [np.arange(len(df))]
+        )
+        threshold = max(self._max_points // (len(groups) * len(measures)), 3)
+
+        kept = set()
+        for indices in groups:
+            group = df.iloc[indices]
+            for measure in measures:
+                kept.update(
+                    indices[
+                        lttb(
+                            group["__position"].to_numpy(),
+                            pd.to_numeric(group[measure], errors="coerce").to_numpy(),
+                            threshold,
+                        )
+                    ].tolist()
+                )
+
+        return df.iloc[sorted(kept)].drop(columns="__position")
+
+    def _merge_categories(
+        self,
+        df: pd.DataFrame,
+        mark: str,
+        channels: Dict[str, Dict[str, Any]],
+    ) -> pd.DataFrame:
+        if mark == "arc":
+            category, value = channels.get("color"), channels.get("theta")
         else:
-            sample_data = df.to_dict(orient="records")
+            x, y = channels.get("x", {}), channels.get("y", {})
+            category, value = (x, y) if y.get("type") == "quantitative" else (y, x)
+        if (
+            not category
+            or not value
+            or category.get("type") != "nominal"
+            or value.get("type") != "quantitative"
+            or value.get("aggregate", "sum") != "sum"
+        ):
+            return df
+
+        totals = (
+            pd.to_numeric(df[value["field"]], errors="coerce")
+            .groupby(df[category["field"]], dropna=False)
+            .sum()
+            .sort_values(ascending=False, kind="stable")
+        )
+        if len(totals) <= self._max_categories:
+            return df
+
+        top = set(totals.index[: self._max_categories - 1])
+        is_top = df[category["field"]].isin(top)
+        others = df[~is_top].assign(
+            **{
+                category["field"]: "Other",
+                value["field"]: pd.to_numeric(
+                    df.loc[~is_top, value["field"]], errors="coerce"
+                ),
+            }
+        )
+        keys = [column for column in df.columns if column != value["field"]]
+        others = (
+            others.groupby(keys, dropna=False, sort=False)[value["field"]]
+            .sum()
+            .reset_index()[list(df.columns)]
+        )
+        return pd.concat([df[is_top], others], ignore_index=True)
+
+    @component.output_types(
+        values=list[dict],
+    )
+    def run(
+        self,
+        chart_schema: Dict[str, Any],
+        data: Dict[str, Any],
+    ):
+        df = self._dataframe(data)
+        mark = chart_schema.get("mark", "")
+        mark = mark.get("type", "") if isinstance(mark, dict) else mark
+
+        channels = {
+            channel: encoding
+            for channel, encoding in chart_schema.get("encoding", {}).items()
+            if isinstance(encoding, dict) and "field" in encoding
+        }
+        tooltips = chart_schema.get("encoding", {}).get("tooltip", [])
+        tooltips = [tooltips] if isinstance(tooltips, dict) else tooltips
+        fields = {encoding["field"] for encoding in channels.values()} | {
+            tooltip["field"]
+            for tooltip in tooltips
+            if isinstance(tooltip, dict) and "field" in tooltip
+        }
+
+        transforms = chart_schema.get("transform", [])
+        folds = [transform for transform in transforms if "fold" in transform]
+        # the measures and their aggregates, i.e. the fields of the quantitative
+        # channels but the x of the lines, or the folded fields for the charts of
+        # several measures
+        measures = {
+            encoding["field"]: encoding.get("aggregate")
+            for channel, encoding in channels.items()
+            if encoding.get("type") == "quantitative"
+            and not (channel == "x" and mark in ("line", "area"))
+        }
+        if len(folds) == 1 and len(transforms) == 1:
+            key, value = folds[0].get("as", ["key", "value"])
+            aggregate = measures.pop(value, None)
+            measures.update({field: aggregate for field in folds[0]["fold"]})
+            fields = (fields - {key, value}) | set(folds[0]["fold"])
+            channels = {
+                channel: encoding
+                for channel, encoding in channels.items()
+                if encoding["field"] not in (key, value)
+            }
+
+        reducible = (
+            "layer" not in chart_schema
+            and (not transforms or len(folds) == len(transforms) == 1)
+            and fields <= set(df.columns)
+        )
+        if reducible:
+            df = df[[column for column in df.columns if column in fields]]
+            if all(
+                aggregate in IDEMPOTENT_AGGREGATES for aggregate in measures.values()
+            ):
+                df = self._aggregate_time(
+                    df,
+                    channels,
+                    {
+                        measure: IDEMPOTENT_AGGREGATES[aggregate]
+                        for measure, aggregate in measures.items()
+                    },
+                )
+            if mark in ("line", "area"):
+                df = self._downsample_lines(df, channels, list(measures))
+            elif mark in ("bar", "arc") and not folds:
+                df = self._merge_categories(df, mark, channels)
+
+        if len(df) > self._max_points:
+            logger.info(
+                f"Sampling {self._max_points} of the {len(df)} rows of the {mark} chart"
+            )
+            df = df.iloc[
+                np.unique(np.linspace(0, len(df) - 1, self._max_points).astype(int))
+            ]
 
         return {
-            "sample_data": sample_data,
-            "sample_column_values": sample_column_values,
+            "values": df.astype(object)
+            .where(df.notna(), None)
+            .to_dict(orient="records")
         }
 
 
 @component
 class ChartGenerationPostProcessor:
+    def __init__(
+        self,
+        data_reducer: Optional[ChartDataReducer] = None,
+        validator: Optional["ChartSchemaValidator"] = None,
+    ):
+        self._data_reducer = data_reducer or ChartDataReducer()
+        self._validator = validator or vega_lite_validator()
+
     @component.output_types(
         results=Dict[str, Any],
     )
     def run(
         self,
         replies: str,
-        vega_schema: Dict[str, Any],
         sample_data: list[dict],
         remove_data_from_chart_schema: Optional[bool] = True,
+        data: Optional[Dict[str, Any]] = None,
     ):
         try:
             generation_result = orjson.loads(replies[0])
@@ -304,10 +738,15 @@ class ChartGenerationPostProcessor:
                 ] = "https://vega.github.io/schema/vega-lite/v5.json"
                 chart_schema["data"] = {"values": sample_data}
 
-                validate(chart_schema, schema=vega_schema)
+                self._validator.validate(chart_schema, chart_type)
 
                 if remove_data_from_chart_schema:
                     chart_schema["data"]["values"] = []
+                elif data is not None:
+                    # the rows of the whole result, reduced to the encoding of the chart
+                    chart_schema["data"]["values"] = self._data_reducer.run(
+                        chart_schema, data
+                    )["values"]
 
                 return {
                     "results": {
@@ -478,3 +917,107 @@ class ChartGenerationResults(BaseModel):
         | StackedBarChartSchema
         | AreaChartSchema
     )
+
+
+VEGA_LITE_SCHEMA_PATH = "src/pipelines/generation/utils/vega-lite-schema-v5.json"
+
+# the chart models whose instances are valid Vega-Lite specifications, i.e. whose
+# fields are all Vega-Lite properties with compatible types, except the time units,
+# which are checked separately; the fold transforms of the multi line charts aren't
+CHART_MODELS = {
+    "line": LineChartSchema,
+    "bar": BarChartSchema,
+    "pie": PieChartSchema,
+    "grouped_bar": GroupedBarChartSchema,
+    "stacked_bar": StackedBarChartSchema,
+    "area": AreaChartSchema,
+}
+
+
+class ChartSchemaValidator:
+    """
+    Validates the chart schemas against the Vega-Lite schema, which is compiled once:
+    into Python code by fastjsonschema when it is installed, else into a jsonschema
+    validator, which skips checking the Vega-Lite schema itself on every call.
+
+    A chart schema which is exactly an instance of the pydantic model of its chart
+    type, e.g. `LineChartSchema`, is valid without going through the Vega-Lite
+    schema. Invalid chart schemas raise a jsonschema `ValidationError`.
+    """
+
+    def __init__(self, vega_schema: Dict[str, Any]):
+        definitions = vega_schema.get("definitions", {})
+        self._time_units = {
+            unit
+            for name in (
+                "LocalSingleTimeUnit",
+                "LocalMultiTimeUnit",
+                "UtcSingleTimeUnit",
+                "UtcMultiTimeUnit",
+            )
+            for unit in definitions.get(name, {}).get("enum", [])
+        }
+
+        try:
+            import fastjsonschema
+
+            # the formats aren't asserted, as with jsonschema by default
+            self._validate = fastjsonschema.compile(
+                vega_schema,
+                formats={"color-hex": lambda _: True},
+            )
+            self._error = fastjsonschema.JsonSchemaValueException
+        except ImportError:
+            logger.info(
+                "fastjsonschema is not installed, chart schemas are validated with jsonschema"
+            )
+            self._validate = self._validator(vega_schema)
+        except fastjsonschema.JsonSchemaDefinitionException as e:
+            logger.warning(f"Vega-Lite schema can't be compiled by fastjsonschema: {e}")
+            self._validate = self._validator(vega_schema)
+
+    def _validator(self, vega_schema: Dict[str, Any]):
+        cls = validator_for(vega_schema)
+        cls.check_schema(vega_schema)
+        self._error = ValidationError
+        return cls(vega_schema).validate
+
+    def _is_chart_model(self, chart_schema: Dict[str, Any], chart_type: str) -> bool:
+        if (model := CHART_MODELS.get(chart_type)) is None:
+            return False
+
+        spec = {
+            key: value
+            for key, value in chart_schema.items()
+            if key not in ("$schema", "data")
+        }
+        try:
+            chart = model.model_validate(spec)
+        except PydanticValidationError:
+            return False
+
+        # no field is missing, added or converted by the model
+        if chart.model_dump(by_alias=True) != spec:
+            return False
+        return all(
+            encoding["timeUnit"] in self._time_units
+            for encoding in spec["encoding"].values()
+            if "timeUnit" in encoding
+        )
+
+    def validate(self, chart_schema: Dict[str, Any], chart_type: str = "") -> None:
+        if self._is_chart_model(chart_schema, chart_type):
+            return
+
+        try:
+            self._validate(chart_schema)
+        except ValidationError:
+            raise
+        except self._error as e:
+            raise ValidationError(e.message) from e
+
+
+@functools.cache
+def vega_lite_validator() -> ChartSchemaValidator:
+    with open(VEGA_LITE_SCHEMA_PATH, "r") as f:
+        return ChartSchemaValidator(orjson.loads(f.read()))
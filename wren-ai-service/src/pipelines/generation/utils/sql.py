@@ -1,4 +1,5 @@
 import logging
+import re
 from typing import Any, Dict, List, Optional
 
 import aiohttp
@@ -6,21 +7,175 @@ import orjson
 from haystack import component
 from haystack.dataclasses import ChatMessage
 from pydantic import BaseModel
+from sqlglot import exp
+from sqlglot.errors import OptimizeError, SqlglotError
+from sqlglot.optimizer.qualify import qualify
+from sqlglot.optimizer.scope import Scope, traverse_scope
+from sqlglot.schema import MappingSchema
 
 from src.core.engine import (
     Engine,
     add_quotes,
     clean_generation_result,
 )
+from src.core.metrics import record_sql_validation
+from src.core.sql import parse_sql
 from src.web.v1.services.ask import AskHistory
 
 logger = logging.getLogger("wren-ai-service")
 
+# the errors of sqlglot for the columns which aren't in the tables of their scope
+_UNRESOLVED_COLUMN = re.compile(
+    r"Unknown column: (.+)$|Column '(.+)' could not be resolved"
+)
+
+
+def mdl_sql_schema(mdl: Dict[str, Any]) -> Dict[str, Optional[Dict[str, str]]]:
+    """
+    The tables of an MDL which a SQL can read and their columns: the models and the
+    metrics, with the types of their columns, and the views, whose columns are unknown,
+    which also hide the columns of a model of the same name.
+    """
+    schema: Dict[str, Optional[Dict[str, str]]] = {}
+    for model in mdl.get("models", []):
+        schema[model["name"]] = {
+            column["name"]: column.get("type") or "UNKNOWN"
+            for column in model.get("columns", [])
+        }
+    for metric in mdl.get("metrics", []):
+        schema[metric["name"]] = {
+            column["name"]: column.get("type") or "UNKNOWN"
+            for key in ("dimension", "measure", "timeGrain")
+            for column in metric.get(key) or []
+        }
+    for view in mdl.get("views", []):
+        schema[view["name"]] = None
+    return schema
+
+
+class SQLValidator:
+    """
+    Checks the table and column references of the generated SQLs against the MDL
+    deployed for their project, see `set_mdl`, so that the SQLs which would certainly
+    fail the engine dry run are rejected without a request to the engine:
+
+    - the tables which are neither models, metrics, views nor CTEs
+    - the columns which aren't in the tables of their scope
+    - the unqualified columns which are in several tables of their scope
+
+    The errors are worded like the ones of the engine. The SQLs which can't be fully
+    checked, e.g. which read views, or which sqlglot can't resolve for other reasons,
+    are left to the engine. The arity of the functions known to sqlglot is already
+    checked when the SQL is parsed, see `add_quotes`.
+    """
+
+    def __init__(self):
+        # the names are compared case-insensitively, as some engines do
+        self._schemas: Dict[str, Dict[str, Optional[Dict[str, str]]]] = {}
+
+    def set_mdl(self, project_id: Optional[str], mdl: Optional[Dict[str, Any]]) -> None:
+        if mdl is None:
+            self._schemas.pop(project_id or "", None)
+            return
+
+        self._schemas[project_id or ""] = {
+            table.lower(): None
+            if columns is None
+            else {column.lower(): type for column, type in columns.items()}
+            for table, columns in mdl_sql_schema(mdl).items()
+        }
+
+    @staticmethod
+    def _ambiguous_column(
+        scope: Scope, schema: Dict[str, Optional[Dict[str, str]]]
+    ) -> Optional[str]:
+        sources = []
+        for _, source in scope.selected_sources.values():
+            if isinstance(source, exp.Table):
+                sources.append(set(schema.get(source.name) or {}))
+            elif isinstance(source, Scope) and not source.expression.is_star:
+                sources.append(set(source.expression.named_selects))
+            else:
+                # e.g. UNNEST, whose columns aren't known
+                return None
+
+        # the output aliases, and the columns joined with USING, which are merged
+        aliases = {
+            select.alias
+            for select in getattr(scope.expression, "expressions", [])
+            if isinstance(select, exp.Alias)
+        }
+        for join in scope.expression.args.get("joins") or []:
+            if join.method == "NATURAL":
+                return None
+            aliases.update(column.name for column in join.args.get("using") or [])
+
+        for column in scope.unqualified_columns:
+            if column.name in aliases:
+                continue
+            if sum(column.name in columns for columns in sources) > 1:
+                return column.name
+        return None
+
+    def validate(self, sql: str, project_id: Optional[str] = None) -> Optional[str]:
+        """
+        The error of the SQL, quoted by `add_quotes`, if it certainly fails, else None.
+        """
+        if (schema := self._schemas.get(project_id or "")) is None:
+            return None
+
+        try:
+            expression = parse_sql(sql)
+        except SqlglotError:
+            return None
+
+        names = {}
+        for identifier in expression.find_all(exp.Identifier):
+            names.setdefault(identifier.this.lower(), identifier.this)
+            identifier.set("this", identifier.this.lower())
+
+        ctes = {cte.alias_or_name for cte in expression.find_all(exp.CTE)}
+        tables = {
+            table.name
+            for table in expression.find_all(exp.Table)
+            if table.name and table.name not in ctes
+        }
+        for table in tables:
+            if table not in schema:
+                return f"Table '{names[table]}' does not exist"
+        if any(schema[table] is None for table in tables):
+            # the columns of the views aren't known
+            return None
+
+        try:
+            for scope in traverse_scope(expression):
+                if column := self._ambiguous_column(scope, schema):
+                    return f"Column '{names[column]}' is ambiguous"
+
+            qualify(
+                expression,
+                schema=MappingSchema(
+                    {table: schema[table] for table in tables}, normalize=False
+                ),
+                quote_identifiers=False,
+                validate_qualify_columns=True,
+            )
+        except OptimizeError as e:
+            if match := _UNRESOLVED_COLUMN.match(str(e)):
+                column = (match.group(1) or match.group(2)).strip('"')
+                return f"Column '{names.get(column, column)}' cannot be resolved"
+            return None
+        except Exception:
+            return None
+
+        return None
+
 
 @component
 class SQLGenPostProcessor:
-    def __init__(self, engine: Engine):
+    def __init__(self, engine: Engine, sql_validator: Optional[SQLValidator] = None):
         self._engine = engine
+        self._sql_validator = sql_validator
 
     @component.output_types(
         valid_generation_result=Dict[str, Any],
@@ -31,6 +186,7 @@ class SQLGenPostProcessor:
         replies: List[str] | List[List[str]],
         timeout: Optional[float] = 30.0,
         project_id: str | None = None,
+        session: Optional[aiohttp.ClientSession] = None,
     ) -> dict:
         try:
             cleaned_generation_result = clean_generation_result(replies[0])
@@ -48,6 +204,7 @@ class SQLGenPostProcessor:
                 cleaned_generation_result,
                 project_id=project_id,
                 timeout=timeout,
+                session=session,
             )
 
             return {
@@ -67,39 +224,65 @@ class SQLGenPostProcessor:
         generation_result: str,
         timeout: float,
         project_id: str | None = None,
+        session: Optional[aiohttp.ClientSession] = None,
+    ) -> Dict[str, str]:
+        quoted_sql, error_message = add_quotes(generation_result)
+
+        if error_message:
+            return {}, {
+                "sql": generation_result,
+                "type": "ADD_QUOTES",
+                "error": error_message,
+            }
+
+        if self._sql_validator is not None:
+            if validation_error := self._sql_validator.validate(quoted_sql, project_id):
+                record_sql_validation("rejected")
+                return {}, {
+                    "sql": quoted_sql,
+                    "type": "DRY_RUN",
+                    "error": validation_error,
+                }
+
+        if session is None:
+            async with aiohttp.ClientSession() as session:
+                return await self._dry_run(quoted_sql, session, timeout, project_id)
+        return await self._dry_run(quoted_sql, session, timeout, project_id)
+
+    async def _dry_run(
+        self,
+        quoted_sql: str,
+        session: aiohttp.ClientSession,
+        timeout: float,
+        project_id: str | None = None,
     ) -> Dict[str, str]:
         valid_generation_result = {}
         invalid_generation_result = {}
 
-        quoted_sql, error_message = add_quotes(generation_result)
+        status, _, addition = await self._engine.execute_sql(
+            quoted_sql, session, project_id=project_id, timeout=timeout
+        )
 
-        async with aiohttp.ClientSession() as session:
-            if not error_message:
-                status, _, addition = await self._engine.execute_sql(
-                    quoted_sql, session, project_id=project_id, timeout=timeout
-                )
-
-                if status:
-                    valid_generation_result = {
-                        "sql": quoted_sql,
-                        "correlation_id": addition.get("correlation_id", ""),
-                    }
-                else:
-                    error_message = addition.get("error_message", "")
-                    invalid_generation_result = {
-                        "sql": quoted_sql,
-                        "type": "TIME_OUT"
-                        if error_message.startswith("Request timed out")
-                        else "DRY_RUN",
-                        "error": error_message,
-                        "correlation_id": addition.get("correlation_id", ""),
-                    }
-            else:
-                invalid_generation_result = {
-                    "sql": generation_result,
-                    "type": "ADD_QUOTES",
-                    "error": error_message,
-                }
+        if status:
+            valid_generation_result = {
+                "sql": quoted_sql,
+                "correlation_id": addition.get("correlation_id", ""),
+            }
+        else:
+            error_message = addition.get("error_message", "")
+            invalid_generation_result = {
+                "sql": quoted_sql,
+                "type": "TIME_OUT"
+                if error_message.startswith("Request timed out")
+                else "DRY_RUN",
+                "error": error_message,
+                "correlation_id": addition.get("correlation_id", ""),
+            }
+
+        if self._sql_validator is not None:
+            record_sql_validation(
+                invalid_generation_result.get("type", "PASSED").lower()
+            )
 
         return valid_generation_result, invalid_generation_result
 
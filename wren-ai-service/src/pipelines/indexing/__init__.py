@@ -1,6 +1,8 @@
 import asyncio
 import json
 import logging
+import uuid
+from functools import cached_property
 from typing import Any, Dict, List, Optional
 
 import orjson
@@ -10,19 +12,51 @@ from haystack.document_stores.types import DocumentStore, DuplicatePolicy
 
 logger = logging.getLogger("wren-ai-service")
 
+_DOCUMENT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "https://getwren.ai/documents")
+
+
+def document_id(*parts: Any) -> str:
+    """
+    A deterministic document id derived from the identity of the indexed entity, e.g.
+    the project id, type and name, so that indexing the entity again overwrites its
+    document instead of adding a new one, unless it is written to another index
+    generation, see `AsyncDocumentWriter`.
+    """
+    return str(
+        uuid.uuid5(
+            _DOCUMENT_ID_NAMESPACE, "\x1f".join(str(part or "") for part in parts)
+        )
+    )
+
 
 @component
 class DocumentCleaner:
     """
     This component is used to clear all the documents in the specified document store(s).
 
+    With `generation`, only the documents of that index generation are cleared; with
+    `retain`, the documents of every generation but that one are cleared; with
+    `keep_ids`, the documents with those ids are kept, so that only the orphans of a
+    re-index are cleared.
+
+    The documents are only kept this way when they are indexed without a generation:
+    their ids are deterministic, see `document_id`, so a re-index overwrites them in
+    place. The ids of the documents written to a generation are scoped by it, so a
+    re-index writes new documents next to the active ones and the previous generation
+    is cleared with `retain` once the new one is active.
     """
 
     def __init__(self, stores: List[DocumentStore]) -> None:
         self._stores = stores
 
     @component.output_types()
-    async def run(self, project_id: Optional[str] = None) -> None:
+    async def run(
+        self,
+        project_id: Optional[str] = None,
+        generation: Optional[str] = None,
+        retain: Optional[str] = None,
+        keep_ids: Optional[List[str]] = None,
+    ) -> None:
         async def _clear_documents(
             store: DocumentStore, project_id: Optional[str] = None
         ) -> None:
@@ -30,15 +64,25 @@ class DocumentCleaner:
                 store.to_dict().get("init_parameters", {}).get("index", "unknown")
             )
             logger.info(f"Project ID: {project_id}, Cleaning documents in {store_name}")
+            conditions = []
+            if project_id:
+                conditions.append(
+                    {"field": "project_id", "operator": "==", "value": project_id}
+                )
+            if generation:
+                conditions.append(
+                    {"field": "generation", "operator": "==", "value": generation}
+                )
+            if retain:
+                conditions.append(
+                    {"field": "generation", "operator": "!=", "value": retain}
+                )
+            if keep_ids:
+                conditions.append(
+                    {"field": "id", "operator": "not in", "value": keep_ids}
+                )
             filters = (
-                {
-                    "operator": "AND",
-                    "conditions": [
-                        {"field": "project_id", "operator": "==", "value": project_id},
-                    ],
-                }
-                if project_id
-                else None
+                {"operator": "AND", "conditions": conditions} if conditions else None
             )
             await store.delete_documents(filters)
 
@@ -47,6 +91,53 @@ class DocumentCleaner:
         )
 
 
+class ParsedMDL(dict):
+    """
+    The MDL parsed and validated once per deployment and shared by all the indexing
+    pipelines, instead of each pipeline parsing the MDL string again.
+
+    It is the MDL dict itself, with `models`, `views`, `relationships` and `metrics`
+    always present, plus indexes which are only built when a pipeline reads them,
+    so it should be treated as read-only.
+    """
+
+    @classmethod
+    def parse(cls, mdl: str | bytes | Dict[str, Any]) -> "ParsedMDL":
+        if isinstance(mdl, ParsedMDL):
+            return mdl
+
+        if isinstance(mdl, dict):
+            mdl_json = mdl
+        else:
+            try:
+                mdl_json = orjson.loads(mdl)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON: {e}")
+
+        parsed = cls(mdl_json)
+        for key in ("models", "views", "relationships", "metrics"):
+            if key not in parsed:
+                parsed[key] = []
+
+        logger.info(
+            f"MDL parsed: {len(parsed['models'])} models, {len(parsed['views'])} views, "
+            f"{len(parsed['relationships'])} relationships, {len(parsed['metrics'])} metrics"
+        )
+        return parsed
+
+    @cached_property
+    def relationships_by_model(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        The relationships indexed by the name of each model they join, in the order
+        of the MDL.
+        """
+        index: Dict[str, List[Dict[str, Any]]] = {}
+        for relationship in self["relationships"]:
+            for model in dict.fromkeys(relationship.get("models", [])):
+                index.setdefault(model, []).append(relationship)
+        return index
+
+
 @component
 class MDLValidator:
     """
@@ -55,32 +146,28 @@ class MDLValidator:
 
     @component.output_types(mdl=Dict[str, Any])
     def run(self, mdl: str) -> str:
-        try:
-            mdl_json = orjson.loads(mdl)
-            logger.info(f"MDL JSON: {mdl_json}")
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON: {e}")
-        if "models" not in mdl_json:
-            mdl_json["models"] = []
-        if "views" not in mdl_json:
-            mdl_json["views"] = []
-        if "relationships" not in mdl_json:
-            mdl_json["relationships"] = []
-        if "metrics" not in mdl_json:
-            mdl_json["metrics"] = []
-
-        return {"mdl": mdl_json}
+        return {"mdl": ParsedMDL.parse(mdl)}
 
 
 @component
 class AsyncDocumentWriter(DocumentWriter):
     @component.output_types(documents_written=int)
     async def run(
-        self, documents: List[Document], policy: Optional[DuplicatePolicy] = None
+        self,
+        documents: List[Document],
+        policy: Optional[DuplicatePolicy] = None,
+        generation: Optional[str] = None,
     ):
         if policy is None:
             policy = self.policy
 
+        if generation:
+            # the ids are scoped by the generation, so the active documents of the
+            # same entities are not overwritten
+            for document in documents:
+                document.id = document_id(generation, document.id)
+                document.meta["generation"] = generation
+
         documents_written = await self.document_store.write_documents(
             documents=documents, policy=policy
         )
@@ -1,22 +1,25 @@
 import asyncio
 import logging
 import sys
-import uuid
-from typing import Any, Dict, List, Optional
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 
 from hamilton import base
 from hamilton.async_driver import AsyncDriver
-from hamilton.function_modifiers import extract_fields
 from haystack import Document, component
 from haystack.components.writers import DocumentWriter
 from haystack.document_stores.types import DuplicatePolicy
-from langfuse.decorators import observe
-from tqdm import tqdm
 
 from src.core.pipeline import BasicPipeline
 from src.core.provider import DocumentStoreProvider, EmbedderProvider
-from src.pipelines.indexing import AsyncDocumentWriter, DocumentCleaner, MDLValidator
+from src.pipelines.indexing import (
+    AsyncDocumentWriter,
+    DocumentCleaner,
+    ParsedMDL,
+    document_id,
+)
 from src.pipelines.indexing.utils import helper
+from src.utils import observe
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -30,34 +33,42 @@ class DDLChunker:
         column_batch_size: int,
         project_id: Optional[str] = None,
     ):
-        def _additional_meta() -> Dict[str, Any]:
-            return {"project_id": project_id} if project_id else {}
-
-        chunks = [
-            {
-                "id": str(uuid.uuid4()),
-                "meta": {
-                    "type": "TABLE_SCHEMA",
-                    "name": chunk["name"],
-                    **_additional_meta(),
-                },
-                "content": chunk["payload"],
-            }
-            for chunk in await self._get_ddl_commands(
-                **mdl, column_batch_size=column_batch_size
-            )
-        ]
-
         return {
             "documents": [
-                Document(**chunk)
-                for chunk in tqdm(
-                    chunks,
-                    desc=f"Project ID: {project_id}, Chunking DDL commands into documents",
-                )
+                document
+                async for document in self.stream(mdl, column_batch_size, project_id)
             ]
         }
 
+    async def stream(
+        self,
+        mdl: Dict[str, Any],
+        column_batch_size: int,
+        project_id: Optional[str] = None,
+    ) -> AsyncIterator[Document]:
+        """
+        Yield the documents one by one as the DDL commands are produced, so that they
+        can be embedded while the rest of the MDL is still being chunked.
+        """
+        addition = {"project_id": project_id} if project_id else {}
+        # a model is chunked into several documents, which are told apart by their order
+        batches = Counter()
+
+        async for command in self._get_ddl_commands(
+            ParsedMDL.parse(mdl), column_batch_size=column_batch_size
+        ):
+            batches[command["name"]] += 1
+            yield Document(
+                id=document_id(
+                    project_id,
+                    "TABLE_SCHEMA",
+                    command["name"],
+                    batches[command["name"]],
+                ),
+                meta={"type": "TABLE_SCHEMA", "name": command["name"], **addition},
+                content=command["payload"],
+            )
+
     async def _model_preprocessor(
         self, models: List[Dict[str, Any]], **kwargs
     ) -> List[Dict[str, Any]]:
@@ -101,29 +112,33 @@ class DDLChunker:
 
     async def _get_ddl_commands(
         self,
-        models: List[Dict[str, Any]],
-        relationships: List[Dict[str, Any]],
-        views: List[Dict[str, Any]],
-        metrics: List[Dict[str, Any]],
+        mdl: ParsedMDL,
         column_batch_size: int = 50,
-        **kwargs,
-    ) -> List[dict]:
-        return (
-            self._convert_models_and_relationships(
-                await self._model_preprocessor(models, **kwargs),
-                relationships,
-                column_batch_size,
-            )
-            + self._convert_views(views)
-            + self._convert_metrics(metrics)
-        )
+    ) -> AsyncIterator[dict]:
+        # the rest of the MDL, e.g. catalog and schema, is passed to the model preprocessors
+        kwargs = {
+            key: value
+            for key, value in mdl.items()
+            if key not in ("models", "relationships", "views", "metrics")
+        }
+
+        for command in self._convert_models_and_relationships(
+            await self._model_preprocessor(mdl["models"], **kwargs),
+            mdl.relationships_by_model,
+            column_batch_size,
+        ):
+            yield command
+        for command in self._convert_views(mdl["views"]):
+            yield command
+        for command in self._convert_metrics(mdl["metrics"]):
+            yield command
 
     def _convert_models_and_relationships(
         self,
         models: List[Dict[str, Any]],
-        relationships: List[Dict[str, Any]],
+        relationships_by_model: Dict[str, List[Dict[str, Any]]],
         column_batch_size: int,
-    ) -> List[str]:
+    ) -> Iterator[dict]:
         def _model_command(model: Dict[str, Any]) -> dict:
             properties = model.get("properties", {})
 
@@ -159,6 +174,9 @@ class DDLChunker:
                 "is_primary_key": column["name"] == model["primaryKey"],
             }
 
+        # the condition of a relationship is split once, even though it's used by both models
+        condition_parts: Dict[int, List[str]] = {}
+
         def _relationship_command(
             relationship: Dict[str, Any],
             table_name: str,
@@ -180,8 +198,9 @@ class DDLChunker:
             # Get related table and foreign key column
             is_source = table_name == models[0]
             related_table = models[1] if is_source else models[0]
-            condition_parts = condition.split(" = ")
-            fk_column = condition_parts[0 if is_source else 1].split(".")[1]
+            if (parts := condition_parts.get(id(relationship))) is None:
+                parts = condition_parts[id(relationship)] = condition.split(" = ")
+            fk_column = parts[0 if is_source else 1].split(".")[1]
 
             # Build foreign key constraint
             fk_constraint = f"FOREIGN KEY ({fk_column}) REFERENCES {related_table}({primary_keys_map[related_table]})"
@@ -200,7 +219,7 @@ class DDLChunker:
                 _column_command(column, model) for column in model["columns"]
             ] + [
                 _relationship_command(relationship, model["name"], primary_keys_map)
-                for relationship in relationships
+                for relationship in relationships_by_model.get(model["name"], [])
             ]
 
             filtered = [command for command in commands if command is not None]
@@ -221,12 +240,9 @@ class DDLChunker:
         # A map to store model primary keys for foreign key relationships
         primary_keys_map = {model["name"]: model["primaryKey"] for model in models}
 
-        return [
-            command
-            for model in models
-            for command in _column_batch(model, primary_keys_map)
-            + [_model_command(model)]
-        ]
+        for model in models:
+            yield from _column_batch(model, primary_keys_map)
+            yield _model_command(model)
 
     def _convert_views(self, views: List[Dict[str, Any]]) -> List[str]:
         def _payload(view: Dict[str, Any]) -> dict:
@@ -288,29 +304,52 @@ class DDLChunker:
 
 ## Start of Pipeline
 @observe(capture_input=False, capture_output=False)
-@extract_fields(dict(mdl=Dict[str, Any]))
-def validate_mdl(mdl_str: str, validator: MDLValidator) -> Dict[str, Any]:
-    res = validator.run(mdl=mdl_str)
-    return dict(mdl=res["mdl"])
-
-
-@observe(capture_input=False)
-async def chunk(
+async def embedding(
     mdl: Dict[str, Any],
     chunker: DDLChunker,
+    embedder: Any,
     column_batch_size: int,
+    embedding_batch_size: int,
+    embedding_concurrency: int,
     project_id: Optional[str] = None,
 ) -> Dict[str, Any]:
-    return await chunker.run(
-        mdl=mdl,
-        column_batch_size=column_batch_size,
-        project_id=project_id,
-    )
-
-
-@observe(capture_input=False, capture_output=False)
-async def embedding(chunk: Dict[str, Any], embedder: Any) -> Dict[str, Any]:
-    return await embedder.run(documents=chunk["documents"])
+    """
+    Embed the chunks batch by batch while the MDL is still being chunked, instead of
+    waiting for the whole MDL to be chunked first.
+    """
+    semaphore = asyncio.Semaphore(embedding_concurrency)
+
+    async def _embed(documents: List[Document]) -> Dict[str, Any]:
+        async with semaphore:
+            return await embedder.run(documents=documents)
+
+    tasks, batch = [], []
+    try:
+        async for document in chunker.stream(
+            mdl=mdl,
+            column_batch_size=column_batch_size,
+            project_id=project_id,
+        ):
+            batch.append(document)
+            if len(batch) >= embedding_batch_size:
+                tasks.append(asyncio.create_task(_embed(batch)))
+                batch = []
+                # let the embedding request start before chunking the next batch
+                await asyncio.sleep(0)
+        if batch:
+            tasks.append(asyncio.create_task(_embed(batch)))
+
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    return {
+        "documents": [
+            document for result in results for document in result["documents"]
+        ]
+    }
 
 
 @observe(capture_input=False, capture_output=False)
@@ -318,14 +357,23 @@ async def clean(
     embedding: Dict[str, Any],
     cleaner: DocumentCleaner,
     project_id: Optional[str] = None,
+    generation: Optional[str] = None,
 ) -> Dict[str, Any]:
-    await cleaner.run(project_id=project_id)
+    if generation is None:
+        await cleaner.run(
+            project_id=project_id,
+            keep_ids=[document.id for document in embedding["documents"]],
+        )
     return embedding
 
 
 @observe(capture_input=False)
-async def write(clean: Dict[str, Any], writer: DocumentWriter) -> None:
-    return await writer.run(documents=clean["documents"])
+async def write(
+    clean: Dict[str, Any],
+    writer: DocumentWriter,
+    generation: Optional[str] = None,
+) -> None:
+    return await writer.run(documents=clean["documents"], generation=generation)
 
 
 ## End of Pipeline
@@ -337,13 +385,14 @@ class DBSchema(BasicPipeline):
         embedder_provider: EmbedderProvider,
         document_store_provider: DocumentStoreProvider,
         column_batch_size: Optional[int] = 50,
+        embedding_batch_size: Optional[int] = 32,
+        embedding_concurrency: Optional[int] = 4,
         **kwargs,
     ) -> None:
         dbschema_store = document_store_provider.get_store()
 
         self._components = {
             "cleaner": DocumentCleaner([dbschema_store]),
-            "validator": MDLValidator(),
             "embedder": embedder_provider.get_document_embedder(),
             "chunker": DDLChunker(),
             "writer": AsyncDocumentWriter(
@@ -353,6 +402,8 @@ class DBSchema(BasicPipeline):
         }
         self._configs = {
             "column_batch_size": column_batch_size,
+            "embedding_batch_size": embedding_batch_size,
+            "embedding_concurrency": embedding_concurrency,
         }
         self._final = "write"
 
@@ -363,7 +414,11 @@ class DBSchema(BasicPipeline):
 
     @observe(name="DB Schema Indexing")
     async def run(
-        self, mdl_str: str, project_id: Optional[str] = None
+        self,
+        mdl_str: Optional[str] = None,
+        project_id: Optional[str] = None,
+        mdl: Optional[ParsedMDL] = None,
+        generation: Optional[str] = None,
     ) -> Dict[str, Any]:
         logger.info(
             f"Project ID: {project_id}, DB Schema Indexing pipeline is running..."
@@ -371,19 +426,23 @@ class DBSchema(BasicPipeline):
         return await self._pipe.execute(
             [self._final],
             inputs={
-                "mdl_str": mdl_str,
+                "mdl": mdl or ParsedMDL.parse(mdl_str),
                 "project_id": project_id,
+                "generation": generation,
                 **self._components,
                 **self._configs,
             },
         )
 
     @observe(name="Clean Documents for DB Schema")
-    async def clean(self, project_id: Optional[str] = None) -> None:
-        await clean(
-            embedding={"documents": []},
-            cleaner=self._components["cleaner"],
-            project_id=project_id,
+    async def clean(
+        self,
+        project_id: Optional[str] = None,
+        generation: Optional[str] = None,
+        retain: Optional[str] = None,
+    ) -> None:
+        await self._components["cleaner"].run(
+            project_id=project_id, generation=generation, retain=retain
         )
 
 
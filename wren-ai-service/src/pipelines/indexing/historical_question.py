@@ -1,20 +1,23 @@
 import logging
 import sys
-import uuid
 from typing import Any, Dict, List, Optional
 
 from hamilton import base
 from hamilton.async_driver import AsyncDriver
-from hamilton.function_modifiers import extract_fields
 from haystack import Document, component
 from haystack.components.writers import DocumentWriter
 from haystack.document_stores.types import DuplicatePolicy
-from langfuse.decorators import observe
 from tqdm import tqdm
 
 from src.core.pipeline import BasicPipeline
 from src.core.provider import DocumentStoreProvider, EmbedderProvider
-from src.pipelines.indexing import AsyncDocumentWriter, DocumentCleaner, MDLValidator
+from src.pipelines.indexing import (
+    AsyncDocumentWriter,
+    DocumentCleaner,
+    ParsedMDL,
+    document_id,
+)
+from src.utils import observe
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -74,7 +77,7 @@ class ViewChunker:
 
         chunks = [
             {
-                "id": str(uuid.uuid4()),
+                "id": document_id(project_id, "VIEW", view.get("name")),
                 "content": _get_content(view),
                 "meta": {**_get_meta(view), **_additional_meta()},
             }
@@ -93,13 +96,6 @@ class ViewChunker:
 
 
 ## Start of Pipeline
-@observe(capture_input=False, capture_output=False)
-@extract_fields(dict(mdl=Dict[str, Any]))
-def validate_mdl(mdl_str: str, validator: MDLValidator) -> Dict[str, Any]:
-    res = validator.run(mdl=mdl_str)
-    return dict(mdl=res["mdl"])
-
-
 @observe(capture_input=False)
 def chunk(
     mdl: Dict[str, Any],
@@ -119,14 +115,23 @@ async def clean(
     embedding: Dict[str, Any],
     cleaner: DocumentCleaner,
     project_id: Optional[str] = None,
+    generation: Optional[str] = None,
 ) -> Dict[str, Any]:
-    await cleaner.run(project_id=project_id)
+    if generation is None:
+        await cleaner.run(
+            project_id=project_id,
+            keep_ids=[document.id for document in embedding["documents"]],
+        )
     return embedding
 
 
 @observe(capture_input=False)
-async def write(clean: Dict[str, Any], writer: DocumentWriter) -> None:
-    return await writer.run(documents=clean["documents"])
+async def write(
+    clean: Dict[str, Any],
+    writer: DocumentWriter,
+    generation: Optional[str] = None,
+) -> None:
+    return await writer.run(documents=clean["documents"], generation=generation)
 
 
 ## End of Pipeline
@@ -144,7 +149,6 @@ class HistoricalQuestion(BasicPipeline):
 
         self._components = {
             "cleaner": DocumentCleaner([store]),
-            "validator": MDLValidator(),
             "embedder": embedder_provider.get_document_embedder(),
             "chunker": ViewChunker(),
             "writer": AsyncDocumentWriter(
@@ -161,7 +165,11 @@ class HistoricalQuestion(BasicPipeline):
 
     @observe(name="Historical Question Indexing")
     async def run(
-        self, mdl_str: str, project_id: Optional[str] = None
+        self,
+        mdl_str: Optional[str] = None,
+        project_id: Optional[str] = None,
+        mdl: Optional[ParsedMDL] = None,
+        generation: Optional[str] = None,
     ) -> Dict[str, Any]:
         logger.info(
             f"Project ID: {project_id}, Historical Question Indexing pipeline is running..."
@@ -169,19 +177,23 @@ class HistoricalQuestion(BasicPipeline):
         return await self._pipe.execute(
             [self._final],
             inputs={
-                "mdl_str": mdl_str,
+                "mdl": mdl or ParsedMDL.parse(mdl_str),
                 "project_id": project_id,
+                "generation": generation,
                 **self._components,
                 **self._configs,
             },
         )
 
     @observe(name="Clean Documents for Historical Question")
-    async def clean(self, project_id: Optional[str] = None) -> None:
-        await clean(
-            embedding={"documents": []},
-            cleaner=self._components["cleaner"],
-            project_id=project_id,
+    async def clean(
+        self,
+        project_id: Optional[str] = None,
+        generation: Optional[str] = None,
+        retain: Optional[str] = None,
+    ) -> None:
+        await self._components["cleaner"].run(
+            project_id=project_id, generation=generation, retain=retain
         )
 
 
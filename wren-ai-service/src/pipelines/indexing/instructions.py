@@ -1,18 +1,17 @@
 import logging
 import sys
-import uuid
 from typing import Any, Dict, List, Optional
 
 from hamilton import base
 from hamilton.async_driver import AsyncDriver
 from haystack import Document, component
 from haystack.document_stores.types import DocumentStore, DuplicatePolicy
-from langfuse.decorators import observe
 from pydantic import BaseModel
 
 from src.core.pipeline import BasicPipeline
 from src.core.provider import DocumentStoreProvider, EmbedderProvider
-from src.pipelines.indexing import AsyncDocumentWriter
+from src.pipelines.indexing import AsyncDocumentWriter, document_id
+from src.utils import observe
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -36,7 +35,7 @@ class InstructionsConverter:
         return {
             "documents": [
                 Document(
-                    id=str(uuid.uuid4()),
+                    id=document_id(project_id, "INSTRUCTION", instruction.id),
                     meta={
                         "instruction_id": instruction.id,
                         "instruction": instruction.instruction,
@@ -59,7 +58,10 @@ class InstructionsCleaner:
 
     @component.output_types()
     async def run(
-        self, instruction_ids: List[str], project_id: Optional[str] = None
+        self,
+        instruction_ids: List[str],
+        project_id: Optional[str] = None,
+        keep_ids: Optional[List[str]] = None,
     ) -> None:
         filter = {
             "operator": "AND",
@@ -73,6 +75,12 @@ class InstructionsCleaner:
                 {"field": "project_id", "operator": "==", "value": project_id}
             )
 
+        # see `keep_ids` of `DocumentCleaner`
+        if keep_ids:
+            filter["conditions"].append(
+                {"field": "id", "operator": "not in", "value": keep_ids}
+            )
+
         return await self.store.delete_documents(filter)
 
 
@@ -106,7 +114,11 @@ async def clean(
 ) -> Dict[str, Any]:
     instruction_ids = [instruction.id for instruction in instructions]
     if instruction_ids or delete_all:
-        await cleaner.run(instruction_ids=instruction_ids, project_id=project_id)
+        await cleaner.run(
+            instruction_ids=instruction_ids,
+            project_id=project_id,
+            keep_ids=[document.id for document in embedding.get("documents", [])],
+        )
 
     return embedding
 
@@ -1,31 +1,27 @@
 import logging
 import sys
-import uuid
 from typing import Any, Optional
 
 from hamilton import base
 from hamilton.async_driver import AsyncDriver
-from hamilton.function_modifiers import extract_fields
 from haystack import Document
 from haystack.components.writers import DocumentWriter
 from haystack.document_stores.types import DuplicatePolicy
-from langfuse.decorators import observe
 
 from src.core.pipeline import BasicPipeline
 from src.core.provider import DocumentStoreProvider
-from src.pipelines.indexing import AsyncDocumentWriter, DocumentCleaner, MDLValidator
+from src.pipelines.indexing import (
+    AsyncDocumentWriter,
+    DocumentCleaner,
+    ParsedMDL,
+    document_id,
+)
+from src.utils import observe
 
 logger = logging.getLogger("wren-ai-service")
 
 
 ## Start of Pipeline
-@observe(capture_input=False, capture_output=False)
-@extract_fields(dict(mdl=dict[str, Any]))
-def validate_mdl(mdl_str: str, validator: MDLValidator) -> dict[str, Any]:
-    res = validator.run(mdl=mdl_str)
-    return dict(mdl=res["mdl"])
-
-
 @observe(capture_input=False)
 def chunk(
     mdl: dict[str, Any],
@@ -39,7 +35,7 @@ def chunk(
         data_source = "local_file"
 
     document = Document(
-        id=str(uuid.uuid4()),
+        id=document_id(project_id, "PROJECT_META"),
         meta={"data_source": data_source, **addition},
     )
     return {"documents": [document]}
@@ -50,14 +46,23 @@ async def clean(
     chunk: dict[str, Any],
     cleaner: DocumentCleaner,
     project_id: Optional[str] = None,
+    generation: Optional[str] = None,
 ) -> dict[str, Any]:
-    await cleaner.run(project_id=project_id)
+    if generation is None:
+        await cleaner.run(
+            project_id=project_id,
+            keep_ids=[document.id for document in chunk["documents"]],
+        )
     return chunk
 
 
 @observe(capture_input=False)
-async def write(clean: dict[str, Any], writer: DocumentWriter) -> None:
-    return await writer.run(documents=clean["documents"])
+async def write(
+    clean: dict[str, Any],
+    writer: DocumentWriter,
+    generation: Optional[str] = None,
+) -> None:
+    return await writer.run(documents=clean["documents"], generation=generation)
 
 
 ## End of Pipeline
@@ -72,7 +77,6 @@ class ProjectMeta(BasicPipeline):
         store = document_store_provider.get_store(dataset_name="project_meta")
 
         self._components = {
-            "validator": MDLValidator(),
             "cleaner": DocumentCleaner([store]),
             "writer": AsyncDocumentWriter(
                 document_store=store,
@@ -87,7 +91,11 @@ class ProjectMeta(BasicPipeline):
 
     @observe(name="Project Meta Indexing")
     async def run(
-        self, mdl_str: str, project_id: Optional[str] = None
+        self,
+        mdl_str: Optional[str] = None,
+        project_id: Optional[str] = None,
+        mdl: Optional[ParsedMDL] = None,
+        generation: Optional[str] = None,
     ) -> dict[str, Any]:
         logger.info(
             f"Project ID: {project_id}, Project Meta Indexing pipeline is running..."
@@ -95,15 +103,23 @@ class ProjectMeta(BasicPipeline):
         return await self._pipe.execute(
             [self._final],
             inputs={
-                "mdl_str": mdl_str,
+                "mdl": mdl or ParsedMDL.parse(mdl_str),
                 "project_id": project_id,
+                "generation": generation,
                 **self._components,
             },
         )
 
     @observe(name="Clean Documents for Project Meta")
-    async def clean(self, project_id: Optional[str] = None) -> None:
-        await self._components["cleaner"].run(project_id=project_id)
+    async def clean(
+        self,
+        project_id: Optional[str] = None,
+        generation: Optional[str] = None,
+        retain: Optional[str] = None,
+    ) -> None:
+        await self._components["cleaner"].run(
+            project_id=project_id, generation=generation, retain=retain
+        )
 
 
 if __name__ == "__main__":
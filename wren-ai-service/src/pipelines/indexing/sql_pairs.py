@@ -1,7 +1,6 @@
 import logging
 import os
 import sys
-import uuid
 from typing import Any, Dict, List, Optional, Set
 
 import orjson
@@ -9,12 +8,12 @@ from hamilton import base
 from hamilton.async_driver import AsyncDriver
 from haystack import Document, component
 from haystack.document_stores.types import DocumentStore, DuplicatePolicy
-from langfuse.decorators import observe
 from pydantic import BaseModel
 
 from src.core.pipeline import BasicPipeline
 from src.core.provider import DocumentStoreProvider, EmbedderProvider
-from src.pipelines.indexing import AsyncDocumentWriter
+from src.pipelines.indexing import AsyncDocumentWriter, ParsedMDL, document_id
+from src.utils import observe
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -36,7 +35,7 @@ class SqlPairsConverter:
         return {
             "documents": [
                 Document(
-                    id=str(uuid.uuid4()),
+                    id=document_id(project_id, "SQL_PAIR", sql_pair.id),
                     meta={
                         "sql_pair_id": sql_pair.id,
                         "sql": sql_pair.sql,
@@ -56,7 +55,10 @@ class SqlPairsCleaner:
 
     @component.output_types()
     async def run(
-        self, sql_pair_ids: List[str], project_id: Optional[str] = None
+        self,
+        sql_pair_ids: List[str],
+        project_id: Optional[str] = None,
+        keep_ids: Optional[List[str]] = None,
     ) -> None:
         filter = {
             "operator": "AND",
@@ -70,16 +72,20 @@ class SqlPairsCleaner:
                 {"field": "project_id", "operator": "==", "value": project_id}
             )
 
+        # see `keep_ids` of `DocumentCleaner`
+        if keep_ids:
+            filter["conditions"].append(
+                {"field": "id", "operator": "not in", "value": keep_ids}
+            )
+
         return await self.store.delete_documents(filter)
 
 
 ## Start of Pipeline
 @observe(capture_input=False)
 def boilerplates(
-    mdl_str: str,
+    mdl: Dict[str, Any],
 ) -> Set[str]:
-    mdl = orjson.loads(mdl_str)
-
     return {
         boilerplate.lower()
         for model in mdl.get("models", [])
@@ -131,7 +137,11 @@ async def clean(
 ) -> Dict[str, Any]:
     sql_pair_ids = [sql_pair.id for sql_pair in sql_pairs]
     if sql_pair_ids or delete_all:
-        await cleaner.run(sql_pair_ids=sql_pair_ids, project_id=project_id)
+        await cleaner.run(
+            sql_pair_ids=sql_pair_ids,
+            project_id=project_id,
+            keep_ids=[document.id for document in embedding.get("documents", [])],
+        )
 
     return embedding
 
@@ -192,16 +202,17 @@ class SqlPairs(BasicPipeline):
     @observe(name="SQL Pairs Indexing")
     async def run(
         self,
-        mdl_str: str,
+        mdl_str: Optional[str] = None,
         project_id: Optional[str] = "",
         external_pairs: Optional[Dict[str, Any]] = {},
+        mdl: Optional[ParsedMDL] = None,
     ) -> Dict[str, Any]:
         logger.info(
             f"Project ID: {project_id} SQL Pairs Indexing pipeline is running..."
         )
 
         input = {
-            "mdl_str": mdl_str,
+            "mdl": mdl or ParsedMDL.parse(mdl_str),
             "project_id": project_id,
             "external_pairs": {
                 **self._external_pairs,
@@ -6,11 +6,11 @@ from hamilton import base
 from hamilton.async_driver import AsyncDriver
 from haystack import Document, component
 from haystack_integrations.document_stores.qdrant import QdrantDocumentStore
-from langfuse.decorators import observe
 
 from src.core.pipeline import BasicPipeline
 from src.core.provider import DocumentStoreProvider, EmbedderProvider
 from src.pipelines.common import ScoreFilter
+from src.utils import observe
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -1,25 +1,61 @@
 import logging
 import sys
-from typing import Dict
+from typing import Any, Dict, Optional
 
 import tiktoken
 from hamilton import base
 from hamilton.driver import Driver
-from langfuse.decorators import observe
 
+from src.core import arrow
 from src.core.pipeline import BasicPipeline
+from src.core.profile import summarize_sql_data
 from src.core.provider import LLMProvider
+from src.utils import observe
 
 logger = logging.getLogger("wren-ai-service")
 
 
 ## Start of Pipeline
+@observe(capture_input=False, capture_output=False)
+def summarize(
+    sql_data: Any,
+    summary_row_threshold: Optional[int],
+    summary_sample_size: int,
+) -> Any:
+    """
+    Results with more rows than the threshold are replaced by the profiles of their
+    columns and a sample of their rows, so that the prompt grows with the number of
+    columns rather than the number of rows.
+    """
+    num_rows = (
+        sql_data.num_rows if arrow.is_table(sql_data) else len(sql_data.get("data", []))
+    )
+    if summary_row_threshold is None or num_rows <= summary_row_threshold:
+        return sql_data
+
+    return summarize_sql_data(sql_data, sample_size=summary_sample_size)
+
+
 @observe(capture_input=False, capture_output=False)
 def preprocess(
-    sql_data: Dict,
+    summarize: Any,
     encoding: tiktoken.Encoding,
     context_window_size: int,
 ) -> Dict:
+    sql_data = summarize
+    if arrow.is_table(sql_data):
+        # the largest leading slice of the rows which fits in the context window
+        num_rows, tokens = arrow.fit_rows(
+            sql_data,
+            lambda table: len(encoding.encode(str(arrow.to_sql_data(table)))),
+            context_window_size,
+        )
+        return {
+            "sql_data": arrow.to_sql_data(sql_data.slice(0, num_rows)),
+            "num_rows_used_in_llm": num_rows,
+            "tokens": tokens,
+        }
+
     def reduce_data_size(data: list, reduction_step: int = 50) -> list:
         """Reduce the size of data by removing elements from the end.
 
@@ -66,6 +102,10 @@ def preprocess(
         _token_count = len(encoding.encode(str(sql_data)))
         logger.info(f"Token count: {_token_count}")
 
+    if "row_count" in sql_data:
+        # the column profiles cover all the rows of the result
+        num_rows_used_in_llm = sql_data["row_count"]
+
     return {
         "sql_data": sql_data,
         "num_rows_used_in_llm": num_rows_used_in_llm,
@@ -80,6 +120,8 @@ class PreprocessSqlData(BasicPipeline):
     def __init__(
         self,
         llm_provider: LLMProvider,
+        summary_row_threshold: Optional[int] = 50,
+        summary_sample_size: int = 10,
         **kwargs,
     ):
         _model = llm_provider.get_model()
@@ -91,6 +133,8 @@ class PreprocessSqlData(BasicPipeline):
         self._configs = {
             "encoding": _encoding,
             "context_window_size": llm_provider.get_context_window_size(),
+            "summary_row_threshold": summary_row_threshold,
+            "summary_sample_size": summary_sample_size,
         }
 
         super().__init__(Driver({}, sys.modules[__name__], adapter=base.DictResult()))
@@ -98,7 +142,7 @@ class PreprocessSqlData(BasicPipeline):
     @observe(name="Preprocess SQL Data")
     def run(
         self,
-        sql_data: Dict,
+        sql_data: Any,
     ):
         logger.info("Preprocess SQL Data pipeline is running...")
         return self._pipe.execute(
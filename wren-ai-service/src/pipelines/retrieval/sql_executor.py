@@ -6,18 +6,33 @@ import aiohttp
 from hamilton import base
 from hamilton.async_driver import AsyncDriver
 from haystack import component
-from langfuse.decorators import observe
 
+from src.core import arrow
 from src.core.engine import Engine
 from src.core.pipeline import BasicPipeline
+from src.core.result_cache import QueryResultCache
+from src.utils import observe
 
 logger = logging.getLogger("wren-ai-service")
 
 
 @component
 class DataFetcher:
-    def __init__(self, engine: Engine):
+    """
+    Fetches the results of a SQL. With `columnar`, the results are an Arrow table,
+    streamed as Arrow IPC by the engines which support it and decoded from the JSON
+    results otherwise, see `src.core.arrow`.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        result_cache: Optional[QueryResultCache] = None,
+        columnar: bool = False,
+    ):
         self._engine = engine
+        self._result_cache = result_cache
+        self._columnar = columnar
 
     @component.output_types(
         results=Optional[Dict[str, Any]],
@@ -29,17 +44,34 @@ class DataFetcher:
         limit: int = 500,
         timeout: float = 30.0,
     ):
-        async with aiohttp.ClientSession() as session:
-            _, data, _ = await self._engine.execute_sql(
-                sql,
-                session,
-                project_id=project_id,
-                dry_run=False,
-                limit=limit,
-                timeout=timeout,
+        async def _fetch():
+            async with aiohttp.ClientSession() as session:
+                success, data, _ = await self._engine.execute_sql(
+                    sql,
+                    session,
+                    project_id=project_id,
+                    dry_run=False,
+                    limit=limit,
+                    timeout=timeout,
+                    **({"result_format": "arrow"} if self._columnar else {}),
+                )
+                if self._columnar and success and not arrow.is_table(data):
+                    data = arrow.from_json(data)
+                return data, success
+
+        if self._result_cache is None:
+            data, _ = await _fetch()
+        else:
+            data = await self._result_cache.get_or_fetch(
+                self._result_cache.key(project_id, sql, limit), _fetch
             )
 
-            return {"results": data}
+        if self._columnar and not arrow.is_table(data):
+            data = arrow.from_json(data)
+        elif not self._columnar and arrow.is_table(data):
+            data = arrow.to_sql_data(data)
+
+        return {"results": data}
 
 
 ## Start of Pipeline
@@ -67,10 +99,14 @@ class SQLExecutor(BasicPipeline):
         self,
         engine: Engine,
         engine_timeout: Optional[float] = 30.0,
+        result_cache: Optional[QueryResultCache] = None,
+        columnar: bool = False,
         **kwargs,
     ):
         self._components = {
-            "data_fetcher": DataFetcher(engine=engine),
+            "data_fetcher": DataFetcher(
+                engine=engine, result_cache=result_cache, columnar=columnar
+            ),
         }
 
         self._configs = {
@@ -7,12 +7,12 @@ from cachetools import TTLCache
 from hamilton import base
 from hamilton.async_driver import AsyncDriver
 from hamilton.function_modifiers import extract_fields
-from langfuse.decorators import observe
 
 from src.core.engine import Engine
 from src.core.pipeline import BasicPipeline
 from src.core.provider import DocumentStoreProvider
 from src.providers.engine.wren import WrenIbis
+from src.utils import observe
 
 logger = logging.getLogger("wren-ai-service")
 
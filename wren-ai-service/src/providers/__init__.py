@@ -337,6 +337,27 @@ def transform(config: list[dict]) -> Configuration:
     )
 
 
+def validate_embedding_dimensions(components: dict[str, PipelineComponent]) -> None:
+    """
+    Make sure the embeddings of every pipeline fit its document store, i.e. the
+    dimension (or target_dimension) of the embedder matches the embedding_model_dim
+    (EMBEDDING_MODEL_DIMENSION) of the document store, where both are known.
+    """
+    for pipe_name, component in components.items():
+        if not component.embedder_provider or not component.document_store_provider:
+            continue
+
+        dimension = component.embedder_provider.get_dimension()
+        store_dimension = component.document_store_provider.get_embedding_dimension()
+        if not isinstance(dimension, int) or not isinstance(store_dimension, int):
+            continue
+        if dimension != store_dimension:
+            raise ValueError(
+                f"Pipeline {pipe_name}: the embedder returns {dimension}-dimensional embeddings, "
+                f"but the document store expects {store_dimension} (embedding_model_dim / EMBEDDING_MODEL_DIMENSION)"
+            )
+
+
 def generate_components(configs: list[dict]) -> dict[str, PipelineComponent]:
     """
     Generate pipeline components from configuration.
@@ -390,7 +411,10 @@ def generate_components(configs: list[dict]) -> dict[str, PipelineComponent]:
             engine=get("engine", components, instantiated_providers),
         )
 
-    return {
+    components = {
         pipe_name: componentize(components, instantiated_providers)
         for pipe_name, components in config.pipelines.items()
     }
+    validate_embedding_dimensions(components)
+
+    return components
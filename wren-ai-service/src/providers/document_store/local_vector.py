@@ -0,0 +1,694 @@
+import asyncio
+import logging
+import os
+import shutil
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import orjson
+from haystack import Document, component
+from haystack.document_stores.errors import DuplicateDocumentError
+from haystack.document_stores.types import DuplicatePolicy
+
+from src.core.generations import INDEX_GENERATIONS, IndexGenerations
+from src.core.metrics import track_provider
+from src.core.provider import DocumentStoreProvider
+from src.providers.loader import provider
+
+logger = logging.getLogger("wren-ai-service")
+
+
+def _key(value: Any) -> Any:
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "==": lambda value, target: value == target,
+    "!=": lambda value, target: value != target,
+    "in": lambda value, target: value in target,
+    "not in": lambda value, target: value not in target,
+    ">": lambda value, target: value is not None and value > target,
+    ">=": lambda value, target: value is not None and value >= target,
+    "<": lambda value, target: value is not None and value < target,
+    "<=": lambda value, target: value is not None and value <= target,
+}
+
+
+class _Column:
+    """
+    A dictionary encoded payload column: the distinct values are kept once and each
+    row only holds the int32 code of its value, so that a filter is evaluated once per
+    distinct value and then gathered for all the rows at once. Code 0 is a missing value.
+    """
+
+    def __init__(self, values: Optional[List[Any]] = None, codes: Any = None):
+        self.values: List[Any] = values or [None]
+        self._codes_by_key = {_key(value): i for i, value in enumerate(self.values)}
+        self.codes = np.asarray(codes if codes is not None else [], dtype=np.int32)
+
+    def resize(self, capacity: int) -> None:
+        codes = np.zeros(capacity, dtype=np.int32)
+        size = min(capacity, len(self.codes))
+        codes[:size] = self.codes[:size]
+        self.codes = codes
+
+    def set(self, row: int, value: Any) -> None:
+        key = _key(value)
+        if (code := self._codes_by_key.get(key)) is None:
+            code = self._codes_by_key[key] = len(self.values)
+            self.values.append(value)
+        self.codes[row] = code
+
+    def get(self, row: int) -> Any:
+        return self.values[self.codes[row]]
+
+    def matches(self, operator: str, target: Any) -> np.ndarray:
+        """
+        Whether each distinct value of the column matches the condition.
+        """
+        if operator in ("in", "not in"):
+            target = {_key(value) for value in target}
+            values = [_key(value) for value in self.values]
+        else:
+            values = self.values
+        return np.fromiter(
+            (_OPERATORS[operator](value, target) for value in values),
+            dtype=bool,
+            count=len(values),
+        )
+
+    def mask(self, operator: str, target: Any, size: int) -> np.ndarray:
+        return self.matches(operator, target)[self.codes[:size]]
+
+
+class LocalVectorDocumentStore:
+    """
+    An embedded document store for small deployments and tests, which keeps a
+    collection in the process instead of a vector database:
+
+    - the normalized embeddings in a float32, float16 or int8 matrix, memory-mapped from
+      `<path>/<index>/vectors` when a path is given
+    - the id, content and meta fields of the documents in dictionary encoded columns,
+      persisted as a JSON sidecar `<path>/<index>/payload.json`, and the changes since
+      in an append-only log next to it, which is folded into a new sidecar once it
+      outgrows the collection
+
+    A search evaluates the filters on the columns first, then computes the cosine
+    similarity of the remaining rows with a single matrix-vector product. Deleted rows
+    are only marked as such until they are more than half of the collection.
+    """
+
+    def __init__(
+        self,
+        index: str = "Document",
+        embedding_dim: int = 0,
+        path: Optional[str] = None,
+        dtype: str = "float32",
+        similarity: str = "cosine",
+        recreate_index: bool = False,
+        generations: Optional[IndexGenerations] = None,
+    ):
+        self.index = index
+        self.embedding_dim = embedding_dim
+        self.similarity = similarity
+        self._dtype = np.dtype(dtype)
+        self._directory = os.path.join(path, index) if path else None
+        self._generations = generations or INDEX_GENERATIONS
+        # the searches and the changes run in threads, see `asyncio.to_thread`
+        self._lock = threading.RLock()
+        self._io_lock = threading.Lock()
+        # the log of the changes since the last sidecar, see `_flush`
+        self._epoch = 0
+        self._log_entries = 0
+        self._pending: List[bytes] = []
+        self._snapshot_needed = False
+
+        if recreate_index and self._directory and os.path.exists(self._directory):
+            shutil.rmtree(self._directory)
+
+        self._reset()
+        if self._directory and os.path.exists(self._payload_path):
+            self._snapshot_needed = False
+            self._load()
+
+    @property
+    def _scale(self) -> float:
+        # int8 vectors hold the normalized components scaled to [-127, 127]
+        return 127.0 if self._dtype == np.int8 else 1.0
+
+    @property
+    def _payload_path(self) -> str:
+        return os.path.join(self._directory, "payload.json")
+
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self._directory, f"payload.{self._epoch}.log")
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self._directory, "vectors")
+
+    def _reset(self) -> None:
+        self._size = 0
+        self._capacity = 0
+        self._vectors = np.zeros((0, self.embedding_dim), dtype=self._dtype)
+        self._alive = np.zeros(0, dtype=bool)
+        self._has_embedding = np.zeros(0, dtype=bool)
+        self._columns: Dict[str, _Column] = {"id": _Column(), "content": _Column()}
+        self._rows_by_id: Dict[str, int] = {}
+        # the rows are renumbered, so the log can't be replayed on the last sidecar
+        self._snapshot_needed = True
+
+    def _load(self) -> None:
+        with open(self._payload_path, "rb") as file:
+            payload = orjson.loads(file.read())
+
+        self.embedding_dim = payload["dim"]
+        self._dtype = np.dtype(payload["dtype"])
+        self._size = self._capacity = payload["size"]
+        self._alive = np.asarray(payload["alive"], dtype=bool)
+        self._has_embedding = np.asarray(payload["has_embedding"], dtype=bool)
+        self._columns = {
+            field: _Column(column["values"], column["codes"])
+            for field, column in payload["columns"].items()
+        }
+        self._vectors = self._map_vectors(self._capacity)
+        self._rows_by_id = {
+            self._columns["id"].get(row): row
+            for row in np.flatnonzero(self._alive[: self._size])
+        }
+
+        self._epoch = payload.get("epoch", 0)
+        if os.path.exists(self._log_path):
+            with open(self._log_path, "rb") as file:
+                for line in file:
+                    try:
+                        self._replay(orjson.loads(line))
+                    except orjson.JSONDecodeError:
+                        # the last change of an interrupted write, the next flush
+                        # writes a new sidecar instead of appending after it
+                        self._snapshot_needed = True
+                        break
+                    self._log_entries += 1
+
+        logger.info(
+            f"Loaded local vector collection {self.index}: {len(self._rows_by_id)} documents"
+        )
+
+    def _map_vectors(self, capacity: int) -> np.ndarray:
+        if not self._directory:
+            vectors = np.zeros((capacity, self.embedding_dim), dtype=self._dtype)
+            size = min(self._size, len(self._vectors))
+            vectors[:size] = self._vectors[:size]
+            return vectors
+
+        os.makedirs(self._directory, exist_ok=True)
+        nbytes = capacity * self.embedding_dim * self._dtype.itemsize
+        with open(self._vectors_path, "ab") as file:
+            if file.tell() < nbytes:
+                file.truncate(nbytes)
+        if nbytes == 0:
+            return np.zeros((0, self.embedding_dim), dtype=self._dtype)
+        return np.memmap(
+            self._vectors_path,
+            dtype=self._dtype,
+            mode="r+",
+            shape=(capacity, self.embedding_dim),
+        )
+
+    def _grow(self, size: int) -> None:
+        if size <= self._capacity:
+            return
+
+        capacity = max(size, self._capacity * 2, 64)
+        self._vectors = self._map_vectors(capacity)
+        for array in ("_alive", "_has_embedding"):
+            resized = np.zeros(capacity, dtype=bool)
+            resized[: self._size] = getattr(self, array)[: self._size]
+            setattr(self, array, resized)
+        for column in self._columns.values():
+            column.resize(capacity)
+        self._capacity = capacity
+
+    def _column(self, field: str) -> _Column:
+        if field not in self._columns:
+            self._columns[field] = _Column(codes=np.zeros(self._capacity))
+        return self._columns[field]
+
+    def _set_row(self, row: int, fields: Dict[str, Any], has_embedding: bool) -> None:
+        if row >= self._size:
+            self._grow(row + 1)
+            self._size = row + 1
+        self._has_embedding[row] = has_embedding
+        self._alive[row] = True
+        for column in self._columns.values():
+            column.codes[row] = 0
+        for field, value in fields.items():
+            self._column(field).set(row, value)
+        self._rows_by_id[fields["id"]] = row
+
+    def _delete_rows(self, rows: List[int]) -> None:
+        self._alive[rows] = False
+        for row in rows:
+            self._rows_by_id.pop(self._columns["id"].get(row), None)
+
+    def _record(self, change: Dict[str, Any]) -> None:
+        if self._directory:
+            self._pending.append(orjson.dumps(change) + b"\n")
+
+    def _replay(self, change: Dict[str, Any]) -> None:
+        if "deleted" in change:
+            self._delete_rows(change["deleted"])
+        else:
+            self._set_row(change["row"], change["fields"], change["has_embedding"])
+
+    def _snapshot(self) -> Dict[str, Any]:
+        """
+        A copy of the collection for a new sidecar, taken under the lock so that it can
+        be serialized and written after releasing it.
+        """
+        self._epoch += 1
+        self._log_entries = 0
+        self._snapshot_needed = False
+        return {
+            "dim": self.embedding_dim,
+            "dtype": self._dtype.name,
+            "size": self._size,
+            "epoch": self._epoch,
+            "alive": self._alive[: self._size].copy(),
+            "has_embedding": self._has_embedding[: self._size].copy(),
+            "columns": {
+                field: {
+                    "values": list(column.values),
+                    "codes": column.codes[: self._size].copy(),
+                }
+                for field, column in self._columns.items()
+            },
+        }
+
+    def _flush(self) -> None:
+        """
+        Persist the changes, by appending them to the log, or by writing a new sidecar
+        once the log outgrows the collection or the rows are renumbered. It does file
+        IO, so it runs in a thread, and only holds the lock to take the changes, so
+        that the searches aren't blocked while the sidecar is written.
+        """
+        if not self._directory:
+            return
+
+        # the flushes are serialized, so that the log and the sidecars are written in
+        # the order of the changes
+        with self._io_lock:
+            with self._lock:
+                vectors = self._vectors
+                previous_log_path = self._log_path
+                payload, pending = None, self._pending
+                if self._snapshot_needed or self._log_entries + len(pending) > max(
+                    1024, self._size
+                ):
+                    payload = self._snapshot()
+                else:
+                    self._log_entries += len(pending)
+                self._pending = []
+                log_path = self._log_path
+
+            if isinstance(vectors, np.memmap):
+                vectors.flush()
+
+            os.makedirs(self._directory, exist_ok=True)
+            if payload is not None:
+                tmp_path = f"{self._payload_path}.tmp"
+                with open(tmp_path, "wb") as file:
+                    file.write(orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY))
+                # the sidecar of the new epoch starts with an empty log
+                os.replace(tmp_path, self._payload_path)
+                if os.path.exists(previous_log_path):
+                    os.remove(previous_log_path)
+            elif pending:
+                with open(log_path, "ab") as file:
+                    file.write(b"".join(pending))
+
+    def _compact(self) -> None:
+        rows = np.flatnonzero(self._alive[: self._size])
+        if self._size - len(rows) <= max(1024, self._size // 2):
+            return
+
+        vectors = np.array(self._vectors[rows])
+        has_embedding = self._has_embedding[rows]
+        columns = {
+            field: [column.get(row) for row in rows]
+            for field, column in self._columns.items()
+        }
+
+        if self._directory and os.path.exists(self._vectors_path):
+            os.remove(self._vectors_path)
+        self._reset()
+        self._grow(len(rows))
+        self._vectors[: len(rows)] = vectors
+        self._has_embedding[: len(rows)] = has_embedding
+        self._alive[: len(rows)] = True
+        for field, values in columns.items():
+            column = self._column(field)
+            for row, value in enumerate(values):
+                column.set(row, value)
+        self._size = len(rows)
+        self._rows_by_id = {
+            self._columns["id"].get(row): row for row in range(self._size)
+        }
+
+    def _mask(self, filters: Optional[Dict[str, Any]]) -> np.ndarray:
+        if not filters:
+            return np.ones(self._size, dtype=bool)
+
+        operator = filters["operator"]
+        if operator in ("AND", "OR", "NOT"):
+            masks = [self._mask(condition) for condition in filters["conditions"]]
+            if operator == "OR":
+                return (
+                    np.logical_or.reduce(masks) if masks else np.zeros(self._size, bool)
+                )
+            mask = np.logical_and.reduce(masks) if masks else np.ones(self._size, bool)
+            return ~mask if operator == "NOT" else mask
+
+        field = filters["field"].removeprefix("meta.")
+        if field not in self._columns:
+            # every row misses the field, i.e. holds None
+            missing = _Column().matches(operator, filters["value"])[0]
+            return np.full(self._size, missing)
+        return self._columns[field].mask(operator, filters["value"], self._size)
+
+    def _visible(self, filters: Optional[Dict[str, Any]]) -> np.ndarray:
+        """
+        The rows matching the filters, excluding the deleted rows and the documents
+        hidden by the index generations, see `IndexGenerations`.
+        """
+        mask = self._mask(filters) & self._alive[: self._size]
+        if "generation" not in self._columns:
+            return mask
+
+        generation = self._columns["generation"]
+        if staged := self._generations.staged:
+            mask &= ~generation.mask("in", list(staged), self._size)
+        for project_id, active in self._generations.retiring.items():
+            project = self._mask(
+                {"field": "project_id", "operator": "==", "value": project_id or None}
+            )
+            old = generation.mask("not in", [None, active], self._size)
+            mask &= ~(project & old)
+        return mask
+
+    def _document(self, row: int, score: Optional[float] = None, embedding=False):
+        meta = {
+            field: value
+            for field, column in self._columns.items()
+            if field not in ("id", "content") and (value := column.get(row)) is not None
+        }
+        return Document(
+            id=self._columns["id"].get(row),
+            content=self._columns["content"].get(row),
+            meta=meta,
+            score=score,
+            embedding=(
+                (self._vectors[row].astype(np.float32) / self._scale).tolist()
+                if embedding and self._has_embedding[row]
+                else None
+            ),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": f"{__name__}.{type(self).__name__}",
+            "init_parameters": {
+                "index": self.index,
+                "embedding_dim": self.embedding_dim,
+                "path": os.path.dirname(self._directory) if self._directory else None,
+                "dtype": self._dtype.name,
+                "similarity": self.similarity,
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LocalVectorDocumentStore":
+        return cls(**data["init_parameters"])
+
+    def filter_documents(
+        self, filters: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        with self._lock:
+            return [
+                self._document(row) for row in np.flatnonzero(self._visible(filters))
+            ]
+
+    def _count(self, filters: Optional[Dict[str, Any]]) -> int:
+        with self._lock:
+            return int(np.count_nonzero(self._visible(filters)))
+
+    @track_provider("document_store", "local_vector", "count_documents")
+    async def count_documents(self, filters: Optional[Dict[str, Any]] = None) -> int:
+        return await asyncio.to_thread(self._count, filters)
+
+    @track_provider("document_store", "local_vector", "query_by_filters")
+    async def _query_by_filters(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+    ) -> List[Document]:
+        return await asyncio.to_thread(self.filter_documents, filters)
+
+    def _search(
+        self,
+        query_embedding: List[float],
+        filters: Optional[Dict[str, Any]],
+        top_k: int,
+        scale_score: bool,
+        return_embedding: bool,
+    ) -> List[Document]:
+        with self._lock:
+            rows = np.flatnonzero(
+                self._visible(filters) & self._has_embedding[: self._size]
+            )
+            if len(rows) == 0:
+                return []
+
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query /= np.linalg.norm(query) or 1.0
+            scores = (self._vectors[rows] @ query) / self._scale
+            if len(rows) > top_k:
+                top = np.argpartition(-scores, top_k)[:top_k]
+            else:
+                top = np.arange(len(rows))
+            top = top[np.argsort(-scores[top], kind="stable")]
+
+            return [
+                self._document(
+                    rows[i],
+                    score=(
+                        (float(scores[i]) + 1) / 2 if scale_score else float(scores[i])
+                    ),
+                    embedding=return_embedding,
+                )
+                for i in top
+            ]
+
+    @track_provider("document_store", "local_vector", "query_by_embedding")
+    async def _query_by_embedding(
+        self,
+        query_embedding: List[float],
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: int = 10,
+        scale_score: bool = True,
+        return_embedding: bool = False,
+    ) -> List[Document]:
+        return await asyncio.to_thread(
+            self._search,
+            query_embedding,
+            filters,
+            top_k,
+            scale_score,
+            return_embedding,
+        )
+
+    def _write(self, documents: List[Document], policy: DuplicatePolicy) -> int:
+        with self._lock:
+            if policy == DuplicatePolicy.FAIL:
+                if existing := [d.id for d in documents if d.id in self._rows_by_id]:
+                    msg = f"Document with ids '{', '.join(existing)} already exists in index = '{self.index}'."
+                    raise DuplicateDocumentError(msg)
+            if policy in (DuplicatePolicy.SKIP, DuplicatePolicy.FAIL):
+                documents = [d for d in documents if d.id not in self._rows_by_id]
+
+            if not self.embedding_dim and (
+                dim := next((len(d.embedding) for d in documents if d.embedding), 0)
+            ):
+                # the dimension is taken from the first embedding written
+                self.embedding_dim = dim
+                if self._directory and os.path.exists(self._vectors_path):
+                    os.remove(self._vectors_path)
+                self._vectors = np.zeros((0, dim), dtype=self._dtype)
+                self._vectors = self._map_vectors(self._capacity)
+                self._snapshot_needed = True
+
+            written = 0
+            for document in documents:
+                # a document with the same id is overwritten in place
+                if (row := self._rows_by_id.get(document.id)) is None:
+                    row = self._size
+                    self._grow(row + 1)
+
+                if document.embedding:
+                    embedding = np.asarray(document.embedding, dtype=np.float32)
+                    embedding *= self._scale / (np.linalg.norm(embedding) or 1.0)
+                    self._vectors[row] = (
+                        np.round(embedding) if self._scale != 1.0 else embedding
+                    )
+
+                fields = {
+                    "id": document.id,
+                    "content": document.content,
+                    **document.meta,
+                }
+                self._set_row(row, fields, bool(document.embedding))
+                self._record(
+                    {
+                        "row": int(row),
+                        "fields": fields,
+                        "has_embedding": bool(document.embedding),
+                    }
+                )
+                written += 1
+
+        self._flush()
+        return written
+
+    @track_provider("document_store", "local_vector", "write_documents")
+    async def write_documents(
+        self, documents: List[Document], policy: DuplicatePolicy = DuplicatePolicy.FAIL
+    ) -> int:
+        for document in documents:
+            if not isinstance(document, Document):
+                msg = f"DocumentStore.write_documents() expects a list of Documents but got an element of {type(document)}."
+                raise ValueError(msg)
+
+        return await asyncio.to_thread(self._write, documents, policy)
+
+    def _delete(self, filters: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            rows = np.flatnonzero(self._mask(filters) & self._alive[: self._size])
+            self._delete_rows(rows)
+            if len(rows):
+                self._record({"deleted": rows.tolist()})
+
+            self._compact()
+
+        self._flush()
+
+    @track_provider("document_store", "local_vector", "delete_documents")
+    async def delete_documents(self, filters: Optional[Dict[str, Any]] = None) -> None:
+        await asyncio.to_thread(self._delete, filters)
+
+
+@component
+class LocalVectorEmbeddingRetriever:
+    def __init__(
+        self,
+        document_store: LocalVectorDocumentStore,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: int = 10,
+        scale_score: bool = True,
+        return_embedding: bool = False,
+    ):
+        self._document_store = document_store
+        self._filters = filters
+        self._top_k = top_k
+        self._scale_score = scale_score
+        self._return_embedding = return_embedding
+
+    @component.output_types(documents=List[Document])
+    async def run(
+        self,
+        query_embedding: List[float],
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+        scale_score: Optional[bool] = None,
+        return_embedding: Optional[bool] = None,
+    ):
+        if query_embedding:
+            docs = await self._document_store._query_by_embedding(
+                query_embedding=query_embedding,
+                filters=filters or self._filters,
+                top_k=top_k or self._top_k,
+                scale_score=scale_score or self._scale_score,
+                return_embedding=return_embedding or self._return_embedding,
+            )
+        else:
+            docs = await self._document_store._query_by_filters(
+                filters=filters,
+                top_k=top_k,
+            )
+
+        return {"documents": docs}
+
+
+@provider("local_vector")
+class LocalVectorProvider(DocumentStoreProvider):
+    """
+    A document store provider which keeps the collections in the process, see
+    `LocalVectorDocumentStore`. The collections are persisted under `location`, or
+    only kept in memory if it's empty.
+    """
+
+    def __init__(
+        self,
+        location: str = os.getenv("LOCAL_VECTOR_PATH", ""),
+        embedding_model_dim: int = (
+            int(os.getenv("EMBEDDING_MODEL_DIMENSION"))
+            if os.getenv("EMBEDDING_MODEL_DIMENSION")
+            else 0
+        ),
+        dtype: str = "float32",
+        recreate_index: bool = (
+            bool(os.getenv("SHOULD_FORCE_DEPLOY"))
+            if os.getenv("SHOULD_FORCE_DEPLOY")
+            else False
+        ),
+        **_,
+    ):
+        self._location = location
+        self._embedding_model_dim = embedding_model_dim
+        self._dtype = dtype
+        # the pipelines get their own store of a collection, which must share its state
+        self._stores: Dict[str, LocalVectorDocumentStore] = {}
+        self._recreate_index = recreate_index
+
+        logger.info(f"Using local vector document store at: {location or 'memory'}")
+
+    def get_store(
+        self,
+        dataset_name: Optional[str] = None,
+        recreate_index: bool = False,
+    ) -> LocalVectorDocumentStore:
+        index = dataset_name or "Document"
+        if index not in self._stores:
+            self._stores[index] = LocalVectorDocumentStore(
+                index=index,
+                embedding_dim=self._embedding_model_dim,
+                path=self._location,
+                dtype=self._dtype,
+                recreate_index=recreate_index or self._recreate_index,
+            )
+        return self._stores[index]
+
+    def get_retriever(
+        self,
+        document_store: LocalVectorDocumentStore,
+        top_k: int = 10,
+    ) -> LocalVectorEmbeddingRetriever:
+        return LocalVectorEmbeddingRetriever(
+            document_store=document_store,
+            top_k=top_k,
+        )
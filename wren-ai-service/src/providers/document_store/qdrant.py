@@ -1,10 +1,12 @@
+import asyncio
 import logging
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 import qdrant_client
 from haystack import Document, component
+from haystack.document_stores.errors import DuplicateDocumentError
 from haystack.document_stores.types import DuplicatePolicy
 from haystack.utils import Secret
 from haystack_integrations.components.retrievers.qdrant import QdrantEmbeddingRetriever
@@ -24,6 +26,8 @@ from haystack_integrations.document_stores.qdrant.filters import (
 from qdrant_client.http import models as rest
 from tqdm import tqdm
 
+from src.core.generations import INDEX_GENERATIONS, IndexGenerations
+from src.core.metrics import track_provider
 from src.core.provider import DocumentStoreProvider
 from src.providers.loader import provider
 
@@ -63,6 +67,143 @@ def convert_haystack_documents_to_qdrant_points(
     return points
 
 
+def apply_index_generations(
+    qdrant_filters: Optional[rest.Filter], generations: IndexGenerations
+) -> Optional[rest.Filter]:
+    """
+    Hide the documents of the staged generations and the old generations of the
+    projects which were flipped to a new one, see `IndexGenerations`.
+    """
+    must_not = []
+
+    if staged := generations.staged:
+        must_not.append(
+            rest.FieldCondition(key="generation", match=rest.MatchAny(any=list(staged)))
+        )
+    for project_id, generation in generations.retiring.items():
+        must_not.append(
+            rest.Filter(
+                must=[
+                    rest.FieldCondition(
+                        key="project_id", match=rest.MatchValue(value=project_id)
+                    )
+                    if project_id
+                    else rest.IsEmptyCondition(
+                        is_empty=rest.PayloadField(key="project_id")
+                    )
+                ],
+                must_not=[
+                    rest.IsEmptyCondition(is_empty=rest.PayloadField(key="generation")),
+                    rest.FieldCondition(
+                        key="generation", match=rest.MatchValue(value=generation)
+                    ),
+                ],
+            )
+        )
+
+    if not must_not:
+        return qdrant_filters
+    return rest.Filter(
+        must=[qdrant_filters] if qdrant_filters else None, must_not=must_not
+    )
+
+
+def build_quantization_config(
+    config: Optional[Dict[str, Any]], embedding_dim: int
+) -> Optional[rest.QuantizationConfig]:
+    """
+    Build the quantization config of a collection from its config.yaml settings:
+
+    - not set: binary quantization for embeddings of 1024 dimensions or more
+      reference: https://qdrant.tech/articles/binary-quantization/#when-should-you-not-use-bq
+    - {"type": "none"}: no quantization
+    - {"type": "scalar", "quantile": 0.99, "always_ram": true}
+    - {"type": "binary", "always_ram": true}
+    - {"type": "product", "compression": "x16", "always_ram": true}
+    """
+    if config is None:
+        config = {"type": "binary" if embedding_dim >= 1024 else "none"}
+
+    _type = config.get("type", "none")
+    always_ram = config.get("always_ram", True)
+
+    if _type == "none":
+        return None
+    if _type == "scalar":
+        return rest.ScalarQuantization(
+            scalar=rest.ScalarQuantizationConfig(
+                type=rest.ScalarType.INT8,
+                quantile=config.get("quantile"),
+                always_ram=always_ram,
+            )
+        )
+    if _type == "binary":
+        return rest.BinaryQuantization(
+            binary=rest.BinaryQuantizationConfig(always_ram=always_ram)
+        )
+    if _type == "product":
+        return rest.ProductQuantization(
+            product=rest.ProductQuantizationConfig(
+                compression=rest.CompressionRatio(config.get("compression", "x16")),
+                always_ram=always_ram,
+            )
+        )
+    raise ValueError(f"Unsupported quantization type: {_type}")
+
+
+def build_storage_config(
+    config: Dict[str, Any],
+) -> Tuple[Optional[rest.Datatype], Optional[Dict[str, Any]]]:
+    """
+    Map the `datatype` setting of a collection to the datatype of its vectors and the
+    quantization settings:
+
+    - float32 (default): full precision vectors
+    - float16: vectors stored as float16, half of the storage and RAM of float32
+    - int8: full precision vectors on disk and int8 scalar quantized vectors in RAM,
+      a quarter of the RAM of float32; Qdrant has no signed 8 bit vectors, which cosine
+      similarity would need, so the quantized vectors are Qdrant's own
+    """
+    datatype = config.get("datatype", "float32")
+    quantization = config.get("quantization")
+
+    if datatype == "float32":
+        return None, quantization
+    if datatype == "float16":
+        return rest.Datatype.FLOAT16, quantization
+    if datatype == "int8":
+        return None, quantization or {"type": "scalar", "always_ram": True}
+    raise ValueError(f"Unsupported vector datatype: {datatype}")
+
+
+def build_search_params(
+    config: Optional[Dict[str, Any]], quantized: bool
+) -> Optional[rest.SearchParams]:
+    """
+    Build the search params of a collection from its config.yaml settings, e.g.
+    {"hnsw_ef": 128, "exact": false, "oversampling": 3.0, "rescore": true}; the
+    quantized vectors are oversampled 3 times and rescored by default.
+    """
+    config = config or {}
+
+    quantization = (
+        rest.QuantizationSearchParams(
+            rescore=config.get("rescore", True),
+            oversampling=config.get("oversampling", 3.0),
+        )
+        if quantized
+        else None
+    )
+    if quantization is None and not config.get("hnsw_ef") and not config.get("exact"):
+        return None
+
+    return rest.SearchParams(
+        hnsw_ef=config.get("hnsw_ef"),
+        exact=config.get("exact", False),
+        quantization=quantization,
+    )
+
+
 class AsyncQdrantDocumentStore(QdrantDocumentStore):
     def __init__(
         self,
@@ -101,7 +242,13 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
         write_batch_size: int = 100,
         scroll_size: int = 10_000,
         payload_fields_to_index: Optional[List[dict]] = None,
+        generations: Optional[IndexGenerations] = None,
+        write_concurrency: int = 4,
+        search_params: Optional[rest.SearchParams] = None,
+        vector_datatype: Optional[rest.Datatype] = None,
     ):
+        # used by recreate_collection, which is called by the first access to the client
+        self._vector_datatype = vector_datatype
         super(AsyncQdrantDocumentStore, self).__init__(
             location=location,
             url=url,
@@ -161,7 +308,58 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
         self.client.create_payload_index(
             collection_name=index, field_name="project_id", field_schema="keyword"
         )
+        self.client.create_payload_index(
+            collection_name=index, field_name="generation", field_schema="keyword"
+        )
+        self._generations = generations or INDEX_GENERATIONS
+        self._write_concurrency = write_concurrency
+        self._search_params = search_params
+        # the collection is set up once per store instead of before every write
+        self._collection_ready = False
+        self._collection_lock = asyncio.Lock()
+
+    def recreate_collection(
+        self,
+        collection_name: str,
+        distance,
+        embedding_dim: int,
+        on_disk: Optional[bool] = None,
+        use_sparse_embeddings: Optional[bool] = None,
+        sparse_idf: bool = False,
+    ):
+        if self._vector_datatype is None or use_sparse_embeddings:
+            return super().recreate_collection(
+                collection_name,
+                distance,
+                embedding_dim,
+                on_disk,
+                use_sparse_embeddings,
+                sparse_idf,
+            )
+
+        if self.client.collection_exists(collection_name):
+            self.client.delete_collection(collection_name)
 
+        self.client.create_collection(
+            collection_name=collection_name,
+            vectors_config=rest.VectorParams(
+                size=embedding_dim,
+                on_disk=self.on_disk if on_disk is None else on_disk,
+                distance=distance,
+                datatype=self._vector_datatype,
+            ),
+            shard_number=self.shard_number,
+            replication_factor=self.replication_factor,
+            write_consistency_factor=self.write_consistency_factor,
+            on_disk_payload=self.on_disk_payload,
+            hnsw_config=self.hnsw_config,
+            optimizers_config=self.optimizers_config,
+            wal_config=self.wal_config,
+            quantization_config=self.quantization_config,
+            init_from=self.init_from,
+        )
+
+    @track_provider("document_store", "qdrant", "query_by_embedding")
     async def _query_by_embedding(
         self,
         query_embedding: List[float],
@@ -170,7 +368,9 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
         scale_score: bool = True,
         return_embedding: bool = False,
     ) -> List[Document]:
-        qdrant_filters = convert_filters_to_qdrant(filters)
+        qdrant_filters = apply_index_generations(
+            convert_filters_to_qdrant(filters), self._generations
+        )
 
         points = await self.async_client.search(
             collection_name=self.index,
@@ -178,17 +378,7 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
                 name=DENSE_VECTORS_NAME if self.use_sparse_embeddings else "",
                 vector=query_embedding,
             ),
-            search_params=(
-                rest.SearchParams(
-                    quantization=rest.QuantizationSearchParams(
-                        rescore=True,
-                        oversampling=3.0,
-                    ),
-                )
-                if len(query_embedding)
-                >= 1024  # reference: https://qdrant.tech/articles/binary-quantization/#when-should-you-not-use-bq
-                else None
-            ),
+            search_params=self._search_params,
             query_filter=qdrant_filters,
             limit=top_k,
             with_vectors=return_embedding,
@@ -209,12 +399,15 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
                 document.score = score
         return results
 
+    @track_provider("document_store", "qdrant", "query_by_filters")
     async def _query_by_filters(
         self,
         filters: Optional[Dict[str, Any]] = None,
         top_k: Optional[int] = None,
     ) -> List[Document]:
-        qdrant_filters = convert_filters_to_qdrant(filters)
+        qdrant_filters = apply_index_generations(
+            convert_filters_to_qdrant(filters), self._generations
+        )
         points_list = []
         offset = None
         while True:
@@ -239,6 +432,7 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
         else:
             return []
 
+    @track_provider("document_store", "qdrant", "delete_documents")
     async def delete_documents(self, filters: Optional[Dict[str, Any]] = None):
         if not filters:
             qdrant_filters = rest.Filter()
@@ -256,11 +450,14 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
                 "Called QdrantDocumentStore.delete_documents() on a non-existing ID",
             )
 
+    @track_provider("document_store", "qdrant", "count_documents")
     async def count_documents(self, filters: Optional[Dict[str, Any]] = None) -> int:
-        if not filters:
-            qdrant_filters = rest.Filter()
-        else:
-            qdrant_filters = convert_filters_to_qdrant(filters)
+        qdrant_filters = (
+            apply_index_generations(
+                convert_filters_to_qdrant(filters), self._generations
+            )
+            or rest.Filter()
+        )
 
         return (
             await self.async_client.count(
@@ -268,6 +465,50 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
             )
         ).count
 
+    async def _ensure_collection(self) -> None:
+        async with self._collection_lock:
+            if self._collection_ready:
+                return
+
+            # the setup uses the sync client, so it runs in a thread to not block the event loop
+            await asyncio.to_thread(
+                self._set_up_collection,
+                self.index,
+                self.embedding_dim,
+                False,
+                self.similarity,
+                self.use_sparse_embeddings,
+                self.sparse_idf,
+                self.on_disk,
+                self.payload_fields_to_index,
+            )
+            self._collection_ready = True
+
+    async def _handle_duplicate_documents_async(
+        self, documents: List[Document], policy: DuplicatePolicy
+    ) -> List[Document]:
+        # documents with the same id simply replace each other, so there is nothing to check
+        if policy not in (DuplicatePolicy.SKIP, DuplicatePolicy.FAIL):
+            return documents
+
+        documents = self._drop_duplicate_documents(documents)
+        points = await self.async_client.retrieve(
+            collection_name=self.index,
+            ids=[convert_id(document.id) for document in documents],
+            with_payload=["id"],
+            with_vectors=False,
+        )
+        ids_exist_in_db = {point.payload["id"] for point in points}
+
+        if ids_exist_in_db and policy == DuplicatePolicy.FAIL:
+            msg = f"Document with ids '{', '.join(ids_exist_in_db)} already exists in index = '{self.index}'."
+            raise DuplicateDocumentError(msg)
+
+        return [
+            document for document in documents if document.id not in ids_exist_in_db
+        ]
+
+    @track_provider("document_store", "qdrant", "write_documents")
     async def write_documents(
         self, documents: List[Document], policy: DuplicatePolicy = DuplicatePolicy.FAIL
     ):
@@ -276,16 +517,7 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
                 msg = f"DocumentStore.write_documents() expects a list of Documents but got an element of {type(doc)}."
                 raise ValueError(msg)
 
-        self._set_up_collection(
-            self.index,
-            self.embedding_dim,
-            False,
-            self.similarity,
-            self.use_sparse_embeddings,
-            self.sparse_idf,
-            self.on_disk,
-            self.payload_fields_to_index,
-        )
+        await self._ensure_collection()
 
         if len(documents) == 0:
             logger.warning(
@@ -293,30 +525,45 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
             )
             return
 
-        document_objects = self._handle_duplicate_documents(
+        document_objects = await self._handle_duplicate_documents_async(
             documents=documents,
             policy=policy,
         )
 
-        batched_documents = document_store.get_batches_from_generator(
-            document_objects, self.write_batch_size
-        )
+        batches = [
+            convert_haystack_documents_to_qdrant_points(
+                document_batch,
+                use_sparse_embeddings=self.use_sparse_embeddings,
+            )
+            for document_batch in document_store.get_batches_from_generator(
+                document_objects, self.write_batch_size
+            )
+        ]
+        if not batches:
+            return 0
+
+        semaphore = asyncio.Semaphore(self._write_concurrency)
+
         with tqdm(
             total=len(document_objects), disable=not self.progress_bar
         ) as progress_bar:
-            for document_batch in batched_documents:
-                batch = convert_haystack_documents_to_qdrant_points(
-                    document_batch,
-                    use_sparse_embeddings=self.use_sparse_embeddings,
-                )
 
-                await self.async_client.upsert(
-                    collection_name=self.index,
-                    points=batch,
-                    wait=self.wait_result_from_api,
-                )
+            async def _upsert(batch: List[rest.PointStruct]) -> None:
+                async with semaphore:
+                    await self.async_client.upsert(
+                        collection_name=self.index,
+                        points=batch,
+                        wait=self.wait_result_from_api,
+                    )
+                progress_bar.update(len(batch))
+
+            try:
+                await asyncio.gather(*[_upsert(batch) for batch in batches])
+            except Exception:
+                # the collection may have been removed, so set it up again next time
+                self._collection_ready = False
+                raise
 
-                progress_bar.update(self.write_batch_size)
         return len(document_objects)
 
 
@@ -383,12 +630,16 @@ class QdrantProvider(DocumentStoreProvider):
             if os.getenv("SHOULD_FORCE_DEPLOY")
             else False
         ),
+        write_concurrency: int = 4,
+        collections: Optional[Dict[str, Dict[str, Any]]] = None,
         **_,
     ):
         self._location = location
         self._api_key = Secret.from_token(api_key) if api_key else None
         self._timeout = timeout
         self._embedding_model_dim = embedding_model_dim
+        self._write_concurrency = write_concurrency
+        self._collections = collections or {}
         self._reset_document_store(recreate_index)
 
     def _reset_document_store(self, recreate_index: bool):
@@ -408,30 +659,61 @@ class QdrantProvider(DocumentStoreProvider):
             f"Using Qdrant Document Store with Embedding Model Dimension: {self._embedding_model_dim}"
         )
 
+        config = self._collection_config(dataset_name or "Document")
+        vector_datatype, quantization = build_storage_config(config)
+        quantization_config = build_quantization_config(
+            quantization, self._embedding_model_dim
+        )
+
         return AsyncQdrantDocumentStore(
             location=self._location,
             api_key=self._api_key,
             embedding_dim=self._embedding_model_dim,
             index=dataset_name or "Document",
             recreate_index=recreate_index,
-            on_disk=True,
+            on_disk=config.get("on_disk", True),
             timeout=self._timeout,
-            quantization_config=(
-                rest.BinaryQuantization(
-                    binary=rest.BinaryQuantizationConfig(
-                        always_ram=True,
-                    )
-                )
-                if self._embedding_model_dim >= 1024
-                else None
+            write_concurrency=self._write_concurrency,
+            quantization_config=quantization_config,
+            hnsw_config=rest.HnswConfigDiff(**config.get("hnsw", {})),
+            search_params=build_search_params(
+                config.get("search"), quantized=quantization_config is not None
             ),
+            vector_datatype=vector_datatype,
+        )
+
+    def _collection_config(self, name: str) -> Dict[str, Any]:
+        """
+        The vector index settings of a collection, which can be set per collection in
+        config.yaml under `collections`, with `default` applying to all of them:
+
+        collections:
+          default:
+            on_disk: true
+            hnsw: {m: 0, payload_m: 16}
+          Document:
+            hnsw: {m: 16, payload_m: 16, ef_construct: 100}
+            quantization: {type: scalar, quantile: 0.99}
+            search: {hnsw_ef: 128, oversampling: 2.0}
+          sql_pairs:
+            datatype: float16
+
+        See `build_storage_config`, `build_quantization_config` and `build_search_params`.
+
+        The settings only apply when the collection is created, e.g. with
+        `recreate_index: true`.
+        """
+        default = self._collections.get("default", {})
+        config = {**default, **self._collections.get(name, {})}
+        config["hnsw"] = {
             # to improve the indexing performance, we disable building global index for the whole collection
             # see https://qdrant.tech/documentation/guides/multiple-partitions/?q=mul#calibrate-performance
-            hnsw_config=rest.HnswConfigDiff(
-                payload_m=16,
-                m=0,
-            ),
-        )
+            "payload_m": 16,
+            "m": 0,
+            **default.get("hnsw", {}),
+            **self._collections.get(name, {}).get("hnsw", {}),
+        }
+        return config
 
     def get_retriever(
         self,
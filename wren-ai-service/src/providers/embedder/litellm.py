@@ -3,12 +3,14 @@ import os
 from typing import Any, Dict, List, Optional, Tuple
 
 import backoff
+import numpy as np
 import openai
 from haystack import Document, component
 from litellm import aembedding
 from tqdm import tqdm
 
-from src.core.provider import EmbedderProvider
+from src.core.metrics import track_provider
+from src.core.provider import EmbedderProvider, validate_target_dimension
 from src.providers.loader import provider
 from src.utils import remove_trailing_slash
 
@@ -30,6 +32,28 @@ def _prepare_texts_to_embed(documents: List[Document]) -> List[str]:
     return texts_to_embed
 
 
+def truncate_embeddings(
+    embeddings: List[List[float]], dimension: Optional[int]
+) -> List[List[float]]:
+    """
+    Truncate the embeddings to their first `dimension` components and renormalize them,
+    which keeps most of the retrieval quality for models trained with Matryoshka
+    representation learning, e.g. OpenAI text-embedding-3 models.
+    """
+    if not dimension or not embeddings:
+        return embeddings
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if vectors.shape[1] < dimension:
+        raise ValueError(
+            f"Cannot truncate {vectors.shape[1]}-dimensional embeddings to {dimension} dimensions"
+        )
+
+    vectors = vectors[:, :dimension]
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return vectors.tolist()
+
+
 @component
 class AsyncTextEmbedder:
     def __init__(
@@ -38,16 +62,19 @@ class AsyncTextEmbedder:
         api_key: Optional[str] = None,
         api_base_url: Optional[str] = None,
         timeout: Optional[float] = None,
+        target_dimension: Optional[int] = None,
         **kwargs,
     ):
         self._api_key = api_key
         self._model = model
         self._api_base_url = api_base_url
         self._timeout = timeout
+        self._target_dimension = target_dimension
         self._kwargs = kwargs
 
     @component.output_types(embedding=List[float], meta=Dict[str, Any])
     @backoff.on_exception(backoff.expo, openai.APIError, max_time=60.0, max_tries=3)
+    @track_provider("embedder", "litellm_embedder", "embed_text")
     async def run(self, text: str):
         if not isinstance(text, str):
             raise TypeError(
@@ -73,7 +100,11 @@ class AsyncTextEmbedder:
             "usage": dict(response.usage) if hasattr(response, "usage") else {},
         }
 
-        return {"embedding": response.data[0]["embedding"], "meta": meta}
+        (embedding,) = truncate_embeddings(
+            [response.data[0]["embedding"]], self._target_dimension
+        )
+
+        return {"embedding": embedding, "meta": meta}
 
 
 @component
@@ -84,12 +115,14 @@ class AsyncDocumentEmbedder:
         api_key: Optional[str] = None,
         api_base_url: Optional[str] = None,
         timeout: Optional[float] = None,
+        target_dimension: Optional[int] = None,
         **kwargs,
     ):
         self._api_key = api_key
         self._model = model
         self._api_base_url = api_base_url
         self._timeout = timeout
+        self._target_dimension = target_dimension
         self._kwargs = kwargs
 
     async def _embed_batch(
@@ -112,7 +145,9 @@ class AsyncDocumentEmbedder:
                 **self._kwargs,
             )
             embeddings = [el["embedding"] for el in response.data]
-            all_embeddings.extend(embeddings)
+            all_embeddings.extend(
+                truncate_embeddings(embeddings, self._target_dimension)
+            )
 
             if "model" not in meta:
                 meta["model"] = response.model
@@ -129,6 +164,7 @@ class AsyncDocumentEmbedder:
 
     @component.output_types(documents=List[Document], meta=Dict[str, Any])
     @backoff.on_exception(backoff.expo, openai.RateLimitError, max_time=60, max_tries=3)
+    @track_provider("embedder", "litellm_embedder", "embed_documents")
     async def run(
         self, documents: List[Document], batch_size: int = 32, progress_bar: bool = True
     ):
@@ -166,12 +202,17 @@ class LitellmEmbedderProvider(EmbedderProvider):
         ] = None,  # e.g. EMBEDDER_OPENAI_API_KEY, EMBEDDER_ANTHROPIC_API_KEY, etc.
         api_base: Optional[str] = None,
         timeout: Optional[float] = 120.0,
+        target_dimension: Optional[int] = None,
         **kwargs,
     ):
         self._api_key = os.getenv(api_key_name) if api_key_name else None
         self._api_base = remove_trailing_slash(api_base) if api_base else None
         self._embedding_model = model
         self._timeout = timeout
+        self._dimension = kwargs.get("dimension")
+        self._target_dimension = validate_target_dimension(
+            target_dimension, self._dimension
+        )
         if "provider" in kwargs:
             del kwargs["provider"]
         self._kwargs = kwargs
@@ -187,6 +228,7 @@ class LitellmEmbedderProvider(EmbedderProvider):
             api_base_url=self._api_base,
             model=self._embedding_model,
             timeout=self._timeout,
+            target_dimension=self._target_dimension,
             **self._kwargs,
         )
 
@@ -196,5 +238,6 @@ class LitellmEmbedderProvider(EmbedderProvider):
             api_base_url=self._api_base,
             model=self._embedding_model,
             timeout=self._timeout,
+            target_dimension=self._target_dimension,
             **self._kwargs,
         )
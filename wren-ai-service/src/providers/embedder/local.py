@@ -0,0 +1,344 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from haystack import Document, component
+
+from src.core.metrics import track_provider
+from src.core.provider import EmbedderProvider, validate_target_dimension
+from src.providers.embedder.litellm import (
+    _prepare_texts_to_embed,
+    truncate_embeddings,
+)
+from src.providers.loader import provider
+
+logger = logging.getLogger("wren-ai-service")
+
+
+class OnnxEncoder:
+    """
+    Runs a sentence-embedding model exported to ONNX, e.g. with `optimum-cli export onnx`,
+    on CPU. `model_path` is either the .onnx file or a directory containing model.onnx,
+    and the tokenizer is the tokenizer.json next to it unless `tokenizer_path` is given.
+
+    The token embeddings are mean pooled over the attention mask, or the first token is
+    taken with `pooling: cls`; models which already output pooled embeddings are used as is.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        tokenizer_path: Optional[str] = None,
+        max_length: int = 512,
+        pooling: str = "mean",
+        normalize: bool = True,
+        num_threads: int = 0,
+    ):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError(
+                "The local_embedder provider requires onnxruntime, please install it with `pip install onnxruntime`"
+            ) from e
+        from tokenizers import Tokenizer
+
+        if os.path.isdir(model_path):
+            model_path = os.path.join(model_path, "model.onnx")
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        self._session = onnxruntime.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {input.name for input in self._session.get_inputs()}
+
+        self._tokenizer = Tokenizer.from_file(
+            tokenizer_path
+            or os.path.join(os.path.dirname(model_path), "tokenizer.json")
+        )
+        # the batches are padded to their longest text below
+        self._pad_id = (self._tokenizer.padding or {}).get("pad_id", 0)
+        self._tokenizer.no_padding()
+        self._tokenizer.enable_truncation(max_length)
+        self._pooling = pooling
+        self._normalize = normalize
+
+    def encode(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the embeddings of the texts and their number of tokens.
+        """
+        encodings = self._tokenizer.encode_batch(texts)
+        shape = (len(encodings), max(len(encoding.ids) for encoding in encodings))
+        input_ids = np.full(shape, self._pad_id, dtype=np.int64)
+        attention_mask = np.zeros(shape, dtype=np.int64)
+        token_type_ids = np.zeros(shape, dtype=np.int64)
+        for i, encoding in enumerate(encodings):
+            input_ids[i, : len(encoding.ids)] = encoding.ids
+            attention_mask[i, : len(encoding.ids)] = encoding.attention_mask
+            token_type_ids[i, : len(encoding.ids)] = encoding.type_ids
+
+        inputs = {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": token_type_ids,
+        }
+        output = self._session.run(
+            None, {name: inputs[name] for name in self._input_names}
+        )[0]
+
+        if output.ndim == 3:
+            if self._pooling == "cls":
+                output = output[:, 0]
+            else:
+                mask = attention_mask[..., None]
+                output = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1)
+        if self._normalize:
+            output = output / np.maximum(
+                np.linalg.norm(output, axis=1, keepdims=True), 1e-12
+            )
+
+        return output.astype(np.float32), attention_mask.sum(axis=1)
+
+
+class DynamicBatcher:
+    """
+    Merges the texts of concurrent requests into batches of up to `batch_size` texts
+    and encodes them in a pool of `num_workers` threads, so the event loop is never
+    blocked by the model. A batch is dispatched as soon as a worker is free, after
+    waiting at most `max_wait` seconds for more requests to join it; while all the
+    workers are busy, the waiting requests pile up into the next batches.
+    """
+
+    def __init__(
+        self,
+        encoder: OnnxEncoder,
+        batch_size: int = 32,
+        max_wait: float = 0.002,
+        num_workers: int = 1,
+    ):
+        self._encoder = encoder
+        self._batch_size = batch_size
+        self._max_wait = max_wait
+        self._num_workers = num_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=num_workers, thread_name_prefix="local-embedder"
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_dispatcher(self) -> None:
+        # the queue and the workers are bound to the event loop they were created in
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue: asyncio.Queue = asyncio.Queue()
+            self._deferred: List[Tuple[List[str], asyncio.Future]] = []
+            self._workers = asyncio.Semaphore(self._num_workers)
+            self._dispatcher: Optional[asyncio.Task] = None
+            self._running: set[asyncio.Task] = set()
+
+        # the dispatcher only runs while there are requests waiting
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    async def embed(self, texts: List[str]) -> Tuple[List[List[float]], int]:
+        """
+        Returns the embeddings of the texts and their total number of tokens.
+        """
+        if not texts:
+            return [], 0
+
+        futures = []
+        for i in range(0, len(texts), self._batch_size):
+            future = asyncio.get_running_loop().create_future()
+            futures.append(future)
+            self._ensure_dispatcher()
+            self._queue.put_nowait((texts[i : i + self._batch_size], future))
+
+        results = await asyncio.gather(*futures)
+        return (
+            [embedding for embeddings, _ in results for embedding in embeddings],
+            sum(tokens for _, tokens in results),
+        )
+
+    def _collect(self, requests: List, size: int) -> int:
+        # the requests which don't fit in the batch any more are deferred to the next one
+        deferred, self._deferred = self._deferred, []
+        while not self._queue.empty():
+            deferred.append(self._queue.get_nowait())
+        for request in deferred:
+            if size + len(request[0]) <= self._batch_size:
+                requests.append(request)
+                size += len(request[0])
+            else:
+                self._deferred.append(request)
+        return size
+
+    async def _dispatch(self) -> None:
+        while self._deferred or not self._queue.empty():
+            await self._workers.acquire()
+
+            requests = []
+            size = self._collect(requests, 0)
+            if size < self._batch_size and not self._deferred and self._max_wait:
+                await asyncio.sleep(self._max_wait)
+                self._collect(requests, size)
+
+            task = asyncio.create_task(self._run(requests))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, requests: List) -> None:
+        texts = [text for texts, _ in requests for text in texts]
+        try:
+            embeddings, tokens = await self._loop.run_in_executor(
+                self._executor, self._encoder.encode, texts
+            )
+        except Exception as e:
+            for _, future in requests:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            offset = 0
+            for texts, future in requests:
+                end = offset + len(texts)
+                if not future.done():
+                    future.set_result(
+                        (embeddings[offset:end].tolist(), int(tokens[offset:end].sum()))
+                    )
+                offset = end
+        finally:
+            self._workers.release()
+
+
+class _LocalEmbedder:
+    def __init__(
+        self,
+        model: str,
+        batcher: DynamicBatcher,
+        target_dimension: Optional[int] = None,
+    ):
+        self._model = model
+        self._batcher = batcher
+        self._target_dimension = target_dimension
+
+    async def _embed(self, texts: List[str]) -> Tuple[List[List[float]], int]:
+        embeddings, tokens = await self._batcher.embed(texts)
+        return truncate_embeddings(embeddings, self._target_dimension), tokens
+
+    def _meta(self, tokens: int) -> Dict[str, Any]:
+        return {
+            "model": self._model,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+
+@component
+class LocalTextEmbedder(_LocalEmbedder):
+    @component.output_types(embedding=List[float], meta=Dict[str, Any])
+    @track_provider("embedder", "local_embedder", "embed_text")
+    async def run(self, text: str):
+        if not isinstance(text, str):
+            raise TypeError(
+                "LocalTextEmbedder expects a string as an input."
+                "In case you want to embed a list of Documents, please use the LocalDocumentEmbedder."
+            )
+
+        embeddings, tokens = await self._embed([text.replace("\n", " ")])
+
+        return {"embedding": embeddings[0], "meta": self._meta(tokens)}
+
+
+@component
+class LocalDocumentEmbedder(_LocalEmbedder):
+    @component.output_types(documents=List[Document], meta=Dict[str, Any])
+    @track_provider("embedder", "local_embedder", "embed_documents")
+    async def run(
+        self, documents: List[Document], batch_size: int = 32, progress_bar: bool = True
+    ):
+        if (
+            not isinstance(documents, list)
+            or documents
+            and not isinstance(documents[0], Document)
+        ):
+            raise TypeError(
+                "LocalDocumentEmbedder expects a list of Documents as input."
+                "In case you want to embed a string, please use the LocalTextEmbedder."
+            )
+
+        # the texts are batched by the provider's batcher, together with other requests
+        embeddings, tokens = await self._embed(
+            _prepare_texts_to_embed(documents=documents)
+        )
+
+        for doc, emb in zip(documents, embeddings):
+            doc.embedding = emb
+
+        return {"documents": documents, "meta": self._meta(tokens)}
+
+
+@provider("local_embedder")
+class LocalEmbedderProvider(EmbedderProvider):
+    """
+    Embeds the texts in process with an ONNX model on CPU, see `OnnxEncoder`, instead
+    of calling a remote embedding API. The concurrent requests of all the pipelines
+    share one model and are batched together, see `DynamicBatcher`. `num_threads` is
+    the number of threads each worker uses for a batch, 0 lets onnxruntime decide.
+    """
+
+    def __init__(
+        self,
+        model: str = "local",
+        model_path: str = os.getenv("LOCAL_EMBEDDER_MODEL_PATH", ""),
+        tokenizer_path: Optional[str] = None,
+        max_length: int = 512,
+        pooling: str = "mean",
+        normalize: bool = True,
+        batch_size: int = 32,
+        max_wait_ms: float = 2.0,
+        num_workers: int = 1,
+        num_threads: int = 0,
+        dimension: Optional[int] = None,
+        target_dimension: Optional[int] = None,
+        **_,
+    ):
+        self._embedding_model = model
+        self._dimension = dimension
+        self._target_dimension = validate_target_dimension(target_dimension, dimension)
+        self._batcher = DynamicBatcher(
+            encoder=OnnxEncoder(
+                model_path=model_path,
+                tokenizer_path=tokenizer_path,
+                max_length=max_length,
+                pooling=pooling,
+                normalize=normalize,
+                num_threads=num_threads,
+            ),
+            batch_size=batch_size,
+            max_wait=max_wait_ms / 1000,
+            num_workers=num_workers,
+        )
+
+        logger.info(
+            f"Using local embedder provider with model: {self._embedding_model}, path: {model_path}"
+        )
+
+    def get_text_embedder(self):
+        return LocalTextEmbedder(
+            model=self._embedding_model,
+            batcher=self._batcher,
+            target_dimension=self._target_dimension,
+        )
+
+    def get_document_embedder(self):
+        return LocalDocumentEmbedder(
+            model=self._embedding_model,
+            batcher=self._batcher,
+            target_dimension=self._target_dimension,
+        )
@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from haystack import Document, component
+
+from src.core.metrics import track_provider
+from src.core.provider import EmbedderProvider, validate_target_dimension
+from src.providers.embedder.litellm import (
+    _prepare_texts_to_embed,
+    truncate_embeddings,
+)
+from src.providers.loader import provider
+from src.providers.mock import FaultInjector, LatencyModel
+
+logger = logging.getLogger("wren-ai-service")
+
+
+def _embed(text: str, dimension: int) -> List[float]:
+    """
+    Map a text to a deterministic unit vector, so identical texts always get
+    identical embeddings and exact-match retrieval works as expected.
+    """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    vector = np.random.default_rng(seed).standard_normal(dimension)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class _MockEmbedder:
+    def __init__(
+        self,
+        model: str,
+        dimension: int,
+        latency: LatencyModel,
+        fault_injector: FaultInjector,
+        rng: random.Random,
+        target_dimension: Optional[int] = None,
+    ):
+        self._model = model
+        self._dimension = dimension
+        self._target_dimension = target_dimension
+        self._latency = latency
+        self._fault_injector = fault_injector
+        self._rng = rng
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        await self._latency.wait(self._rng)
+        self._fault_injector.maybe_raise(self._rng, self._model, "mock_embedder")
+        return truncate_embeddings(
+            [_embed(text, self._dimension) for text in texts], self._target_dimension
+        )
+
+    def _meta(self, texts: List[str]) -> Dict[str, Any]:
+        # roughly 4 characters per token for english text
+        tokens = sum(len(text) for text in texts) // 4
+        return {
+            "model": self._model,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+
+@component
+class MockTextEmbedder(_MockEmbedder):
+    @component.output_types(embedding=List[float], meta=Dict[str, Any])
+    @track_provider("embedder", "mock_embedder", "embed_text")
+    async def run(self, text: str):
+        if not isinstance(text, str):
+            raise TypeError(
+                "MockTextEmbedder expects a string as an input."
+                "In case you want to embed a list of Documents, please use the MockDocumentEmbedder."
+            )
+
+        text_to_embed = text.replace("\n", " ")
+        embeddings = await self._embed_batch([text_to_embed])
+
+        return {"embedding": embeddings[0], "meta": self._meta([text_to_embed])}
+
+
+@component
+class MockDocumentEmbedder(_MockEmbedder):
+    @component.output_types(documents=List[Document], meta=Dict[str, Any])
+    @track_provider("embedder", "mock_embedder", "embed_documents")
+    async def run(
+        self, documents: List[Document], batch_size: int = 32, progress_bar: bool = True
+    ):
+        if (
+            not isinstance(documents, list)
+            or documents
+            and not isinstance(documents[0], Document)
+        ):
+            raise TypeError(
+                "MockDocumentEmbedder expects a list of Documents as input."
+                "In case you want to embed a string, please use the MockTextEmbedder."
+            )
+
+        texts_to_embed = _prepare_texts_to_embed(documents=documents)
+
+        embeddings = []
+        for i in range(0, len(texts_to_embed), batch_size):
+            embeddings.extend(
+                await self._embed_batch(texts_to_embed[i : i + batch_size])
+            )
+
+        for doc, emb in zip(documents, embeddings):
+            doc.embedding = emb
+
+        return {"documents": documents, "meta": self._meta(texts_to_embed)}
+
+
+@provider("mock_embedder")
+class MockEmbedderProvider(EmbedderProvider):
+    """
+    A deterministic embedder provider for load testing and local development.
+    Texts are hashed into unit vectors of the configured dimension, and every
+    batch waits for a latency sampled from `latency` (see `LatencyModel`).
+    `error_rate` and `rate_limit_rate` inject 500s and 429s.
+    """
+
+    def __init__(
+        self,
+        model: str = "mock",
+        dimension: int = (
+            int(os.getenv("EMBEDDING_MODEL_DIMENSION"))
+            if os.getenv("EMBEDDING_MODEL_DIMENSION")
+            else 3072
+        ),
+        latency: Optional[Dict[str, Any] | float] = None,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 0,
+        target_dimension: Optional[int] = None,
+        **_,
+    ):
+        self._embedding_model = model
+        self._dimension = dimension
+        self._target_dimension = validate_target_dimension(target_dimension, dimension)
+        self._latency = LatencyModel.from_config(latency)
+        self._fault_injector = FaultInjector(
+            error_rate=error_rate, rate_limit_rate=rate_limit_rate
+        )
+        self._rng = random.Random(seed)
+
+        logger.info(
+            f"Using mock embedder provider with model: {self._embedding_model}, dimension: {self._dimension}"
+        )
+
+    def _kwargs(self) -> Dict[str, Any]:
+        return {
+            "model": self._embedding_model,
+            "dimension": self._dimension,
+            "latency": self._latency,
+            "fault_injector": self._fault_injector,
+            "rng": self._rng,
+            "target_dimension": self._target_dimension,
+        }
+
+    def get_text_embedder(self):
+        return MockTextEmbedder(**self._kwargs())
+
+    def get_document_embedder(self):
+        return MockDocumentEmbedder(**self._kwargs())
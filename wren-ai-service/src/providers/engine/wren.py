@@ -7,7 +7,9 @@ from typing import Any, Dict, Optional, Tuple
 import aiohttp
 import orjson
 
+from src.core import arrow
 from src.core.engine import Engine, remove_limit_statement
+from src.core.metrics import track_provider
 from src.providers.loader import provider
 
 logger = logging.getLogger("wren-ai-service")
@@ -23,6 +25,7 @@ class WrenUI(Engine):
         self._endpoint = endpoint
         logger.info("Using Engine: wren_ui")
 
+    @track_provider("engine", "wren_ui", "execute_sql")
     async def execute_sql(
         self,
         sql: str,
@@ -106,6 +109,7 @@ class WrenIbis(Engine):
         )
         logger.info("Using Engine: wren_ibis")
 
+    @track_provider("engine", "wren_ibis", "execute_sql")
     async def execute_sql(
         self,
         sql: str,
@@ -121,6 +125,12 @@ class WrenIbis(Engine):
         else:
             api_endpoint += f"?limit={limit}"
 
+        # the results are streamed as Arrow IPC if the ibis server supports it
+        columnar = not dry_run and kwargs.get("result_format") == "arrow"
+        headers = (
+            {"Accept": f"{arrow.ARROW_STREAM}, application/json"} if columnar else None
+        )
+
         try:
             async with session.post(
                 api_endpoint,
@@ -129,10 +139,13 @@ class WrenIbis(Engine):
                     "manifestStr": self._manifest,
                     "connectionInfo": self._connection_info,
                 },
+                headers=headers,
                 timeout=aiohttp.ClientTimeout(total=timeout),
             ) as response:
                 if dry_run:
                     res = await response.text()
+                elif columnar and response.content_type == arrow.ARROW_STREAM:
+                    res = arrow.from_ipc(await response.read())
                 else:
                     res = await response.json()
 
@@ -156,6 +169,7 @@ class WrenIbis(Engine):
         except asyncio.TimeoutError:
             return False, None, f"Request timed out: {timeout} seconds"
 
+    @track_provider("engine", "wren_ibis", "get_func_list")
     async def get_func_list(
         self,
         session: aiohttp.ClientSession,
@@ -191,6 +205,7 @@ class WrenEngine(Engine):
         self._manifest = manifest
         logger.info("Using Engine: wren_engine")
 
+    @track_provider("engine", "wren_engine", "execute_sql")
     async def execute_sql(
         self,
         sql: str,
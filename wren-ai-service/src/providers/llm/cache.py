@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+from haystack.dataclasses import ChatMessage, StreamingChunk
+
+logger = logging.getLogger("wren-ai-service")
+
+
+class LLMResponseCache:
+    """
+    An exact-match cache of LLM completions persisted in SQLite, for deterministic
+    (temperature 0) calls which are repeated with byte-identical prompts, e.g. by eval
+    runs, force deployments or repeated semantics description requests. The entries are
+    keyed by a hash of the model, the messages and the generation kwargs, and the least
+    recently used ones are evicted once the stored completions exceed `max_size` bytes.
+
+    Use ":memory:" as the path to keep the completions in memory only. The calls are
+    blocking SQLite queries, so the async callers run them in a thread.
+    """
+
+    def __init__(self, path: str, max_size: int = 512 * 2**20):
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_responses_accessed_at ON llm_responses (accessed_at)"
+        )
+        self._conn.commit()
+        # the size of the stored completions, so that the eviction only runs once
+        # they exceed max_size
+        self._size = self._conn.execute(
+            "SELECT IFNULL(SUM(size), 0) FROM llm_responses"
+        ).fetchone()[0]
+
+    @staticmethod
+    def key(model: str, messages: List[Dict[str, Any]], kwargs: Dict[str, Any]) -> str:
+        return hashlib.sha256(
+            orjson.dumps(
+                {"model": model, "messages": messages, "kwargs": kwargs},
+                option=orjson.OPT_SORT_KEYS,
+                default=str,
+            )
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value FROM llm_responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                self._conn.execute(
+                    "UPDATE llm_responses SET accessed_at = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+                self._conn.commit()
+            return orjson.loads(row[0])
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read the LLM response cache: {e}")
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        data = orjson.dumps(value)
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT size FROM llm_responses WHERE key = ?", (key,)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?, ?)",
+                    (key, data, len(data), time.time()),
+                )
+                self._size += len(data) - (row[0] if row else 0)
+                if self._size <= self._max_size:
+                    self._conn.commit()
+                    return
+
+                # keeps the most recently used entries which fit in max_size
+                self._conn.execute(
+                    """
+                    DELETE FROM llm_responses WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (
+                                ORDER BY accessed_at DESC, key
+                            ) AS kept
+                            FROM llm_responses
+                        ) WHERE kept > ?
+                    )
+                    """,
+                    (self._max_size,),
+                )
+                self._conn.commit()
+                self._size = self._conn.execute(
+                    "SELECT IFNULL(SUM(size), 0) FROM llm_responses"
+                ).fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to write the LLM response cache: {e}")
+
+
+def to_cache_value(
+    completions: List[ChatMessage], chunks: Optional[List[StreamingChunk]] = None
+) -> Dict[str, Any]:
+    return {
+        "completions": [
+            {"content": message.content, "meta": message.meta}
+            for message in completions
+        ],
+        "chunks": [chunk.content for chunk in chunks] if chunks is not None else None,
+    }
+
+
+async def replay(
+    value: Dict[str, Any],
+    streaming_callback: Optional[Callable[[StreamingChunk], None]] = None,
+    query_id: Optional[str] = None,
+) -> List[ChatMessage]:
+    """
+    Rebuild the completions of a cached value. For a streaming call, the streamed
+    chunks, or the words of the completion if it wasn't streamed, are passed to the
+    streaming callback like a live completion.
+    """
+    completions = []
+    for completion in value["completions"]:
+        message = ChatMessage.from_assistant(completion["content"])
+        # no tokens were spent on a cached completion
+        message.meta.update({**completion["meta"], "usage": {}, "cached": True})
+        completions.append(message)
+
+    if streaming_callback is not None:
+        message = completions[0]
+        pieces = value["chunks"]
+        if pieces is None:
+            pieces = re.findall(r"\s*\S+\s*", message.content) or [message.content]
+        for i, piece in enumerate(pieces):
+            chunk = StreamingChunk(piece)
+            chunk.meta.update(
+                {
+                    "model": message.meta.get("model"),
+                    "index": 0,
+                    "finish_reason": (
+                        message.meta.get("finish_reason")
+                        if i == len(pieces) - 1
+                        else None
+                    ),
+                }
+            )
+            streaming_callback(chunk, query_id)
+            # let the consumers of the stream run between the chunks
+            await asyncio.sleep(0)
+
+    return completions
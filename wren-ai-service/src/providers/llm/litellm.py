@@ -1,3 +1,5 @@
+import asyncio
+import inspect
 import os
 from typing import Any, Callable, Dict, List, Optional
 
@@ -7,6 +9,7 @@ from haystack.components.generators.openai_utils import (
 from haystack.dataclasses import ChatMessage, StreamingChunk
 from litellm import Router
 
+from src.core.metrics import record_cache, track_provider
 from src.core.provider import LLMProvider
 from src.providers.llm import (
     build_chunk,
@@ -14,6 +17,7 @@ from src.providers.llm import (
     check_finish_reason,
     connect_chunks,
 )
+from src.providers.llm.cache import LLMResponseCache, replay, to_cache_value
 from src.providers.loader import provider
 from src.utils import extract_braces_content, remove_trailing_slash
 
@@ -33,6 +37,8 @@ class LitellmLLMProvider(LLMProvider):
         context_window_size: int = 100000,
         fallback_model_list: Optional[List[Dict[str, Any]]] = None,
         fallback_testing: bool = False,
+        response_cache_path: Optional[str] = os.getenv("LLM_RESPONSE_CACHE_PATH"),
+        response_cache_max_size_mb: float = 512,
         **_,
     ):
         self._model = model
@@ -56,6 +62,14 @@ class LitellmLLMProvider(LLMProvider):
         self._enable_fallback_testing = (
             fallback_testing and len(fallback_model_list) > 1
         )
+        # opt-in, only temperature 0 completions are cached
+        self._response_cache = (
+            LLMResponseCache(
+                response_cache_path, max_size=int(response_cache_max_size_mb * 2**20)
+            )
+            if response_cache_path
+            else None
+        )
 
     def get_generator(
         self,
@@ -68,6 +82,7 @@ class LitellmLLMProvider(LLMProvider):
             **(self._model_kwargs or {}),
         }
 
+        @track_provider("llm", "litellm_llm", "completion", model=self._model)
         async def _run(
             prompt: str,
             history_messages: Optional[List[ChatMessage]] = None,
@@ -95,35 +110,64 @@ class LitellmLLMProvider(LLMProvider):
                 **(generation_kwargs or {}),
             }
 
-            completion = await self._router.acompletion(
-                model=self._model,
-                messages=openai_formatted_messages,
-                stream=streaming_callback is not None,
-                mock_testing_fallbacks=self._enable_fallback_testing,
-                **generation_kwargs,
-            )
+            cache_key, cached = None, None
+            if self._response_cache and generation_kwargs.get("temperature") == 0:
+                cache_key = LLMResponseCache.key(
+                    self._model, openai_formatted_messages, generation_kwargs
+                )
+                cached = await asyncio.to_thread(self._response_cache.get, cache_key)
+                record_cache("llm_response", cached is not None)
 
-            completions: List[ChatMessage] = []
-            if streaming_callback is not None:
-                num_responses = generation_kwargs.pop("n", 1)
-                if num_responses > 1:
-                    raise ValueError(
-                        "Cannot stream multiple responses, please set n=1."
-                    )
-                chunks: List[StreamingChunk] = []
-
-                async for chunk in completion:
-                    if chunk.choices and streaming_callback:
-                        chunk_delta: StreamingChunk = build_chunk(chunk)
-                        chunks.append(chunk_delta)
-                        streaming_callback(
-                            chunk_delta, query_id
-                        )  # invoke callback with the chunk_delta
-                completions = [connect_chunks(chunk, chunks)]
+            if cached is not None:
+                completions = await replay(cached, streaming_callback, query_id)
             else:
-                completions = [
-                    build_message(completion, choice) for choice in completion.choices
-                ]
+                completion = await self._router.acompletion(
+                    model=self._model,
+                    messages=openai_formatted_messages,
+                    stream=streaming_callback is not None,
+                    mock_testing_fallbacks=self._enable_fallback_testing,
+                    **generation_kwargs,
+                )
+
+                completions: List[ChatMessage] = []
+                chunks: Optional[List[StreamingChunk]] = None
+                if streaming_callback is not None:
+                    num_responses = generation_kwargs.pop("n", 1)
+                    if num_responses > 1:
+                        raise ValueError(
+                            "Cannot stream multiple responses, please set n=1."
+                        )
+                    chunks = []
+
+                    try:
+                        async for chunk in completion:
+                            if chunk.choices and streaming_callback:
+                                chunk_delta: StreamingChunk = build_chunk(chunk)
+                                chunks.append(chunk_delta)
+                                streaming_callback(
+                                    chunk_delta, query_id
+                                )  # invoke callback with the chunk_delta
+                    except BaseException:
+                        # a stopped query cancels the streaming, the response of
+                        # the provider is closed instead of being read to the end
+                        await _close_stream(completion)
+                        raise
+                    completions = [connect_chunks(chunk, chunks)]
+                else:
+                    completions = [
+                        build_message(completion, choice)
+                        for choice in completion.choices
+                    ]
+
+                # truncated or filtered completions are not cached
+                if cache_key and all(
+                    message.meta["finish_reason"] == "stop" for message in completions
+                ):
+                    await asyncio.to_thread(
+                        self._response_cache.set,
+                        cache_key,
+                        to_cache_value(completions, chunks),
+                    )
 
             # before returning, do post-processing of the completions
             for response in completions:
@@ -137,3 +181,16 @@ class LitellmLLMProvider(LLMProvider):
             }
 
         return _run
+
+
+async def _close_stream(completion: Any) -> None:
+    stream = getattr(completion, "completion_stream", completion)
+    close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+    if close is None:
+        return
+
+    try:
+        if inspect.isawaitable(result := close()):
+            await result
+    except Exception:
+        pass
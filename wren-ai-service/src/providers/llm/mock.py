@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import random
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+from haystack.dataclasses import ChatMessage, StreamingChunk
+
+from src.core.metrics import track_provider
+from src.core.provider import LLMProvider
+from src.providers.llm import check_finish_reason
+from src.providers.loader import provider
+from src.providers.mock import FaultInjector, LatencyModel
+
+logger = logging.getLogger("wren-ai-service")
+
+
+def build_schema_instance(schema: Dict[str, Any], defs: Optional[Dict] = None) -> Any:
+    """
+    Build a minimal instance that is valid against the given JSON schema.
+
+    Only the subset of JSON schema generated by pydantic's `model_json_schema` is
+    supported, which is what the pipelines send as `response_format`.
+    """
+    defs = defs if defs is not None else schema.get("$defs", {})
+
+    if "$ref" in schema:
+        return build_schema_instance(defs[schema["$ref"].split("/")[-1]], defs)
+    if "const" in schema:
+        return schema["const"]
+    if "default" in schema:
+        return schema["default"]
+    if "enum" in schema:
+        return schema["enum"][0]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            return build_schema_instance(schema[key][0], defs)
+
+    _type = schema.get("type", "object" if "properties" in schema else "string")
+    if isinstance(_type, list):
+        _type = _type[0]
+
+    if _type == "object":
+        return {
+            name: build_schema_instance(prop, defs)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if _type == "array":
+        item = build_schema_instance(schema.get("items", {}), defs)
+        return [item] * schema.get("minItems", 1)
+    if _type == "integer":
+        return 0
+    if _type == "number":
+        return 0.0
+    if _type == "boolean":
+        return False
+    if _type == "null":
+        return None
+    return "mock"
+
+
+def _tokenize(content: str) -> List[str]:
+    return re.findall(r"\s*\S+\s*", content) or [content]
+
+
+@provider("mock_llm")
+class MockLLMProvider(LLMProvider):
+    """
+    A deterministic LLM provider for load testing and local development. It never
+    calls a remote model; instead it replies with canned or schema-valid responses
+    after a configurable latency, so that the rest of the service can be exercised
+    end to end without any API key.
+
+    - responses: canned replies keyed by the `json_schema` name of the `response_format`
+      (e.g. `sql_generation_result`, `intent_classification`); values can be a string
+      or a JSON object
+    - default_response: the reply for free-form (non structured) generations
+    - latency: time to first token, see `LatencyModel`
+    - tokens_per_second: streaming speed of the completion tokens; 0 means no delay
+    - error_rate / rate_limit_rate: probabilities of injected 500s and 429s
+    - seed: seed of the random generator used for latency and fault injection
+    """
+
+    def __init__(
+        self,
+        model: str = "mock",
+        kwargs: Optional[Dict[str, Any]] = None,
+        context_window_size: int = 100000,
+        responses: Optional[Dict[str, Any]] = None,
+        default_response: str = "This is a mock response.",
+        latency: Optional[Dict[str, Any] | float] = None,
+        tokens_per_second: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 0,
+        **_,
+    ):
+        self._model = model
+        self._model_kwargs = kwargs or {}
+        self._context_window_size = context_window_size
+        self._responses = responses or {}
+        self._default_response = default_response
+        self._latency = LatencyModel.from_config(latency)
+        self._tokens_per_second = tokens_per_second
+        self._fault_injector = FaultInjector(
+            error_rate=error_rate, rate_limit_rate=rate_limit_rate
+        )
+        self._rng = random.Random(seed)
+
+        logger.info(f"Using mock LLM provider with model: {self._model}")
+
+    def _reply(self, generation_kwargs: Dict[str, Any]) -> str:
+        response_format = generation_kwargs.get("response_format") or {}
+        json_schema = response_format.get("json_schema")
+
+        if json_schema:
+            name = json_schema.get("name", "")
+            if name in self._responses:
+                reply = self._responses[name]
+            else:
+                reply = build_schema_instance(json_schema.get("schema", {}))
+            return reply if isinstance(reply, str) else orjson.dumps(reply).decode()
+
+        if response_format.get("type") == "json_object":
+            reply = self._responses.get("json_object", {})
+            return reply if isinstance(reply, str) else orjson.dumps(reply).decode()
+
+        return self._default_response
+
+    def get_generator(
+        self,
+        system_prompt: Optional[str] = None,
+        generation_kwargs: Optional[Dict[str, Any]] = None,
+        streaming_callback: Optional[Callable[[StreamingChunk], None]] = None,
+    ):
+        combined_generation_kwargs = {
+            **(generation_kwargs or {}),
+            **(self._model_kwargs or {}),
+        }
+
+        @track_provider("llm", "mock_llm", "completion", model=self._model)
+        async def _run(
+            prompt: str,
+            history_messages: Optional[List[ChatMessage]] = None,
+            generation_kwargs: Optional[Dict[str, Any]] = None,
+            query_id: Optional[str] = None,
+        ):
+            generation_kwargs = {
+                **combined_generation_kwargs,
+                **(generation_kwargs or {}),
+            }
+
+            await self._latency.wait(self._rng)
+            self._fault_injector.maybe_raise(self._rng, self._model, "mock_llm")
+
+            content = self._reply(generation_kwargs)
+            tokens = _tokenize(content)
+            prompt_length = (
+                len(system_prompt or "")
+                + len(prompt)
+                + sum(len(message.content or "") for message in history_messages or [])
+            )
+            meta = {
+                "model": self._model,
+                "index": 0,
+                "finish_reason": "stop",
+                "usage": {
+                    # roughly 4 characters per token for english text
+                    "prompt_tokens": prompt_length // 4,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": prompt_length // 4 + len(tokens),
+                },
+            }
+
+            if streaming_callback is not None:
+                for i, token in enumerate(tokens):
+                    if self._tokens_per_second > 0:
+                        await asyncio.sleep(1 / self._tokens_per_second)
+                    chunk = StreamingChunk(token)
+                    chunk.meta.update(
+                        {
+                            "model": self._model,
+                            "index": 0,
+                            "finish_reason": "stop" if i == len(tokens) - 1 else None,
+                        }
+                    )
+                    streaming_callback(chunk, query_id)
+            elif self._tokens_per_second > 0:
+                await asyncio.sleep(len(tokens) / self._tokens_per_second)
+
+            message = ChatMessage.from_assistant(content)
+            message.meta.update(meta)
+            check_finish_reason(message)
+
+            return {
+                "replies": [message.content],
+                "meta": [message.meta],
+            }
+
+        return _run
@@ -0,0 +1,94 @@
+import asyncio
+import math
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, Literal, Optional
+
+import litellm
+
+
+@dataclass
+class LatencyModel:
+    """
+    A latency distribution used by the mock providers to simulate the response time
+    of a remote model. All the values are in seconds.
+
+    - fixed: always returns `mean`
+    - uniform: samples between `min` and `max`
+    - normal: samples from N(`mean`, `stddev`)
+    - lognormal: samples from a lognormal distribution whose mean and standard deviation
+      are `mean` and `stddev`, which is usually the shape of real LLM latencies
+
+    The sampled value is always clamped to [`min`, `max`].
+    """
+
+    distribution: Literal["fixed", "uniform", "normal", "lognormal"] = "fixed"
+    mean: float = 0.0
+    stddev: float = 0.0
+    min: float = 0.0
+    max: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any] | float]) -> "LatencyModel":
+        if config is None:
+            return cls()
+        if isinstance(config, (int, float)):
+            return cls(mean=float(config))
+        return cls(**config)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.distribution == "fixed":
+            value = self.mean
+        elif self.distribution == "uniform":
+            value = rng.uniform(
+                self.min, self.max if self.max is not None else self.mean
+            )
+        elif self.distribution == "normal":
+            value = rng.gauss(self.mean, self.stddev)
+        elif self.distribution == "lognormal":
+            if self.mean <= 0:
+                value = 0.0
+            else:
+                sigma = math.sqrt(math.log(1 + (self.stddev / self.mean) ** 2))
+                mu = math.log(self.mean) - sigma**2 / 2
+                value = rng.lognormvariate(mu, sigma)
+        else:
+            raise ValueError(f"Unknown latency distribution: {self.distribution}")
+
+        value = max(self.min, value)
+        if self.max is not None:
+            value = min(self.max, value)
+        return value
+
+    async def wait(self, rng: random.Random) -> None:
+        if (latency := self.sample(rng)) > 0:
+            await asyncio.sleep(latency)
+
+
+@dataclass
+class FaultInjector:
+    """
+    Randomly raises the same exceptions litellm raises for a failed request, so that
+    retry, fallback and error reporting paths are exercised under load.
+
+    - rate_limit_rate: probability of raising a 429 (litellm.RateLimitError)
+    - error_rate: probability of raising a 500 (litellm.InternalServerError)
+    """
+
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+
+    def maybe_raise(self, rng: random.Random, model: str, provider: str) -> None:
+        dice = rng.random()
+        if dice < self.rate_limit_rate:
+            raise litellm.RateLimitError(
+                message="Mock rate limit exceeded",
+                llm_provider=provider,
+                model=model,
+            )
+        if dice < self.rate_limit_rate + self.error_rate:
+            raise litellm.InternalServerError(
+                message="Mock internal server error",
+                llm_provider=provider,
+                model=model,
+            )
@@ -3,12 +3,15 @@ import logging
 import os
 import re
 from pathlib import Path
+from typing import Optional
 
 import requests
 from dotenv import load_dotenv
 from langfuse.decorators import langfuse_context
+from langfuse.decorators import observe as langfuse_observe
 
 from src.config import Settings
+from src.core.metrics import track_stage
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -87,6 +90,30 @@ def init_langfuse(settings: Settings):
     logger.info(f"LANGFUSE_HOST: {settings.langfuse_host}")
 
 
+def observe(name: Optional[str] = None, **kwargs):
+    """
+    A drop-in replacement of `langfuse.decorators.observe`. Besides creating the
+    Langfuse observation, it records the duration of the decorated function into the
+    `wren_ai_stage_duration_seconds` histogram exposed at `/metrics`, labelled by the
+    module and the observation name, so every Hamilton node, pipeline and service call
+    is measured even when Langfuse is disabled.
+
+    Args:
+        name (str, optional): the observation name, defaults to the function name
+        **kwargs: the other arguments of `langfuse.decorators.observe`
+
+    Returns:
+        Callable: the decorator
+    """
+
+    def decorator(func):
+        module = func.__module__.rsplit(".", 1)[-1]
+        timed = track_stage(stage=name or func.__name__, module=module)(func)
+        return langfuse_observe(name=name, **kwargs)(timed)
+
+    return decorator
+
+
 def trace_metadata(func):
     """
     This decorator is used to add metadata to the current Langfuse trace.
@@ -1,6 +1,6 @@
 from dataclasses import asdict
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 
 from src.globals import (
     ServiceContainer,
@@ -44,6 +44,10 @@ Endpoints:
    - Response: SemanticsPreparationStatusResponse
      {
        "status": "indexing" | "finished" | "failed",  # Current status of the preparation process
+       "progress": {                                 # Status of each indexing pipeline
+         "db_schema": "pending" | "indexing" | "finished" | "failed",
+         ...
+       },
        "error": {                                    # Present only if status is "failed"
          "code": "OTHERS",
          "message": "Detailed error message"
@@ -66,25 +70,19 @@ Usage:
 2. Use the `mdl_hash` returned by the POST request to check the preparation status via the GET endpoint.
 3. Use the DELETE endpoint to remove semantic data when no longer needed.
 
-Note: The preparation process is handled in the background using FastAPI's BackgroundTasks.
+Note: The preparation process is handled in the background by an indexing job queue, which serializes
+the jobs of the same project, only indexes the latest pending MDL of a project, limits the number of
+concurrent jobs and resumes unfinished jobs after a restart.
 """
 
 
 @router.post("/semantics-preparations")
 async def prepare_semantics(
     prepare_semantics_request: SemanticsPreparationRequest,
-    background_tasks: BackgroundTasks,
     service_container: ServiceContainer = Depends(get_service_container),
     service_metadata: ServiceMetadata = Depends(get_service_metadata),
 ) -> SemanticsPreparationResponse:
-    service_container.semantics_preparation_service._prepare_semantics_statuses[
-        prepare_semantics_request.mdl_hash
-    ] = SemanticsPreparationStatusResponse(
-        status="indexing",
-    )
-
-    background_tasks.add_task(
-        service_container.semantics_preparation_service.prepare_semantics,
+    await service_container.semantics_preparation_service.enqueue(
         prepare_semantics_request,
         service_metadata=asdict(service_metadata),
     )
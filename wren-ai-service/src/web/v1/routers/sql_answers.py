@@ -15,6 +15,8 @@ from src.web.v1.services.sql_answer import (
     SqlAnswerResponse,
     SqlAnswerResultRequest,
     SqlAnswerResultResponse,
+    StopSqlAnswerRequest,
+    StopSqlAnswerResponse,
 )
 
 router = APIRouter()
@@ -31,7 +33,7 @@ Endpoints:
      {
        "query": "user's question",
        "sql": "SELECT * FROM table_name WHERE condition",      # Actual SQL statement
-       "sql_data": <dictionary>,                                   # Preprocessed SQL data
+       "sql_data": <dictionary>,                                   # Optional SQL data, fetched by executing the SQL if omitted
        "project_id": "unique-project-id",                        # Optional project identifier for tracking
        "thread_id": "unique-thread-id",                        # Optional thread identifier for tracking
      }
@@ -40,13 +42,25 @@ Endpoints:
        "query_id": "unique-uuid"                              # Unique identifier for the initiated SQL operation
      }
 
-2. GET /sql-answers/{query_id}
+2. PATCH /sql-answers/{query_id}
+   - Stops a SQL answer operation, including the streaming of its answer
+   - Path parameter: query_id (str)
+   - Request body: StopSqlAnswerRequest
+     {
+       "status": "stopped"
+     }
+   - Response: StopSqlAnswerResponse
+     {
+       "query_id": "unique-uuid"
+     }
+
+3. GET /sql-answers/{query_id}
    - Retrieves the status and result of a SQL answer operation
    - Path parameter: query_id (str)
    - Response: SqlAnswerResultResponse
      {
        "query_id": "unique-uuid",                             # Unique identifier of the SQL answer operation
-       "status": "preprocessing" | "succeeded" | "failed",
+       "status": "preprocessing" | "succeeded" | "failed" | "stopped",
        "num_rows_used_in_llm": int | None,
        "error": {                                             # Present only if status is "failed"
          "code": "OTHERS",
@@ -54,7 +68,7 @@ Endpoints:
        }
      }
 
-3. **GET /sql-answers/{query_id}/streaming**
+4. **GET /sql-answers/{query_id}/streaming**
    - Retrieves the streaming result of a SQL answer.
    - **Path Parameter**:
      - `query_id`: The unique identifier of the query.
@@ -88,6 +102,21 @@ async def sql_answer(
     return SqlAnswerResponse(query_id=query_id)
 
 
+@router.patch("/sql-answers/{query_id}")
+async def stop_sql_answer(
+    query_id: str,
+    stop_sql_answer_request: StopSqlAnswerRequest,
+    background_tasks: BackgroundTasks,
+    service_container: ServiceContainer = Depends(get_service_container),
+) -> StopSqlAnswerResponse:
+    stop_sql_answer_request.query_id = query_id
+    background_tasks.add_task(
+        service_container.sql_answer_service.stop_sql_answer,
+        stop_sql_answer_request,
+    )
+    return StopSqlAnswerResponse(query_id=query_id)
+
+
 @router.get("/sql-answers/{query_id}")
 async def get_sql_answer_result(
     query_id: str,
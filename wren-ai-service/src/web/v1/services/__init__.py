@@ -1,8 +1,13 @@
-from typing import Literal, Optional
+import asyncio
+import functools
+import logging
+from typing import Any, Coroutine, Dict, Literal, Optional, Set
 
 import orjson
 from pydantic import BaseModel
 
+logger = logging.getLogger("wren-ai-service")
+
 
 class MetadataTraceable:
     def with_metadata(self) -> dict:
@@ -60,6 +65,66 @@ class BaseRequest(BaseModel):
         self._query_id = query_id
 
 
+class QueryTasks:
+    """
+    The tasks running for the queries of a service, so that stopping a query cancels
+    its work in flight, i.e. its LLM and engine requests, instead of only marking it as
+    stopped. The tasks are forgotten once done.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, Set[asyncio.Task]] = {}
+
+    def __contains__(self, query_id: str) -> bool:
+        return query_id in self._tasks
+
+    def spawn(self, query_id: str, coroutine: Coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coroutine)
+        self._tasks.setdefault(query_id, set()).add(task)
+        task.add_done_callback(functools.partial(self._forget, query_id))
+        return task
+
+    def _forget(self, query_id: str, task: asyncio.Task) -> None:
+        if (tasks := self._tasks.get(query_id)) is not None:
+            tasks.discard(task)
+            if not tasks:
+                del self._tasks[query_id]
+
+    async def run(self, query_id: str, coroutine: Coroutine) -> Any:
+        """
+        Runs the coroutine as a task of the query, returns None if the query is stopped.
+        """
+        try:
+            return await self.spawn(query_id, coroutine)
+        except asyncio.CancelledError:
+            # the caller itself is cancelled, e.g. on shutdown
+            if asyncio.current_task().cancelling():
+                raise
+            logger.info(f"Query {query_id} is stopped")
+            return None
+
+    def cancel(self, query_id: str) -> int:
+        tasks = self._tasks.pop(query_id, set())
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+
+def stoppable(func):
+    """
+    Runs a service method on a request as a task of the `_tasks` of the service for
+    the query id of the request, which the stop request of the query cancels.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(self, request: BaseRequest, *args, **kwargs):
+        return await self._tasks.run(
+            request.query_id, func(self, request, *args, **kwargs)
+        )
+
+    return wrapper
+
+
 # Put the services imports here to avoid circular imports and make them accessible directly to the rest of packages
 from .ask import AskService  # noqa: E402
 from .chart import ChartService  # noqa: E402
@@ -2,13 +2,12 @@ import asyncio
 import logging
 from typing import Dict, List, Literal, Optional
 
-from cachetools import TTLCache
-from langfuse.decorators import observe
 from pydantic import AliasChoices, BaseModel, Field
 
+from src.core.metrics import StatusTrackingCache, record_cache
 from src.core.pipeline import BasicPipeline
-from src.utils import trace_metadata
-from src.web.v1.services import BaseRequest, SSEEvent
+from src.utils import observe, trace_metadata
+from src.web.v1.services import BaseRequest, QueryTasks, SSEEvent, stoppable
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -133,6 +132,15 @@ class AskFeedbackResultResponse(BaseModel):
 
 
 class AskService:
+    # the pipelines which stream their results to the clients of a query
+    _STREAMING_PIPELINES = (
+        "misleading_assistance",
+        "data_assistance",
+        "user_guide_assistance",
+        "sql_generation_reasoning",
+        "followup_sql_generation_reasoning",
+    )
+
     def __init__(
         self,
         pipelines: Dict[str, BasicPipeline],
@@ -146,18 +154,25 @@ class AskService:
         ttl: int = 120,
     ):
         self._pipelines = pipelines
-        self._ask_results: Dict[str, AskResultResponse] = TTLCache(
-            maxsize=maxsize, ttl=ttl
-        )
-        self._ask_feedback_results: Dict[str, AskFeedbackResultResponse] = TTLCache(
-            maxsize=maxsize, ttl=ttl
+        self._ask_results: Dict[str, AskResultResponse] = StatusTrackingCache(
+            service="ask", maxsize=maxsize, ttl=ttl
         )
+        self._ask_feedback_results: Dict[
+            str, AskFeedbackResultResponse
+        ] = StatusTrackingCache(service="ask_feedback", maxsize=maxsize, ttl=ttl)
         self._allow_sql_generation_reasoning = allow_sql_generation_reasoning
         self._allow_sql_functions_retrieval = allow_sql_functions_retrieval
         self._allow_intent_classification = allow_intent_classification
         self._enable_column_pruning = enable_column_pruning
         self._max_histories = max_histories
         self._max_sql_correction_retries = max_sql_correction_retries
+        self._tasks = QueryTasks()
+
+    def _stop(self, query_id: str) -> None:
+        self._tasks.cancel(query_id)
+        for name in self._STREAMING_PIPELINES:
+            if (pipeline := self._pipelines.get(name)) is not None:
+                pipeline.stop_streaming_results(query_id)
 
     def _is_stopped(self, query_id: str, container: dict):
         if (
@@ -167,6 +182,7 @@ class AskService:
 
         return False
 
+    @stoppable
     @observe(name="Ask Question")
     @trace_metadata
     async def ask(
@@ -230,6 +246,7 @@ class AskService:
                 historical_question_result = historical_question.get(
                     "formatted_output", {}
                 ).get("documents", [])[:1]
+                record_cache("historical_question", bool(historical_question_result))
 
                 if historical_question_result:
                     api_results = [
@@ -285,7 +302,8 @@ class AskService:
                             user_query = rephrased_question
 
                         if intent == "MISLEADING_QUERY":
-                            asyncio.create_task(
+                            self._tasks.spawn(
+                                query_id,
                                 self._pipelines["misleading_assistance"].run(
                                     query=user_query,
                                     histories=histories,
@@ -294,7 +312,7 @@ class AskService:
                                     ),
                                     language=ask_request.configurations.language,
                                     query_id=ask_request.query_id,
-                                )
+                                ),
                             )
 
                             self._ask_results[query_id] = AskResultResponse(
@@ -309,7 +327,8 @@ class AskService:
                             results["metadata"]["type"] = "MISLEADING_QUERY"
                             return results
                         elif intent == "GENERAL":
-                            asyncio.create_task(
+                            self._tasks.spawn(
+                                query_id,
                                 self._pipelines["data_assistance"].run(
                                     query=user_query,
                                     histories=histories,
@@ -318,7 +337,7 @@ class AskService:
                                     ),
                                     language=ask_request.configurations.language,
                                     query_id=ask_request.query_id,
-                                )
+                                ),
                             )
 
                             self._ask_results[query_id] = AskResultResponse(
@@ -333,12 +352,13 @@ class AskService:
                             results["metadata"]["type"] = "GENERAL"
                             return results
                         elif intent == "USER_GUIDE":
-                            asyncio.create_task(
+                            self._tasks.spawn(
+                                query_id,
                                 self._pipelines["user_guide_assistance"].run(
                                     query=user_query,
                                     language=ask_request.configurations.language,
                                     query_id=ask_request.query_id,
-                                )
+                                ),
                             )
 
                             self._ask_results[query_id] = AskResultResponse(
@@ -633,6 +653,7 @@ class AskService:
         self._ask_results[stop_ask_request.query_id] = AskResultResponse(
             status="stopped",
         )
+        self._stop(stop_ask_request.query_id)
 
     def get_ask_result(
         self,
@@ -681,6 +702,7 @@ class AskService:
                     )
                     yield event.serialize()
 
+    @stoppable
     @observe(name="Ask Feedback")
     @trace_metadata
     async def ask_feedback(
@@ -873,6 +895,7 @@ class AskService:
         ] = AskFeedbackResultResponse(
             status="stopped",
         )
+        self._stop(stop_ask_feedback_request.query_id)
 
     def get_ask_feedback_result(
         self,
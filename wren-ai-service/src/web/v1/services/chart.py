@@ -2,12 +2,11 @@ import logging
 from typing import Any, Dict, Literal, Optional
 
 from cachetools import TTLCache
-from langfuse.decorators import observe
 from pydantic import BaseModel
 
 from src.core.pipeline import BasicPipeline
-from src.utils import trace_metadata
-from src.web.v1.services import BaseRequest
+from src.utils import observe, trace_metadata
+from src.web.v1.services import BaseRequest, QueryTasks, stoppable
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -70,6 +69,7 @@ class ChartService:
         self._chart_results: Dict[str, ChartResultResponse] = TTLCache(
             maxsize=maxsize, ttl=ttl
         )
+        self._tasks = QueryTasks()
 
     def _is_stopped(self, query_id: str):
         if (
@@ -79,6 +79,7 @@ class ChartService:
 
         return False
 
+    @stoppable
     @observe(name="Generate Chart")
     @trace_metadata
     async def chart(
@@ -173,6 +174,7 @@ class ChartService:
         self._chart_results[stop_chart_request.query_id] = ChartResultResponse(
             status="stopped",
         )
+        self._tasks.cancel(stop_chart_request.query_id)
 
     def get_chart_result(
         self,
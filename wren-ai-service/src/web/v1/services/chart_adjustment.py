@@ -2,12 +2,11 @@ import logging
 from typing import Dict, Literal, Optional
 
 from cachetools import TTLCache
-from langfuse.decorators import observe
 from pydantic import BaseModel
 
 from src.core.pipeline import BasicPipeline
-from src.utils import trace_metadata
-from src.web.v1.services import BaseRequest
+from src.utils import observe, trace_metadata
+from src.web.v1.services import BaseRequest, QueryTasks, stoppable
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -29,6 +28,7 @@ class ChartAdjustmentRequest(BaseRequest):
     sql: str
     adjustment_option: ChartAdjustmentOption
     chart_schema: dict
+    remove_data_from_chart_schema: Optional[bool] = True
 
 
 class ChartAdjustmentResponse(BaseModel):
@@ -82,6 +82,7 @@ class ChartAdjustmentService:
         self._chart_adjustment_results: Dict[
             str, ChartAdjustmentResultResponse
         ] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._tasks = QueryTasks()
 
     def _is_stopped(self, query_id: str):
         if (
@@ -91,6 +92,7 @@ class ChartAdjustmentService:
 
         return False
 
+    @stoppable
     @observe(name="Adjust Chart")
     @trace_metadata
     async def chart_adjustment(
@@ -135,6 +137,7 @@ class ChartAdjustmentService:
                 chart_schema=chart_adjustment_request.chart_schema,
                 data=sql_data,
                 language=chart_adjustment_request.configurations.language,
+                remove_data_from_chart_schema=chart_adjustment_request.remove_data_from_chart_schema,
             )
             chart_result = chart_adjustment_result["post_process"]["results"]
 
@@ -190,6 +193,7 @@ class ChartAdjustmentService:
         ] = ChartAdjustmentResultResponse(
             status="stopped",
         )
+        self._tasks.cancel(stop_chart_adjustment_request.query_id)
 
     def get_chart_adjustment_result(
         self,
@@ -0,0 +1,284 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional
+
+import orjson
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger("wren-ai-service")
+
+
+class IndexingJob(BaseModel):
+    mdl_hash: str
+    project_id: Optional[str] = None
+    mdl: str = Field(repr=False)
+    request_from: Literal["ui", "api"] = "ui"
+    service_metadata: dict = Field(default_factory=dict, repr=False)
+    status: Literal[
+        "pending", "indexing", "finished", "failed", "superseded"
+    ] = "pending"
+    progress: Dict[str, Literal["pending", "indexing", "finished", "failed"]] = Field(
+        default_factory=dict
+    )
+    error: Optional[str] = None
+    # the index generation the job writes to, see `IndexGenerations`
+    generation: Optional[str] = None
+
+    @property
+    def queue_key(self) -> str:
+        return self.project_id or ""
+
+
+class IndexingJobStore:
+    """
+    Persists the indexing jobs in SQLite, so that unfinished jobs can be resumed and
+    their status can still be reported after a restart. The MDL is written once when
+    the job is submitted; later updates only touch the status columns.
+
+    Use ":memory:" as the path to keep the jobs in memory only. The store can be
+    used from worker threads, e.g. `asyncio.to_thread`, to keep the writes off the
+    event loop.
+    """
+
+    _UNFINISHED_STATUSES = ("pending", "indexing")
+    _ACTIVE_ROWIDS = """
+        SELECT rowid FROM indexing_jobs AS job
+        WHERE status = 'finished' AND generation IS NOT NULL AND updated_at = (
+            SELECT MAX(updated_at) FROM indexing_jobs
+            WHERE status = 'finished' AND generation IS NOT NULL
+            AND IFNULL(project_id, '') = IFNULL(job.project_id, '')
+        )
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS indexing_jobs (
+                mdl_hash TEXT PRIMARY KEY,
+                project_id TEXT,
+                mdl TEXT NOT NULL,
+                request_from TEXT NOT NULL,
+                service_metadata BLOB NOT NULL,
+                status TEXT NOT NULL,
+                progress BLOB NOT NULL,
+                error TEXT,
+                generation TEXT,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _write(self, sql: str, parameters: tuple) -> None:
+        with self._lock:
+            self._conn.execute(sql, parameters)
+            self._conn.commit()
+
+    def _read(self, sql: str, parameters: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, parameters).fetchall()
+
+    def add(self, job: IndexingJob) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO indexing_jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                job.mdl_hash,
+                job.project_id,
+                job.mdl,
+                job.request_from,
+                orjson.dumps(job.service_metadata),
+                job.status,
+                orjson.dumps(job.progress),
+                job.error,
+                job.generation,
+                time.time(),
+            ),
+        )
+
+    def update(self, job: IndexingJob) -> None:
+        self._write(
+            "UPDATE indexing_jobs SET status = ?, progress = ?, error = ?, generation = ?, updated_at = ? WHERE mdl_hash = ?",
+            (
+                job.status,
+                orjson.dumps(job.progress),
+                job.error,
+                job.generation,
+                time.time(),
+                job.mdl_hash,
+            ),
+        )
+
+    def _to_job(self, row: tuple) -> IndexingJob:
+        return IndexingJob(
+            mdl_hash=row[0],
+            project_id=row[1],
+            mdl=row[2],
+            request_from=row[3],
+            service_metadata=orjson.loads(row[4]),
+            status=row[5],
+            progress=orjson.loads(row[6]),
+            error=row[7],
+            generation=row[8],
+        )
+
+    def get(self, mdl_hash: str) -> Optional[IndexingJob]:
+        rows = self._read("SELECT * FROM indexing_jobs WHERE mdl_hash = ?", (mdl_hash,))
+        return self._to_job(rows[0]) if rows else None
+
+    def unfinished(self) -> List[IndexingJob]:
+        rows = self._read(
+            "SELECT * FROM indexing_jobs WHERE status IN (?, ?) ORDER BY updated_at",
+            self._UNFINISHED_STATUSES,
+        )
+        return [self._to_job(row) for row in rows]
+
+    def active(self) -> List[IndexingJob]:
+        """
+        The latest finished job of each project, whose generation is the active one.
+        """
+        rows = self._read(
+            f"SELECT * FROM indexing_jobs WHERE rowid IN ({self._ACTIVE_ROWIDS})"
+        )
+        return [self._to_job(row) for row in rows]
+
+    def prune(self, ttl: float) -> None:
+        # the active jobs are kept to know the active generation after a restart
+        self._write(
+            "DELETE FROM indexing_jobs WHERE status NOT IN (?, ?) AND updated_at < ? "
+            f"AND rowid NOT IN ({self._ACTIVE_ROWIDS})",
+            (*self._UNFINISHED_STATUSES, time.time() - ttl),
+        )
+
+
+class IndexingJobQueue:
+    """
+    Runs indexing jobs in the background with the following guarantees:
+
+    - jobs of the same project run one at a time, in submission order
+    - a pending job is superseded by a newer job of the same project, so only the
+      latest MDL of a project is indexed after a burst of deployments
+    - at most `max_concurrency` jobs run at the same time across all projects
+    - every job is persisted in the `IndexingJobStore`, and `resume` re-schedules
+      the jobs which were pending or running when the service stopped
+
+    The store is written by a single worker thread, off the event loop and in the
+    order of the writes.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[IndexingJob], Awaitable[None]],
+        store: IndexingJobStore,
+        max_concurrency: int = 1,
+        on_superseded: Optional[Callable[[IndexingJob, IndexingJob], None]] = None,
+    ):
+        self._run = run
+        self._store = store
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._on_superseded = on_superseded
+        self._pending: Dict[str, IndexingJob] = {}
+        self._running: Dict[str, IndexingJob] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="indexing-job-store"
+        )
+
+    @property
+    def store(self) -> IndexingJobStore:
+        return self._store
+
+    def _write(self, func: Callable[..., Any], *args) -> asyncio.Future:
+        # the writes are submitted to the thread right away, so they are applied in
+        # the order they are made
+        return asyncio.get_running_loop().run_in_executor(self._writer, func, *args)
+
+    def queued(self, project_id: Optional[str], mdl_hash: str) -> Optional[IndexingJob]:
+        """
+        The pending or running job of the MDL, if any.
+        """
+        key = project_id or ""
+        for active in (self._pending.get(key), self._running.get(key)):
+            if active is not None and active.mdl_hash == mdl_hash:
+                return active
+        return None
+
+    async def submit(self, job: IndexingJob, persist: bool = True) -> IndexingJob:
+        key = job.queue_key
+
+        if (active := self.queued(job.project_id, job.mdl_hash)) is not None:
+            logger.info(f"Indexing job {job.mdl_hash} is already queued, skipped")
+            return active
+
+        writes = []
+        if persist:
+            writes.append(self._write(self._store.add, job.model_copy(deep=True)))
+
+        if (superseded := self._pending.get(key)) is not None:
+            logger.info(
+                f"Indexing job {superseded.mdl_hash} is superseded by {job.mdl_hash}"
+            )
+            superseded.status = "superseded"
+            superseded.error = f"Superseded by a newer MDL: {job.mdl_hash}"
+            writes.append(
+                self._write(self._store.update, superseded.model_copy(deep=True))
+            )
+            if self._on_superseded:
+                self._on_superseded(superseded, job)
+
+        self._pending[key] = job
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._work(key))
+
+        await asyncio.gather(*writes)
+        return job
+
+    async def resume(self) -> List[IndexingJob]:
+        jobs = await self._write(self._store.unfinished)
+        for job in jobs:
+            job.status = "pending"
+            await self.submit(job, persist=False)
+
+        if jobs:
+            logger.info(f"Resumed {len(jobs)} unfinished indexing jobs")
+        return jobs
+
+    async def prune(self, ttl: float) -> None:
+        await self._write(self._store.prune, ttl)
+
+    async def update(self, job: IndexingJob) -> None:
+        # the job is copied, as it keeps changing while it is written in the thread
+        await self._write(self._store.update, job.model_copy(deep=True))
+
+    async def join(self) -> None:
+        while self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
+
+    async def _work(self, key: str) -> None:
+        try:
+            while (job := self._pending.pop(key, None)) is not None:
+                self._running[key] = job
+                try:
+                    async with self._semaphore:
+                        job.status = "indexing"
+                        await self.update(job)
+                        await self._run(job)
+                        if job.status == "indexing":
+                            job.status = "finished"
+                        await self.update(job)
+                except Exception as e:
+                    logger.exception(f"Indexing job {job.mdl_hash} failed: {e}")
+                    job.status = "failed"
+                    job.error = str(e)
+                    await self.update(job)
+                finally:
+                    self._running.pop(key, None)
+        finally:
+            self._workers.pop(key, None)
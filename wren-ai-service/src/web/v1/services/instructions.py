@@ -2,12 +2,11 @@ import logging
 from typing import Dict, List, Literal, Optional
 
 from cachetools import TTLCache
-from langfuse.decorators import observe
 from pydantic import BaseModel
 
 from src.core.pipeline import BasicPipeline
 from src.pipelines.indexing.instructions import Instruction
-from src.utils import trace_metadata
+from src.utils import observe, trace_metadata
 from src.web.v1.services import BaseRequest, MetadataTraceable
 
 logger = logging.getLogger("wren-ai-service")
@@ -4,11 +4,10 @@ from typing import Dict, Literal, Optional
 
 import orjson
 from cachetools import TTLCache
-from langfuse.decorators import observe
 from pydantic import BaseModel
 
 from src.core.pipeline import BasicPipeline
-from src.utils import trace_metadata
+from src.utils import observe, trace_metadata
 from src.web.v1.services import BaseRequest, Configuration, MetadataTraceable
 
 logger = logging.getLogger("wren-ai-service")
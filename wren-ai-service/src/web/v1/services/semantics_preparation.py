@@ -1,14 +1,23 @@
 import asyncio
 import logging
+import uuid
 from typing import Dict, Literal, Optional
 
-from cachetools import TTLCache
-from langfuse.decorators import observe
 from pydantic import AliasChoices, BaseModel, Field
 
+from src.core.generations import INDEX_GENERATIONS, IndexGenerations
+from src.core.metrics import StatusTrackingCache
 from src.core.pipeline import BasicPipeline
-from src.utils import trace_metadata
+from src.core.result_cache import QueryResultCache
+from src.pipelines.generation.utils.sql import SQLValidator
+from src.pipelines.indexing import ParsedMDL
+from src.utils import observe, trace_metadata
 from src.web.v1.services import BaseRequest
+from src.web.v1.services.indexing_queue import (
+    IndexingJob,
+    IndexingJobQueue,
+    IndexingJobStore,
+)
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -41,19 +50,206 @@ class SemanticsPreparationStatusResponse(BaseModel):
 
     status: Literal["indexing", "finished", "failed"]
     error: Optional[SemanticsPreparationError] = None
+    # the status of each indexing pipeline, e.g. {"db_schema": "finished"}
+    progress: Optional[
+        Dict[str, Literal["pending", "indexing", "finished", "failed"]]
+    ] = None
 
 
 class SemanticsPreparationService:
+    _INDEXING_PIPELINES = [
+        "db_schema",
+        "historical_question",
+        "table_description",
+        "sql_pairs",
+        "project_meta",
+    ]
+    # the pipelines which index the whole MDL again, so they write a new generation
+    # next to the active one, see `IndexGenerations`
+    _GENERATION_PIPELINES = [
+        "db_schema",
+        "historical_question",
+        "table_description",
+        "project_meta",
+    ]
+
     def __init__(
         self,
         pipelines: Dict[str, BasicPipeline],
         maxsize: int = 1_000_000,
         ttl: int = 120,
+        job_store_path: str = ":memory:",
+        max_concurrency: int = 1,
+        generations: Optional[IndexGenerations] = None,
+        result_cache: Optional[QueryResultCache] = None,
+        sql_validator: Optional[SQLValidator] = None,
     ):
         self._pipelines = pipelines
+        self._generations = generations or INDEX_GENERATIONS
+        self._result_cache = result_cache
+        self._sql_validator = sql_validator
+        self._background_tasks: set[asyncio.Task] = set()
+        self._ttl = ttl
         self._prepare_semantics_statuses: Dict[
             str, SemanticsPreparationStatusResponse
-        ] = TTLCache(maxsize=maxsize, ttl=ttl)
+        ] = StatusTrackingCache(
+            service="semantics_preparation", maxsize=maxsize, ttl=ttl
+        )
+        self._job_queue = IndexingJobQueue(
+            run=self._run_job,
+            store=IndexingJobStore(job_store_path),
+            max_concurrency=max_concurrency,
+            on_superseded=self._on_superseded,
+        )
+
+    def _indexing_status(
+        self, progress: Optional[Dict[str, str]] = None
+    ) -> SemanticsPreparationStatusResponse:
+        return SemanticsPreparationStatusResponse(
+            status="indexing",
+            progress=progress or {name: "pending" for name in self._INDEXING_PIPELINES},
+        )
+
+    def _failed_status(self, message: str) -> SemanticsPreparationStatusResponse:
+        return SemanticsPreparationStatusResponse(
+            status="failed",
+            error=SemanticsPreparationStatusResponse.SemanticsPreparationError(
+                code="OTHERS",
+                message=message,
+            ),
+        )
+
+    def _deploy(self, prepare_semantics_request: SemanticsPreparationRequest) -> None:
+        """
+        Switch the project to a newly queued MDL. It must not run again for an MDL
+        whose job is already running, as the job has set the SQL validator up already.
+        """
+        # the cached query results of the project belong to the previous MDL
+        if self._result_cache is not None:
+            self._result_cache.set_mdl_hash(
+                prepare_semantics_request.project_id,
+                prepare_semantics_request.mdl_hash,
+            )
+        # the generated SQLs of the project aren't checked until the indexing job has
+        # parsed the new MDL, see `prepare_semantics`
+        if self._sql_validator is not None:
+            self._sql_validator.set_mdl(prepare_semantics_request.project_id, None)
+
+    async def enqueue(
+        self,
+        prepare_semantics_request: SemanticsPreparationRequest,
+        service_metadata: Optional[dict] = None,
+    ) -> None:
+        """
+        Queue the request in the indexing job queue instead of running it right away.
+        Jobs of the same project are serialized and only the latest pending MDL of a
+        project is indexed, see `IndexingJobQueue`.
+        """
+        # the MDL is already being indexed, its job keeps reporting its progress
+        if self._job_queue.queued(
+            prepare_semantics_request.project_id, prepare_semantics_request.mdl_hash
+        ):
+            return
+
+        self._deploy(prepare_semantics_request)
+        self._prepare_semantics_statuses[
+            prepare_semantics_request.mdl_hash
+        ] = self._indexing_status()
+
+        await self._job_queue.submit(
+            IndexingJob(
+                mdl_hash=prepare_semantics_request.mdl_hash,
+                project_id=prepare_semantics_request.project_id,
+                mdl=prepare_semantics_request.mdl,
+                request_from=prepare_semantics_request.request_from,
+                service_metadata=service_metadata or {},
+            )
+        )
+        await self._job_queue.prune(ttl=self._ttl)
+
+    async def resume_jobs(self) -> None:
+        """
+        Re-schedule the indexing jobs which were pending or running when the service
+        stopped. It should be called once the event loop is running.
+
+        The active generation of each project is restored as well, and the documents
+        of the generations which were not written completely are hidden again.
+        """
+        for job in self._job_queue.store.active():
+            self._generations.activate(job.project_id, job.generation)
+            self._in_background(
+                self._collect_generations(job.project_id, job.generation)
+            )
+
+        for job in await self._job_queue.resume():
+            self._prepare_semantics_statuses[job.mdl_hash] = self._indexing_status()
+            if job.generation:
+                self._generations.stage(job.generation)
+
+    def _in_background(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _collect_generations(
+        self, project_id: Optional[str], generation: str
+    ) -> None:
+        """
+        Delete the documents of the project from the generations before `generation`.
+        """
+        try:
+            await asyncio.gather(
+                *[
+                    self._pipelines[name].clean(
+                        project_id=project_id, retain=generation
+                    )
+                    for name in self._GENERATION_PIPELINES
+                ]
+            )
+            self._generations.release(project_id, generation)
+        except Exception as e:
+            logger.exception(
+                f"Project ID: {project_id}, Failed to collect old index generations: {e}"
+            )
+
+    async def _discard_generation(
+        self, project_id: Optional[str], generation: str
+    ) -> None:
+        """
+        Delete the documents of a generation which failed to be written completely.
+        """
+        try:
+            await asyncio.gather(
+                *[
+                    self._pipelines[name].clean(
+                        project_id=project_id, generation=generation
+                    )
+                    for name in self._GENERATION_PIPELINES
+                ]
+            )
+            self._generations.discard(generation)
+        except Exception as e:
+            logger.exception(
+                f"Project ID: {project_id}, Failed to discard index generation {generation}: {e}"
+            )
+
+    def _on_superseded(self, job: IndexingJob, _: IndexingJob) -> None:
+        self._prepare_semantics_statuses[job.mdl_hash] = self._failed_status(job.error)
+
+    async def _run_job(self, job: IndexingJob) -> None:
+        kwargs = {"job": job}
+        if job.service_metadata:
+            kwargs["service_metadata"] = job.service_metadata
+
+        await self.prepare_semantics(
+            SemanticsPreparationRequest(
+                mdl=job.mdl,
+                mdl_hash=job.mdl_hash,
+                project_id=job.project_id,
+                request_from=job.request_from,
+            ),
+            **kwargs,
+        )
 
     @observe(name="Prepare Semantics")
     @trace_metadata
@@ -70,44 +266,74 @@ class SemanticsPreparationService:
             },
         }
 
-        try:
-            logger.info(f"MDL: {prepare_semantics_request.mdl}")
+        job: Optional[IndexingJob] = kwargs.get("job")
+        self._deploy(prepare_semantics_request)
+        status = self._indexing_status()
+        self._prepare_semantics_statuses[prepare_semantics_request.mdl_hash] = status
+
+        # the documents are written to a new generation which stays hidden until all
+        # the pipelines succeed, so the active one keeps serving in the meantime;
+        # a resumed job writes to the same generation as before the restart
+        project_id = prepare_semantics_request.project_id
+        generation = (job.generation if job else None) or uuid.uuid4().hex
+        self._generations.stage(generation)
+        if job is not None:
+            job.generation = generation
+            await self._job_queue.update(job)
+
+        def _report_progress(name: str, pipeline_status: str):
+            status.progress[name] = pipeline_status
+            # the progress is persisted with the next status of the job
+            if job is not None:
+                job.progress = dict(status.progress)
 
-            input = {
-                "mdl_str": prepare_semantics_request.mdl,
-                "project_id": prepare_semantics_request.project_id,
-            }
+        async def _run_pipeline(name: str, **input):
+            _report_progress(name, "indexing")
+            try:
+                await self._pipelines[name].run(**input)
+                _report_progress(name, "finished")
+            except Exception:
+                _report_progress(name, "failed")
+                raise
+
+        try:
+            # parse the MDL once and share it with the SQL validator and all the
+            # indexing pipelines
+            mdl = ParsedMDL.parse(prepare_semantics_request.mdl)
+            if self._sql_validator is not None:
+                self._sql_validator.set_mdl(project_id, mdl)
+            input = {"mdl": mdl, "project_id": project_id}
 
             tasks = [
-                self._pipelines[name].run(**input)
-                for name in [
-                    "db_schema",
-                    "historical_question",
-                    "table_description",
-                    "sql_pairs",
-                    "project_meta",
-                ]
+                _run_pipeline(name, **input, generation=generation)
+                if name in self._GENERATION_PIPELINES
+                else _run_pipeline(name, **input)
+                for name in self._INDEXING_PIPELINES
             ]
 
             await asyncio.gather(*tasks)
 
+            self._generations.activate(project_id, generation)
+            self._in_background(self._collect_generations(project_id, generation))
+
             self._prepare_semantics_statuses[
                 prepare_semantics_request.mdl_hash
             ] = SemanticsPreparationStatusResponse(
                 status="finished",
+                progress=status.progress,
             )
+            if job is not None:
+                job.status = "finished"
         except Exception as e:
             logger.exception(f"Failed to prepare semantics: {e}")
+            self._in_background(self._discard_generation(project_id, generation))
 
             self._prepare_semantics_statuses[
                 prepare_semantics_request.mdl_hash
-            ] = SemanticsPreparationStatusResponse(
-                status="failed",
-                error=SemanticsPreparationStatusResponse.SemanticsPreparationError(
-                    code="OTHERS",
-                    message=f"Failed to prepare semantics: {e}",
-                ),
-            )
+            ] = self._failed_status(f"Failed to prepare semantics: {e}")
+            if job is not None:
+                job.status = "failed"
+                job.error = f"Failed to prepare semantics: {e}"
 
             results["metadata"]["error_type"] = "INDEXING_FAILED"
             results["metadata"]["error_message"] = str(e)
@@ -121,7 +347,19 @@ class SemanticsPreparationService:
             result := self._prepare_semantics_statuses.get(
                 prepare_semantics_status_request.mdl_hash
             )
-        ) is None:
+        ) is None and (
+            job := self._job_queue.store.get(prepare_semantics_status_request.mdl_hash)
+        ) is not None:
+            # the status is not in memory anymore, e.g. after a restart
+            if job.status in ("pending", "indexing"):
+                return self._indexing_status(job.progress)
+            if job.status == "finished":
+                return SemanticsPreparationStatusResponse(
+                    status="finished", progress=job.progress
+                )
+            return self._failed_status(job.error or "")
+
+        if result is None:
             logger.exception(
                 f"id is not found for SemanticsPreparation: {prepare_semantics_status_request.mdl_hash}"
             )
@@ -142,12 +380,7 @@ class SemanticsPreparationService:
 
         tasks = [
             self._pipelines[name].clean(project_id=project_id)
-            for name in [
-                "db_schema",
-                "historical_question",
-                "table_description",
-                "project_meta",
-            ]
+            for name in self._GENERATION_PIPELINES
         ] + [
             self._pipelines[name].clean(
                 project_id=project_id,
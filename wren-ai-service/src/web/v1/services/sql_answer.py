@@ -1,14 +1,12 @@
-import asyncio
 import logging
 from typing import Dict, Literal, Optional
 
 from cachetools import TTLCache
-from langfuse.decorators import observe
 from pydantic import BaseModel
 
 from src.core.pipeline import BasicPipeline
-from src.utils import trace_metadata
-from src.web.v1.services import BaseRequest, SSEEvent
+from src.utils import observe, trace_metadata
+from src.web.v1.services import BaseRequest, QueryTasks, SSEEvent, stoppable
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -17,7 +15,8 @@ logger = logging.getLogger("wren-ai-service")
 class SqlAnswerRequest(BaseRequest):
     query: str
     sql: str
-    sql_data: Dict
+    # fetched by executing the sql if not given
+    sql_data: Optional[Dict] = None
     custom_instruction: Optional[str] = None
 
 
@@ -25,6 +24,15 @@ class SqlAnswerResponse(BaseModel):
     query_id: str
 
 
+# PATCH /v1/sql-answers/{query_id}
+class StopSqlAnswerRequest(BaseRequest):
+    status: Literal["stopped"]
+
+
+class StopSqlAnswerResponse(BaseModel):
+    query_id: str
+
+
 # GET /v1/sql-answers/{query_id}
 class SqlAnswerResultRequest(BaseModel):
     query_id: str
@@ -35,7 +43,7 @@ class SqlAnswerResultResponse(BaseModel):
         code: Literal["OTHERS"]
         message: str
 
-    status: Literal["preprocessing", "succeeded", "failed"]
+    status: Literal["preprocessing", "succeeded", "failed", "stopped"]
     num_rows_used_in_llm: Optional[int] = None
     error: Optional[SqlAnswerError] = None
     trace_id: Optional[str] = None
@@ -52,7 +60,9 @@ class SqlAnswerService:
         self._sql_answer_results: Dict[str, SqlAnswerResultResponse] = TTLCache(
             maxsize=maxsize, ttl=ttl
         )
+        self._tasks = QueryTasks()
 
+    @stoppable
     @observe(name="SQL Answer")
     @trace_metadata
     async def sql_answer(
@@ -79,8 +89,17 @@ class SqlAnswerService:
                 trace_id=trace_id,
             )
 
+            sql_data = sql_answer_request.sql_data
+            if sql_data is None:
+                sql_data = (
+                    await self._pipelines["sql_executor"].run(
+                        sql=sql_answer_request.sql,
+                        project_id=sql_answer_request.project_id,
+                    )
+                )["execute_sql"]["results"] or {}
+
             preprocessed_sql_data = self._pipelines["preprocess_sql_data"].run(
-                sql_data=sql_answer_request.sql_data,
+                sql_data=sql_data,
             )["preprocess"]
 
             if preprocessed_sql_data.get("num_rows_used_in_llm") == 0:
@@ -93,7 +112,8 @@ class SqlAnswerService:
                 trace_id=trace_id,
             )
 
-            asyncio.create_task(
+            self._tasks.spawn(
+                query_id,
                 self._pipelines["sql_answer"].run(
                     query=sql_answer_request.query,
                     sql=sql_answer_request.sql,
@@ -101,7 +121,7 @@ class SqlAnswerService:
                     language=sql_answer_request.configurations.language,
                     query_id=query_id,
                     custom_instruction=sql_answer_request.custom_instruction,
-                )
+                ),
             )
 
             return results
@@ -123,6 +143,20 @@ class SqlAnswerService:
             results["metadata"]["error_message"] = str(e)
             return results
 
+    def stop_sql_answer(
+        self,
+        stop_sql_answer_request: StopSqlAnswerRequest,
+    ):
+        self._sql_answer_results[
+            stop_sql_answer_request.query_id
+        ] = SqlAnswerResultResponse(
+            status="stopped",
+        )
+        self._tasks.cancel(stop_sql_answer_request.query_id)
+        self._pipelines["sql_answer"].stop_streaming_results(
+            stop_sql_answer_request.query_id
+        )
+
     def get_sql_answer_result(
         self,
         sql_answer_result_request: SqlAnswerResultRequest,
@@ -0,0 +1,44 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("deepeval")
+
+from eval.metrics.spider.parallel import ExecMatchPool, GoldResultCache  # noqa: E402
+
+ENDLESS = "WITH RECURSIVE r(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM r) SELECT COUNT(*) FROM r"
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "db.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE people (id INT, name TEXT)")
+    conn.executemany("INSERT INTO people VALUES (?, ?)", [(1, "a"), (2, "b")])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_exec_match_pool(db, tmp_path):
+    cache_path = str(tmp_path / "cache" / "gold.db")
+    pool = ExecMatchPool(workers=2, timeout=2, cache_path=cache_path)
+
+    scores = pool.run(
+        [
+            (db, "SELECT name FROM people", "SELECT name FROM people"),
+            (db, "SELECT id FROM people", "SELECT name FROM people"),
+            (db, ENDLESS, "SELECT COUNT(*) FROM people"),
+            (db, "SELECT COUNT(*) FROM people", "SELECT COUNT(*) FROM people"),
+        ],
+        progress_bar=False,
+    )
+
+    assert scores == [1, 0, 0, 1]
+    assert list(pool.errors) == [2]
+
+    cache = GoldResultCache(cache_path)
+    assert cache.get(GoldResultCache.key(db, "SELECT name FROM people")) == [
+        ("a",),
+        ("b",),
+    ]
@@ -0,0 +1,72 @@
+import itertools
+import random
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("deepeval")
+
+from eval.metrics.spider import result_eq  # noqa: E402
+
+
+def brute_force_result_eq(result1, result2, order_matters):
+    if len(result1) != len(result2):
+        return False
+    if not result1:
+        return True
+    if len(result1[0]) != len(result2[0]):
+        return False
+    for perm in itertools.permutations(range(len(result1[0]))):
+        result2_perm = [tuple(row[i] for i in perm) for row in result2]
+        if order_matters and result1 == result2_perm:
+            return True
+        if not order_matters and Counter(result1) == Counter(result2_perm):
+            return True
+    return False
+
+
+@pytest.mark.parametrize(
+    "result1,result2,order_matters,expected",
+    [
+        ([], [], False, True),
+        ([(1, "a")], [("a", 1)], False, True),
+        ([(1, "a"), (2, "b")], [("b", 2), ("a", 1)], False, True),
+        ([(1, "a"), (2, "b")], [("b", 2), ("a", 1)], True, False),
+        ([(1, 2), (2, 1)], [(2, 1), (1, 2)], False, True),
+        # the same column multisets, but paired up differently
+        ([(1, 1, "x"), (2, 2, "y")], [(1, 2, "x"), (2, 1, "y")], False, False),
+        ([(1, 1, "x"), (2, 2, "y")], [("x", 1, 1), ("y", 2, 2)], False, True),
+        ([(1, "a"), (1, "a")], [(1, "a"), (2, "a")], False, False),
+        ([(1,)], [(1.0,)], False, True),
+        ([(None, 1)], [(1, None)], True, True),
+    ],
+)
+def test_result_eq(result1, result2, order_matters, expected):
+    assert result_eq(result1, result2, order_matters) is expected
+    assert brute_force_result_eq(result1, result2, order_matters) is expected
+
+
+def test_result_eq_matches_brute_force():
+    rng = random.Random(0)
+    for _ in range(2000):
+        num_cols = rng.randint(1, 5)
+        values = [rng.randint(0, 2) for _ in range(rng.randint(1, 3))]
+        result1 = [
+            tuple(rng.choice(values) for _ in range(num_cols))
+            for _ in range(rng.randint(1, 5))
+        ]
+        perm = rng.sample(range(num_cols), num_cols)
+        result2 = [tuple(row[i] for i in perm) for row in result1]
+        if rng.random() < 0.5:
+            result2 = rng.sample(result2, len(result2))
+        if rng.random() < 0.5:
+            row = rng.randrange(len(result2))
+            col = rng.randrange(num_cols)
+            result2[row] = (
+                result2[row][:col] + (rng.choice(values),) + result2[row][col + 1 :]
+            )
+
+        for order_matters in [False, True]:
+            assert result_eq(result1, result2, order_matters) == brute_force_result_eq(
+                result1, result2, order_matters
+            ), (result1, result2, order_matters)
@@ -0,0 +1,201 @@
+import numpy as np
+import orjson
+
+from src.pipelines.generation.utils.chart import (
+    ChartDataPreprocessor,
+    ChartDataReducer,
+    ChartGenerationPostProcessor,
+    lttb,
+    sample_seed,
+)
+
+
+def sql_data(columns, rows):
+    return {"columns": [{"name": column} for column in columns], "data": rows}
+
+
+def test_lttb_keeps_the_ends_and_the_peaks():
+    x = np.arange(1000)
+    y = np.zeros(1000)
+    y[500] = 10
+
+    indices = lttb(x, y, 20)
+
+    assert len(indices) == 20
+    assert indices[0] == 0 and indices[-1] == 999
+    assert 500 in indices
+    assert np.all(np.diff(indices) > 0)
+    assert len(lttb(x, y, 2000)) == 1000
+
+
+def test_temporal_aggregation():
+    days = [f"2024-{month:02d}-{day:02d}" for month in (1, 2, 3) for day in (1, 15)]
+    data = sql_data(
+        ["day", "region", "sales", "unused"],
+        [[day, region, 1.5, "x"] for day in days for region in ("a", "b")],
+    )
+    chart_schema = {
+        "mark": {"type": "line"},
+        "encoding": {
+            "x": {"field": "day", "type": "temporal", "timeUnit": "yearmonth"},
+            "y": {"field": "sales", "type": "quantitative", "aggregate": "sum"},
+            "color": {"field": "region", "type": "nominal"},
+        },
+    }
+
+    values = ChartDataReducer().run(chart_schema, data)["values"]
+
+    assert len(values) == 6
+    assert {"day": "2024-01-01", "region": "a", "sales": 3.0} in values
+    assert sum(value["sales"] for value in values) == 1.5 * 12
+
+
+def test_count_isnt_aggregated_again():
+    data = sql_data(["day", "id"], [["2024-01-01", 1], ["2024-01-02", 2]])
+    chart_schema = {
+        "mark": "bar",
+        "encoding": {
+            "x": {"field": "day", "type": "temporal", "timeUnit": "yearmonth"},
+            "y": {"field": "id", "type": "quantitative", "aggregate": "count"},
+        },
+    }
+
+    values = ChartDataReducer().run(chart_schema, data)["values"]
+
+    assert values == [{"day": "2024-01-01", "id": 1}, {"day": "2024-01-02", "id": 2}]
+
+
+def test_lines_are_downsampled_per_series():
+    data = sql_data(
+        ["t", "series", "value"],
+        [[t, series, float(np.sin(t / 50))] for t in range(5000) for series in "ab"],
+    )
+    chart_schema = {
+        "mark": "line",
+        "encoding": {
+            "x": {"field": "t", "type": "quantitative"},
+            "y": {"field": "value", "type": "quantitative"},
+            "color": {"field": "series", "type": "nominal"},
+        },
+    }
+
+    values = ChartDataReducer(max_points=200).run(chart_schema, data)["values"]
+
+    assert len(values) == 200
+    for series in "ab":
+        points = [value["t"] for value in values if value["series"] == series]
+        assert len(points) == 100
+        assert points[0] == 0 and points[-1] == 4999
+
+
+def test_small_categories_are_merged():
+    data = sql_data(["category", "amount"], [[f"c{i}", i] for i in range(20)])
+    chart_schema = {
+        "mark": {"type": "arc"},
+        "encoding": {
+            "theta": {"field": "amount", "type": "quantitative"},
+            "color": {"field": "category", "type": "nominal"},
+        },
+    }
+
+    values = ChartDataReducer(max_categories=5).run(chart_schema, data)["values"]
+
+    assert [value["category"] for value in values] == [
+        "c16",
+        "c17",
+        "c18",
+        "c19",
+        "Other",
+    ]
+    assert values[-1]["amount"] == sum(range(16))
+
+
+def test_mean_categories_arent_merged():
+    data = sql_data(["category", "amount"], [[f"c{i}", i] for i in range(20)])
+    chart_schema = {
+        "mark": "bar",
+        "encoding": {
+            "x": {"field": "category", "type": "nominal"},
+            "y": {"field": "amount", "type": "quantitative", "aggregate": "mean"},
+        },
+    }
+
+    values = ChartDataReducer(max_categories=5).run(chart_schema, data)["values"]
+
+    assert len(values) == 20
+
+
+def test_other_charts_are_sampled():
+    data = sql_data(["x", "y"], [[i, i] for i in range(5000)])
+    chart_schema = {
+        "mark": "point",
+        "encoding": {
+            "x": {"field": "x", "type": "quantitative"},
+            "y": {"field": "y", "type": "quantitative"},
+        },
+    }
+
+    values = ChartDataReducer(max_points=100).run(chart_schema, data)["values"]
+
+    assert len(values) == 100
+    assert values[0] == {"x": 0, "y": 0} and values[-1] == {"x": 4999, "y": 4999}
+
+
+def test_post_processor_embeds_the_reduced_data():
+    data = sql_data(["category", "amount"], [[f"c{i}", i] for i in range(20)])
+    chart_schema = {
+        "mark": {"type": "bar"},
+        "encoding": {
+            "x": {"field": "category", "type": "nominal"},
+            "y": {"field": "amount", "type": "quantitative"},
+        },
+    }
+    replies = [
+        orjson.dumps(
+            {"reasoning": "", "chart_type": "bar", "chart_schema": chart_schema}
+        ).decode()
+    ]
+    post_processor = ChartGenerationPostProcessor(ChartDataReducer(max_categories=5))
+
+    results = post_processor.run(replies, [], False, data)["results"]
+    assert len(results["chart_schema"]["data"]["values"]) == 5
+
+    results = post_processor.run(replies, [], True, data)["results"]
+    assert results["chart_schema"]["data"]["values"] == []
+
+
+def test_samples_are_deterministic_and_cover_the_data():
+    rows = [
+        [f"2024-01-{day:02d}", region, day * 10]
+        for day in range(1, 29)
+        for region in ("north", "south", "east")
+    ] + [["2023-12-31", "west", 0]]
+    data = sql_data(["day", "region", "sales"], rows)
+    seed = sample_seed("SELECT *  FROM sales;")
+
+    result = ChartDataPreprocessor().run(data, sample_data_count=6, seed=seed)
+
+    assert result == ChartDataPreprocessor().run(
+        data, sample_data_count=6, seed=sample_seed("SELECT * FROM sales")
+    )
+    days = [row["day"] for row in result["sample_data"]]
+    regions = {row["region"] for row in result["sample_data"]}
+    assert len(days) == 6
+    assert {"2023-12-31", "2024-01-28"} <= set(days)
+    assert regions == {"north", "south", "east", "west"}
+    assert result["sample_column_values"]["region"] == [
+        "north",
+        "south",
+        "east",
+        "west",
+    ]
+    assert result["sample_column_values"]["sales"] == [10, 20, 30, 40, 50]
+
+
+def test_small_results_are_kept_whole():
+    data = sql_data(["a", "b"], [[1, None], [2, "x"]])
+
+    result = ChartDataPreprocessor().run(data)
+
+    assert result["sample_data"] == [{"a": 1, "b": None}, {"a": 2, "b": "x"}]
+    assert result["sample_column_values"] == {"a": [1, 2], "b": [None, "x"]}
@@ -0,0 +1,59 @@
+import copy
+
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from src.pipelines.generation.utils.chart import vega_lite_validator
+
+LINE_CHART = {
+    "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+    "title": "Sales",
+    "mark": {"type": "line"},
+    "encoding": {
+        "x": {
+            "field": "month",
+            "type": "temporal",
+            "timeUnit": "yearmonth",
+            "title": "Month",
+        },
+        "y": {"field": "sales", "type": "quantitative", "title": "Sales"},
+        "color": {"field": "region", "type": "nominal", "title": "Region"},
+    },
+    "data": {"values": [{"month": "2024-01-01", "sales": 1, "region": "a"}]},
+}
+
+
+def test_the_validator_is_compiled_once():
+    assert vega_lite_validator() is vega_lite_validator()
+
+
+@pytest.mark.parametrize("chart_type", ["line", "bar", ""])
+def test_valid_chart(chart_type):
+    vega_lite_validator().validate(copy.deepcopy(LINE_CHART), chart_type)
+
+
+def test_valid_chart_outside_of_the_chart_models():
+    chart = copy.deepcopy(LINE_CHART)
+    chart["mark"] = "line"
+    chart["width"] = 400
+
+    vega_lite_validator().validate(chart, "line")
+
+
+@pytest.mark.parametrize(
+    "path, value",
+    [
+        (("mark", "type"), "lines"),
+        (("encoding", "x", "timeUnit"), "yearmonthly"),
+        (("encoding", "y", "type"), "numeric"),
+    ],
+)
+def test_invalid_chart(path, value):
+    chart = copy.deepcopy(LINE_CHART)
+    parent = chart
+    for key in path[:-1]:
+        parent = parent[key]
+    parent[path[-1]] = value
+
+    with pytest.raises(ValidationError):
+        vega_lite_validator().validate(chart, "line")
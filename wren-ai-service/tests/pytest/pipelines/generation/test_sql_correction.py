@@ -0,0 +1,143 @@
+import asyncio
+
+import orjson
+import pytest
+
+from src.pipelines.generation.sql_correction import SQLCorrection, _candidates
+
+
+class LLMProvider:
+    """
+    Replies with the SQL and after the delay of the temperature of the generation.
+    """
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.cancelled = []
+
+    def get_generator(self, **kwargs):
+        async def generator(prompt, generation_kwargs=None, **kwargs):
+            temperature = (generation_kwargs or {}).get("temperature")
+            sql, delay = self.replies[temperature]
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.cancelled.append(temperature)
+                raise
+            return {"replies": [orjson.dumps({"sql": sql}).decode()], "meta": []}
+
+        return generator
+
+    def get_model(self):
+        return "test"
+
+
+class Engine:
+    def __init__(self):
+        self.sessions = set()
+
+    async def execute_sql(self, sql, session, **kwargs):
+        self.sessions.add(id(session))
+        if "valid" in sql:
+            return True, None, {"correlation_id": sql}
+        return False, None, {"error_message": f"invalid {sql}"}
+
+
+def test_candidates():
+    assert _candidates(1) == [None]
+    assert _candidates(3) == [None, {"temperature": 0.5}, {"temperature": 1.0}]
+
+
+@pytest.mark.asyncio
+async def test_first_valid_candidate_wins():
+    llm_provider = LLMProvider(
+        {
+            None: ("SELECT wrong", 0.01),
+            0.5: ("SELECT valid", 0.05),
+            1.0: ("SELECT slow_valid", 5),
+        }
+    )
+    engine = Engine()
+    pipeline = SQLCorrection(llm_provider=llm_provider, engine=engine, candidates=3)
+
+    result = await pipeline.run(
+        contexts=[],
+        invalid_generation_result={"sql": "SELECT x", "error": "error"},
+    )
+
+    assert result["post_process"]["valid_generation_result"]["sql"] == (
+        'SELECT "valid"'
+    )
+    assert llm_provider.cancelled == [1.0]
+    assert len(engine.sessions) == 1
+
+
+@pytest.mark.asyncio
+async def test_invalid_result_of_the_first_candidate():
+    llm_provider = LLMProvider({None: ("SELECT a", 0.02), 0.5: ("SELECT b", 0.01)})
+    pipeline = SQLCorrection(llm_provider=llm_provider, engine=Engine(), candidates=2)
+
+    result = await pipeline.run(
+        contexts=[],
+        invalid_generation_result={"sql": "SELECT x", "error": "error"},
+    )
+
+    assert result["post_process"]["valid_generation_result"] == {}
+    assert result["post_process"]["invalid_generation_result"]["sql"] == 'SELECT "a"'
+
+
+class FailingLLMProvider(LLMProvider):
+    def get_generator(self, **kwargs):
+        generator = super().get_generator(**kwargs)
+
+        async def failing_generator(prompt, generation_kwargs=None, **kwargs):
+            temperature = (generation_kwargs or {}).get("temperature")
+            if self.replies[temperature] is None:
+                raise RuntimeError(f"rate limited {temperature}")
+            return await generator(prompt, generation_kwargs, **kwargs)
+
+        return failing_generator
+
+
+@pytest.mark.asyncio
+async def test_error_of_a_single_candidate_is_raised():
+    pipeline = SQLCorrection(
+        llm_provider=FailingLLMProvider({None: None}), engine=Engine()
+    )
+
+    with pytest.raises(RuntimeError, match="rate limited None"):
+        await pipeline.run(
+            contexts=[],
+            invalid_generation_result={"sql": "SELECT x", "error": "error"},
+        )
+
+
+@pytest.mark.asyncio
+async def test_error_is_raised_when_every_candidate_fails():
+    pipeline = SQLCorrection(
+        llm_provider=FailingLLMProvider({None: None, 0.5: None}),
+        engine=Engine(),
+        candidates=2,
+    )
+
+    with pytest.raises(RuntimeError, match="rate limited None"):
+        await pipeline.run(
+            contexts=[],
+            invalid_generation_result={"sql": "SELECT x", "error": "error"},
+        )
+
+
+@pytest.mark.asyncio
+async def test_errors_of_some_candidates_are_skipped():
+    pipeline = SQLCorrection(
+        llm_provider=FailingLLMProvider({None: None, 0.5: ("SELECT b", 0.01)}),
+        engine=Engine(),
+        candidates=2,
+    )
+
+    result = await pipeline.run(
+        contexts=[],
+        invalid_generation_result={"sql": "SELECT x", "error": "error"},
+    )
+
+    assert result["post_process"]["invalid_generation_result"]["sql"] == 'SELECT "b"'
@@ -0,0 +1,127 @@
+import pytest
+
+from src.core.engine import add_quotes
+from src.pipelines.generation.utils.sql import SQLGenPostProcessor, SQLValidator
+
+MDL = {
+    "models": [
+        {
+            "name": "Orders",
+            "columns": [
+                {"name": "OrderId", "type": "INT"},
+                {"name": "CustomerId", "type": "INT"},
+                {"name": "Amount", "type": "DOUBLE"},
+                {"name": "customer", "type": "Customers", "relationship": "r"},
+            ],
+        },
+        {
+            "name": "Customers",
+            "columns": [
+                {"name": "CustomerId", "type": "INT"},
+                {"name": "Name", "type": "VARCHAR"},
+            ],
+        },
+    ],
+    "views": [{"name": "big_orders", "statement": "SELECT * FROM Orders"}],
+    "metrics": [
+        {
+            "name": "Revenue",
+            "dimension": [{"name": "Month", "type": "DATE"}],
+            "measure": [{"name": "Total", "type": "DOUBLE"}],
+        }
+    ],
+}
+
+
+@pytest.fixture
+def validator():
+    validator = SQLValidator()
+    validator.set_mdl("project", MDL)
+    return validator
+
+
+def validate(validator: SQLValidator, sql: str):
+    quoted_sql, error = add_quotes(sql)
+    assert not error
+    return validator.validate(quoted_sql, "project")
+
+
+@pytest.mark.parametrize(
+    "sql, error",
+    [
+        ("SELECT o.Amont FROM Orders o", "Column 'Amont' cannot be resolved"),
+        ("SELECT Name FROM Customer", "Table 'Customer' does not exist"),
+        (
+            "SELECT CustomerId FROM Orders o "
+            "JOIN Customers c ON o.CustomerId = c.CustomerId",
+            "Column 'CustomerId' is ambiguous",
+        ),
+        (
+            "WITH a AS (SELECT OrderId FROM Orders) SELECT a.OrderId, Amount FROM a",
+            "Column 'Amount' cannot be resolved",
+        ),
+    ],
+)
+def test_invalid_sqls_are_rejected(validator, sql, error):
+    assert validate(validator, sql) == error
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT o.Amount, c.Name FROM Orders o "
+        "JOIN Customers c ON o.CustomerId = c.CustomerId",
+        "SELECT CustomerId, Name FROM Orders JOIN Customers USING (CustomerId)",
+        "SELECT amount FROM orders",
+        "SELECT Amount AS a FROM Orders ORDER BY a",
+        "SELECT o.customer FROM Orders o",
+        "SELECT Month, Total FROM Revenue",
+        "SELECT o.OrderId, u.item FROM Orders o CROSS JOIN UNNEST(ARRAY[1, 2]) AS u(item)",
+        "SELECT o.OrderId FROM Orders o WHERE EXISTS "
+        "(SELECT 1 FROM Customers c WHERE c.CustomerId = o.CustomerId)",
+        # the columns of the views are unknown
+        "SELECT * FROM big_orders WHERE nope = 1",
+    ],
+)
+def test_valid_sqls_are_passed(validator, sql):
+    assert validate(validator, sql) is None
+
+
+def test_projects_without_mdl_are_passed(validator):
+    quoted_sql, _ = add_quotes("SELECT nope FROM Nowhere")
+
+    assert validator.validate(quoted_sql, "other") is None
+
+    validator.set_mdl("project", None)
+    assert validator.validate(quoted_sql, "project") is None
+
+
+class Engine:
+    def __init__(self):
+        self.calls = 0
+
+    async def execute_sql(self, sql, session, **kwargs):
+        self.calls += 1
+        return True, None, {"correlation_id": "id"}
+
+
+@pytest.mark.asyncio
+async def test_post_processor_skips_the_dry_run_of_rejected_sqls(validator):
+    engine = Engine()
+    post_processor = SQLGenPostProcessor(engine=engine, sql_validator=validator)
+
+    result = await post_processor.run(
+        ['{"sql": "SELECT Amont FROM Orders"}'], project_id="project"
+    )
+    assert result["valid_generation_result"] == {}
+    assert result["invalid_generation_result"]["type"] == "DRY_RUN"
+    assert result["invalid_generation_result"]["error"] == (
+        "Column 'Amont' cannot be resolved"
+    )
+    assert engine.calls == 0
+
+    result = await post_processor.run(
+        ['{"sql": "SELECT Amount FROM Orders"}'], project_id="project"
+    )
+    assert result["valid_generation_result"]["correlation_id"] == "id"
+    assert engine.calls == 1
@@ -619,3 +619,31 @@ async def test_pipeline_run(mocker: MockFixture):
     result = await pipe.run(orjson.dumps(test_mdl), project_id="test-project")
     assert result is not None
     assert result == {"write": {"documents_written": 6}}
+
+
+@pytest.mark.asyncio
+async def test_document_ids_are_deterministic():
+    chunker = DDLChunker()
+    mdl = {
+        "models": [
+            {
+                "name": "user",
+                "columns": [
+                    {"name": "id", "type": "INTEGER"},
+                    {"name": "name", "type": "VARCHAR"},
+                ],
+            }
+        ],
+        "views": [],
+        "relationships": [],
+        "metrics": [],
+    }
+
+    first = await chunker.run(mdl, column_batch_size=1, project_id="p")
+    second = await chunker.run(mdl, column_batch_size=1, project_id="p")
+    other = await chunker.run(mdl, column_batch_size=1, project_id="q")
+
+    ids = [document.id for document in first["documents"]]
+    assert len(set(ids)) == 3
+    assert ids == [document.id for document in second["documents"]]
+    assert not set(ids) & {document.id for document in other["documents"]}
@@ -2,7 +2,13 @@ import pytest
 from haystack import Document
 from haystack.document_stores.types import DocumentStore
 
-from src.pipelines.indexing import AsyncDocumentWriter, DocumentCleaner, MDLValidator
+from src.pipelines.indexing import (
+    AsyncDocumentWriter,
+    DocumentCleaner,
+    MDLValidator,
+    ParsedMDL,
+    document_id,
+)
 
 
 class MockDocumentStore(DocumentStore):
@@ -72,6 +78,32 @@ def test_mdl_validator():
         validator.run("invalid json")
 
 
+def test_parsed_mdl_indexes():
+    mdl = ParsedMDL.parse(
+        """
+        {
+            "models": [{"name": "user"}, {"name": "order"}, {"name": "item"}],
+            "relationships": [
+                {"name": "user_order", "models": ["user", "order"]},
+                {"name": "order_item", "models": ["order", "item"]},
+                {"name": "self", "models": ["user", "user"]}
+            ]
+        }
+        """
+    )
+
+    assert mdl["views"] == [] and mdl["metrics"] == []
+    assert [r["name"] for r in mdl.relationships_by_model["user"]] == [
+        "user_order",
+        "self",
+    ]
+    assert [r["name"] for r in mdl.relationships_by_model["order"]] == [
+        "user_order",
+        "order_item",
+    ]
+    assert ParsedMDL.parse(mdl) is mdl
+
+
 @pytest.mark.asyncio
 async def test_async_document_writer():
     store = MockDocumentStore()
@@ -82,3 +114,22 @@ async def test_async_document_writer():
     result = await writer.run(documents=docs)
     assert result["documents_written"] == 2
     assert len(store.documents) == 2
+
+
+@pytest.mark.asyncio
+async def test_document_ids_are_deterministic():
+    assert document_id("p", "TABLE_SCHEMA", "user", 1) == document_id(
+        "p", "TABLE_SCHEMA", "user", 1
+    )
+    assert document_id("p", "TABLE_SCHEMA", "user", 1) != document_id(
+        "q", "TABLE_SCHEMA", "user", 1
+    )
+
+    store = MockDocumentStore([])
+    writer = AsyncDocumentWriter(document_store=store)
+    documents = [Document(id=document_id("p", "VIEW", "v"), content="v")]
+
+    # the ids of a new generation don't collide with the active documents
+    await writer.run(documents=documents, generation="g1")
+    assert documents[0].meta["generation"] == "g1"
+    assert documents[0].id == document_id("g1", document_id("p", "VIEW", "v"))
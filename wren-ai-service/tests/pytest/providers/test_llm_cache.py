@@ -0,0 +1,110 @@
+import orjson
+import pytest
+
+from src.providers.llm.cache import LLMResponseCache
+from src.providers.llm.litellm import LitellmLLMProvider
+
+
+def _provider(**kwargs) -> LitellmLLMProvider:
+    provider = LitellmLLMProvider(
+        model="gpt-4o-mini",
+        fallback_model_list=[
+            {
+                "model_name": "gpt-4o-mini",
+                "litellm_params": {
+                    "model": "gpt-4o-mini",
+                    "api_key": "fake",
+                    "mock_response": "SELECT * FROM orders",
+                },
+            }
+        ],
+        **kwargs,
+    )
+    calls = []
+    acompletion = provider._router.acompletion
+
+    async def _acompletion(*args, **kwargs):
+        calls.append(kwargs)
+        return await acompletion(*args, **kwargs)
+
+    provider._router.acompletion = _acompletion
+    return provider, calls
+
+
+def test_cache_evicts_least_recently_used():
+    value = {"completions": [{"content": "x" * 30, "meta": {}}], "chunks": None}
+    # room for two entries
+    cache = LLMResponseCache(":memory:", max_size=2 * len(orjson.dumps(value)))
+
+    cache.set("a", value)
+    cache.set("b", value)
+    assert cache.get("a") == value
+    cache.set("c", value)
+
+    assert cache.get("a") == value
+    assert cache.get("b") is None
+    assert cache.get("c") == value
+
+
+def test_cache_only_evicts_beyond_max_size(tmp_path):
+    value = {"completions": [{"content": "x" * 30, "meta": {}}], "chunks": None}
+    path = str(tmp_path / "llm.db")
+    cache = LLMResponseCache(path, max_size=3 * len(orjson.dumps(value)))
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+
+    cache.set("a", value)
+    cache.set("b", value)
+    cache.set("a", value)
+    assert not [statement for statement in statements if "DELETE" in statement]
+
+    # the size of the stored completions is restored on startup
+    cache = LLMResponseCache(path, max_size=3 * len(orjson.dumps(value)))
+    cache.set("c", value)
+    cache.set("d", value)
+    assert cache.get("b") is None
+    assert cache.get("a") == cache.get("c") == cache.get("d") == value
+
+
+@pytest.mark.asyncio
+async def test_cached_completions_are_replayed(tmp_path):
+    provider, calls = _provider(response_cache_path=str(tmp_path / "llm.db"))
+    generator = provider.get_generator(generation_kwargs={"temperature": 0})
+
+    first = await generator(prompt="question")
+    second = await generator(prompt="question")
+
+    assert len(calls) == 1
+    assert second["replies"] == first["replies"] == ["SELECT * FROM orders"]
+    assert second["meta"][0]["cached"] is True
+    assert second["meta"][0]["usage"] == {}
+
+    # the streaming callbacks still receive the completion
+    chunks = []
+    streaming = provider.get_generator(
+        generation_kwargs={"temperature": 0},
+        streaming_callback=lambda chunk, query_id: chunks.append(chunk),
+    )
+    result = await streaming(prompt="question", query_id="1")
+    assert len(calls) == 1
+    assert "".join(chunk.content for chunk in chunks) == "SELECT * FROM orders"
+    assert chunks[-1].meta["finish_reason"] == "stop"
+    assert result["replies"] == ["SELECT * FROM orders"]
+
+    # other prompts and non deterministic calls are not cached
+    await generator(prompt="another question")
+    await provider.get_generator(generation_kwargs={"temperature": 1})(
+        prompt="question"
+    )
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_cache_is_opt_in():
+    provider, calls = _provider(response_cache_path=None)
+    generator = provider.get_generator(generation_kwargs={"temperature": 0})
+
+    await generator(prompt="question")
+    await generator(prompt="question")
+
+    assert len(calls) == 2
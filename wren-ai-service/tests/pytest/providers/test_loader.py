@@ -3,7 +3,7 @@ from src.providers import loader
 
 def test_import_mods():
     loader.import_mods("src.providers")
-    assert len(loader.PROVIDERS) == 6
+    assert len(loader.PROVIDERS) == 10
 
 
 def test_get_provider():
@@ -13,14 +13,26 @@ def test_get_provider():
     provider = loader.get_provider("litellm_llm")
     assert provider.__name__ == "LitellmLLMProvider"
 
+    provider = loader.get_provider("mock_llm")
+    assert provider.__name__ == "MockLLMProvider"
+
     # embedder provider
     provider = loader.get_provider("litellm_embedder")
     assert provider.__name__ == "LitellmEmbedderProvider"
 
+    provider = loader.get_provider("mock_embedder")
+    assert provider.__name__ == "MockEmbedderProvider"
+
+    provider = loader.get_provider("local_embedder")
+    assert provider.__name__ == "LocalEmbedderProvider"
+
     # document store provider
     provider = loader.get_provider("qdrant")
     assert provider.__name__ == "QdrantProvider"
 
+    provider = loader.get_provider("local_vector")
+    assert provider.__name__ == "LocalVectorProvider"
+
     # engine provider
     provider = loader.get_provider("wren_ui")
     assert provider.__name__ == "WrenUI"
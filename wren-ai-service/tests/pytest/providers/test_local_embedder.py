@@ -0,0 +1,91 @@
+import asyncio
+
+import numpy as np
+import pytest
+from haystack import Document
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+from onnx import TensorProto, helper  # noqa: E402
+from tokenizers import Tokenizer, models, pre_tokenizers  # noqa: E402
+
+from src.providers.embedder.local import LocalEmbedderProvider  # noqa: E402
+
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "orders": 2, "customers": 3, "total": 4}
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    """
+    A tiny model whose token embeddings are the rows of a fixed table.
+    """
+    table = np.random.default_rng(0).standard_normal((len(VOCAB), 4))
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["table", "input_ids"], ["last_hidden_state"])],
+        "embedding",
+        [
+            helper.make_tensor_value_info("input_ids", TensorProto.INT64, [None, None]),
+            helper.make_tensor_value_info(
+                "attention_mask", TensorProto.INT64, [None, None]
+            ),
+        ],
+        [
+            helper.make_tensor_value_info(
+                "last_hidden_state", TensorProto.FLOAT, [None, None, 4]
+            )
+        ],
+        [helper.make_tensor("table", TensorProto.FLOAT, table.shape, table.flatten())],
+    )
+    onnx.save(
+        helper.make_model(
+            graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8
+        ),
+        str(tmp_path / "model.onnx"),
+    )
+
+    tokenizer = Tokenizer(models.WordLevel(VOCAB, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.save(str(tmp_path / "tokenizer.json"))
+
+    return str(tmp_path), table
+
+
+@pytest.mark.asyncio
+async def test_text_embedder_mean_pools_and_normalizes(model_path):
+    path, table = model_path
+    embedder = LocalEmbedderProvider(model_path=path).get_text_embedder()
+
+    result = await embedder.run(text="orders\ntotal")
+
+    expected = (table[2] + table[4]) / 2
+    expected /= np.linalg.norm(expected)
+    assert result["embedding"] == pytest.approx(expected.tolist(), abs=1e-5)
+    assert result["meta"]["usage"]["total_tokens"] == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_batched(model_path):
+    path, table = model_path
+    provider = LocalEmbedderProvider(model_path=path, batch_size=8, max_wait_ms=20)
+    batches = []
+    encode = provider._batcher._encoder.encode
+    provider._batcher._encoder.encode = lambda texts: batches.append(texts) or encode(
+        texts
+    )
+
+    text_embedder = provider.get_text_embedder()
+    results = await asyncio.gather(
+        *[text_embedder.run(text=text) for text in ["orders", "customers", "total"]],
+        provider.get_document_embedder().run(
+            documents=[Document(content="customers total") for _ in range(10)]
+        ),
+    )
+
+    assert sorted(len(batch) for batch in batches) == [5, 8]
+    for word, result in zip(["orders", "customers", "total"], results):
+        expected = table[VOCAB[word]] / np.linalg.norm(table[VOCAB[word]])
+        assert result["embedding"] == pytest.approx(expected.tolist(), abs=1e-5)
+    documents = results[-1]["documents"]
+    assert all(document.embedding == documents[0].embedding for document in documents)
+    assert results[-1]["meta"]["usage"]["total_tokens"] == 20
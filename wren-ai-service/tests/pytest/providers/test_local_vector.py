@@ -0,0 +1,261 @@
+import asyncio
+import os
+import threading
+
+import orjson
+import pytest
+from haystack import Document
+from haystack.document_stores.errors import DuplicateDocumentError
+from haystack.document_stores.types import DuplicatePolicy
+
+from src.core.generations import IndexGenerations
+from src.pipelines.indexing import SqlPairs
+from src.providers.document_store.local_vector import (
+    LocalVectorDocumentStore,
+    LocalVectorProvider,
+)
+from src.providers.embedder.mock import MockEmbedderProvider
+
+
+def _documents():
+    return [
+        Document(
+            id="1",
+            content="orders",
+            embedding=[1.0, 0.0, 0.0],
+            meta={"project_id": "a", "type": "TABLE_SCHEMA", "name": "orders"},
+        ),
+        Document(
+            id="2",
+            content="customers",
+            embedding=[0.0, 1.0, 0.0],
+            meta={"project_id": "a", "type": "TABLE_SCHEMA", "name": "customers"},
+        ),
+        Document(
+            id="3",
+            content="payments",
+            embedding=[0.8, 0.6, 0.0],
+            meta={"project_id": "b", "type": "TABLE_SCHEMA", "name": "payments"},
+        ),
+        Document(
+            id="4",
+            content="description",
+            embedding=[0.9, 0.1, 0.0],
+            meta={"project_id": "a", "type": "TABLE_DESCRIPTION", "name": "orders"},
+        ),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_query_by_embedding_with_filters():
+    store = LocalVectorDocumentStore(index="test")
+    assert await store.write_documents(_documents()) == 4
+
+    documents = await store._query_by_embedding([2.0, 0.0, 0.0], top_k=2)
+    assert [document.id for document in documents] == ["1", "4"]
+    assert documents[0].score == pytest.approx(1.0)
+    assert documents[0].meta == {
+        "project_id": "a",
+        "type": "TABLE_SCHEMA",
+        "name": "orders",
+    }
+
+    filters = {
+        "operator": "AND",
+        "conditions": [
+            {"field": "project_id", "operator": "==", "value": "a"},
+            {"field": "type", "operator": "==", "value": "TABLE_SCHEMA"},
+        ],
+    }
+    documents = await store._query_by_embedding([0.8, 0.6, 0.0], filters=filters)
+    assert [document.id for document in documents] == ["1", "2"]
+
+    filters = {"field": "name", "operator": "in", "value": ["payments", "orders"]}
+    assert await store.count_documents(filters) == 3
+    filters = {
+        "operator": "NOT",
+        "conditions": [{"field": "meta.project_id", "operator": "==", "value": "a"}],
+    }
+    assert [document.id for document in store.filter_documents(filters)] == ["3"]
+    filters = {"field": "sql_pair_id", "operator": "==", "value": "1"}
+    assert await store.count_documents(filters) == 0
+
+
+@pytest.mark.asyncio
+async def test_write_documents_policies():
+    store = LocalVectorDocumentStore(index="test")
+    await store.write_documents(_documents())
+
+    with pytest.raises(DuplicateDocumentError):
+        await store.write_documents([Document(id="1", content="orders")])
+
+    written = await store.write_documents(
+        [Document(id="1", content="skipped"), Document(id="5", content="new")],
+        policy=DuplicatePolicy.SKIP,
+    )
+    assert written == 1
+
+    await store.write_documents(
+        [Document(id="1", content="updated", embedding=[0.0, 0.0, 1.0])],
+        policy=DuplicatePolicy.OVERWRITE,
+    )
+    assert await store.count_documents() == 5
+    (document,) = await store._query_by_embedding([0.0, 0.0, 1.0], top_k=1)
+    assert (document.id, document.content, document.meta) == ("1", "updated", {})
+
+    await store.delete_documents(
+        {"field": "project_id", "operator": "==", "value": "a"}
+    )
+    assert sorted(document.id for document in store.filter_documents()) == [
+        "1",
+        "3",
+        "5",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_persistence(tmp_path):
+    store = LocalVectorDocumentStore(index="test", path=str(tmp_path), dtype="float16")
+    await store.write_documents(_documents())
+    await store.delete_documents({"field": "id", "operator": "==", "value": "2"})
+
+    reloaded = LocalVectorDocumentStore(index="test", path=str(tmp_path))
+    assert reloaded.embedding_dim == 3
+    assert await reloaded.count_documents() == 3
+    (document,) = await reloaded._query_by_embedding([0.8, 0.6, 0.0], top_k=1)
+    assert document.id == "3"
+    assert document.score == pytest.approx(1.0, abs=1e-3)
+
+    recreated = LocalVectorDocumentStore(
+        index="test", path=str(tmp_path), recreate_index=True
+    )
+    assert await recreated.count_documents() == 0
+
+
+@pytest.mark.asyncio
+async def test_index_generations_are_hidden():
+    generations = IndexGenerations()
+    store = LocalVectorDocumentStore(index="test", generations=generations)
+    await store.write_documents(
+        [
+            Document(
+                id="old", content="old", meta={"project_id": "a", "generation": "1"}
+            ),
+            Document(
+                id="new", content="new", meta={"project_id": "a", "generation": "2"}
+            ),
+            Document(id="pair", content="pair", meta={"project_id": "a"}),
+        ]
+    )
+
+    generations.stage("2")
+    assert sorted(d.id for d in store.filter_documents()) == ["old", "pair"]
+
+    generations.activate("a", "2")
+    assert sorted(d.id for d in store.filter_documents()) == ["new", "pair"]
+
+    generations.release("a", "2")
+    assert await store.count_documents() == 3
+
+
+@pytest.mark.asyncio
+async def test_provider_shares_collections_between_pipelines():
+    provider = LocalVectorProvider()
+    embedder = MockEmbedderProvider(dimension=8)
+    assert provider.get_store(dataset_name="sql_pairs") is provider.get_store(
+        dataset_name="sql_pairs"
+    )
+
+    pipeline = SqlPairs(
+        embedder_provider=embedder,
+        document_store_provider=provider,
+        sql_pairs_path="tests/data/pairs.json",
+    )
+    await pipeline.run(
+        mdl_str='{"models": [{"properties": {"boilerplate": "test"}}]}',
+        project_id="fake-id",
+    )
+
+    retriever = provider.get_retriever(provider.get_store(dataset_name="sql_pairs"))
+    result = await retriever.run(
+        query_embedding=[],
+        filters={"field": "project_id", "operator": "==", "value": "fake-id"},
+    )
+    assert len(result["documents"]) == 2
+    assert all(document.meta.get("sql") for document in result["documents"])
+
+
+@pytest.mark.asyncio
+async def test_int8_vectors(tmp_path):
+    store = LocalVectorDocumentStore(index="test", path=str(tmp_path), dtype="int8")
+    await store.write_documents(_documents())
+
+    documents = await store._query_by_embedding([0.8, 0.6, 0.0], top_k=2)
+    assert [document.id for document in documents] == ["3", "4"]
+    assert documents[0].score == pytest.approx(1.0, abs=1e-2)
+    assert os.path.getsize(tmp_path / "test" / "vectors") == store._capacity * 3
+
+
+@pytest.mark.asyncio
+async def test_changes_are_appended_to_the_log(tmp_path):
+    store = LocalVectorDocumentStore(index="test", path=str(tmp_path))
+    documents = _documents()
+    await store.write_documents(documents[:2])
+    payload_path = os.path.join(tmp_path, "test", "payload.json")
+    with open(payload_path, "rb") as file:
+        payload = file.read()
+
+    await store.write_documents(documents[2:])
+    await store.write_documents(
+        [Document(id="1", content="updated", embedding=[0.0, 0.0, 1.0])],
+        policy=DuplicatePolicy.OVERWRITE,
+    )
+    await store.delete_documents({"field": "id", "operator": "==", "value": "2"})
+
+    # the sidecar isn't rewritten for every change
+    with open(payload_path, "rb") as file:
+        assert file.read() == payload
+    with open(os.path.join(tmp_path, "test", "payload.1.log"), "ab") as file:
+        file.write(b'{"row": 9, "fie')
+
+    reloaded = LocalVectorDocumentStore(index="test", path=str(tmp_path))
+    assert sorted(document.id for document in reloaded.filter_documents()) == [
+        "1",
+        "3",
+        "4",
+    ]
+    (document,) = await reloaded._query_by_embedding([0.0, 0.0, 1.0], top_k=1)
+    assert (document.id, document.content, document.meta) == ("1", "updated", {})
+
+    # a log with an interrupted change is folded into a new sidecar
+    await reloaded.write_documents([documents[1]])
+    assert not os.path.exists(os.path.join(tmp_path, "test", "payload.1.log"))
+    reloaded = LocalVectorDocumentStore(index="test", path=str(tmp_path))
+    assert await reloaded.count_documents() == 4
+
+
+@pytest.mark.asyncio
+async def test_searches_are_not_blocked_by_a_flush(tmp_path, monkeypatch):
+    store = LocalVectorDocumentStore(index="test", path=str(tmp_path))
+    started, release = threading.Event(), threading.Event()
+    dumps = orjson.dumps
+
+    def slow_dumps(obj, option=None):
+        if option == orjson.OPT_SERIALIZE_NUMPY:
+            # the sidecar is being written
+            started.set()
+            release.wait(5)
+        return dumps(obj, option=option)
+
+    monkeypatch.setattr(orjson, "dumps", slow_dumps)
+    write = asyncio.create_task(store.write_documents(_documents()))
+    assert await asyncio.to_thread(started.wait, 5)
+
+    assert await store.count_documents() == 4
+    (document,) = await store._query_by_embedding([0.8, 0.6, 0.0], top_k=1)
+    assert document.id == "3"
+
+    release.set()
+    assert await write == 4
+    reloaded = LocalVectorDocumentStore(index="test", path=str(tmp_path))
+    assert await reloaded.count_documents() == 4
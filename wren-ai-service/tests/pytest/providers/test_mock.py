@@ -0,0 +1,104 @@
+import litellm
+import orjson
+import pytest
+from haystack import Document
+
+from src.pipelines.generation.utils.sql import SQL_GENERATION_MODEL_KWARGS
+from src.providers.embedder.mock import MockEmbedderProvider
+from src.providers.llm.mock import MockLLMProvider, build_schema_instance
+from src.providers.mock import LatencyModel
+
+
+def test_latency_model_is_deterministic_and_clamped():
+    import random
+
+    latency = LatencyModel(distribution="lognormal", mean=1.0, stddev=0.5, max=1.5)
+    first = [latency.sample(random.Random(42)) for _ in range(3)]
+    second = [latency.sample(random.Random(42)) for _ in range(3)]
+
+    assert first == second
+    assert all(0 <= value <= 1.5 for value in first)
+    assert LatencyModel.from_config(0.2).sample(random.Random()) == 0.2
+
+
+def test_build_schema_instance():
+    schema = SQL_GENERATION_MODEL_KWARGS["response_format"]["json_schema"]["schema"]
+    assert build_schema_instance(schema) == {"sql": "mock"}
+
+    schema = {
+        "$defs": {"Item": {"properties": {"kind": {"enum": ["a", "b"]}}}},
+        "properties": {
+            "items": {"type": "array", "items": {"$ref": "#/$defs/Item"}},
+            "count": {"type": "integer"},
+        },
+        "type": "object",
+    }
+    assert build_schema_instance(schema) == {"items": [{"kind": "a"}], "count": 0}
+
+
+@pytest.mark.asyncio
+async def test_mock_llm_replies():
+    llm = MockLLMProvider(
+        responses={"sql_generation_result": {"sql": "SELECT 1"}},
+        default_response="hello mock world",
+    )
+
+    generator = llm.get_generator(generation_kwargs=SQL_GENERATION_MODEL_KWARGS)
+    result = await generator(prompt="question")
+    assert orjson.loads(result["replies"][0]) == {"sql": "SELECT 1"}
+    assert result["meta"][0]["model"] == "mock"
+
+    chunks = []
+    generator = llm.get_generator(
+        streaming_callback=lambda chunk, query_id: chunks.append((chunk, query_id))
+    )
+    result = await generator(prompt="question", query_id="q1")
+    assert result["replies"] == ["hello mock world"]
+    assert "".join(chunk.content for chunk, _ in chunks) == "hello mock world"
+    assert chunks[-1][0].meta["finish_reason"] == "stop"
+    assert all(query_id == "q1" for _, query_id in chunks)
+
+
+@pytest.mark.asyncio
+async def test_mock_llm_rate_limit_injection():
+    llm = MockLLMProvider(rate_limit_rate=1.0)
+
+    with pytest.raises(litellm.RateLimitError):
+        await llm.get_generator()(prompt="question")
+
+
+@pytest.mark.asyncio
+async def test_mock_embedder():
+    embedder = MockEmbedderProvider(dimension=8)
+
+    text_embedding = (await embedder.get_text_embedder().run(text="hello"))["embedding"]
+    documents = (
+        await embedder.get_document_embedder().run(
+            documents=[Document(content="hello"), Document(content="world")],
+            batch_size=1,
+        )
+    )["documents"]
+
+    assert len(text_embedding) == 8
+    assert documents[0].embedding == text_embedding
+    assert documents[1].embedding != text_embedding
+
+
+@pytest.mark.asyncio
+async def test_mock_embedder_target_dimension():
+    embedder = MockEmbedderProvider(dimension=8, target_dimension=4)
+    full = (await MockEmbedderProvider(dimension=8).get_text_embedder().run("hello"))[
+        "embedding"
+    ]
+
+    embedding = (await embedder.get_text_embedder().run(text="hello"))["embedding"]
+
+    assert embedder.get_dimension() == 4
+    assert len(embedding) == 4
+    assert sum(value**2 for value in embedding) == pytest.approx(1.0)
+    # Matryoshka truncation keeps the direction of the leading components
+    scale = embedding[0] / full[0]
+    assert embedding == pytest.approx([value * scale for value in full[:4]])
+
+    with pytest.raises(ValueError):
+        MockEmbedderProvider(dimension=8, target_dimension=16)
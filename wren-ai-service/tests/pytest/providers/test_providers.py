@@ -1,9 +1,26 @@
+from types import SimpleNamespace
+
+import pytest
 from pytest_mock import MockerFixture
+from qdrant_client.http import models as rest
 
 from src.core.engine import Engine
 from src.core.pipeline import PipelineComponent
 from src.core.provider import DocumentStoreProvider, EmbedderProvider, LLMProvider
-from src.providers import Configuration, generate_components, transform
+from src.providers import (
+    Configuration,
+    generate_components,
+    transform,
+    validate_embedding_dimensions,
+)
+from src.providers.document_store.local_vector import LocalVectorProvider
+from src.providers.document_store.qdrant import (
+    QdrantProvider,
+    build_quantization_config,
+    build_search_params,
+    build_storage_config,
+)
+from src.providers.embedder.mock import MockEmbedderProvider
 
 
 def test_transform():
@@ -101,3 +118,58 @@ def test_generate_components(mocker: MockerFixture):
     assert isinstance(result["indexing"].llm_provider, LLMProvider)
     assert isinstance(result["indexing"].document_store_provider, DocumentStoreProvider)
     assert isinstance(result["indexing"].engine, Engine)
+
+
+def test_qdrant_collection_config():
+    provider = SimpleNamespace(
+        _collections={
+            "default": {"on_disk": False, "hnsw": {"ef_construct": 64}},
+            "Document": {"hnsw": {"m": 16}, "quantization": {"type": "scalar"}},
+        }
+    )
+
+    config = QdrantProvider._collection_config(provider, "Document")
+    assert config["on_disk"] is False
+    assert config["hnsw"] == {"payload_m": 16, "m": 16, "ef_construct": 64}
+    assert QdrantProvider._collection_config(provider, "sql_pairs")["hnsw"]["m"] == 0
+
+    # binary quantization is only the default for large embeddings
+    assert build_quantization_config(None, 768) is None
+    assert isinstance(build_quantization_config(None, 3072), rest.BinaryQuantization)
+    assert isinstance(
+        build_quantization_config(config["quantization"], 3072),
+        rest.ScalarQuantization,
+    )
+    assert build_quantization_config({"type": "none"}, 3072) is None
+
+    assert build_search_params(None, quantized=False) is None
+    params = build_search_params({"hnsw_ef": 128}, quantized=True)
+    assert params.hnsw_ef == 128
+    assert params.quantization.oversampling == 3.0
+
+    # int8 vectors are scalar quantized by Qdrant, float16 vectors are stored as such
+    assert build_storage_config({}) == (None, None)
+    assert build_storage_config({"datatype": "float16"}) == (
+        rest.Datatype.FLOAT16,
+        None,
+    )
+    assert build_storage_config({"datatype": "int8"})[1]["type"] == "scalar"
+
+
+def test_validate_embedding_dimensions():
+    components = {
+        "db_schema_indexing": PipelineComponent(
+            embedder_provider=MockEmbedderProvider(
+                dimension=3072, target_dimension=1024
+            ),
+            document_store_provider=LocalVectorProvider(embedding_model_dim=1024),
+        ),
+        "sql_generation": PipelineComponent(),
+    }
+    validate_embedding_dimensions(components)
+
+    components["db_schema_indexing"].document_store_provider = LocalVectorProvider(
+        embedding_model_dim=3072
+    )
+    with pytest.raises(ValueError, match="db_schema_indexing"):
+        validate_embedding_dimensions(components)
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from haystack import Document
+from haystack.document_stores.types import DuplicatePolicy
+
+from src.providers.document_store.qdrant import AsyncQdrantDocumentStore
+
+
+class AsyncClient:
+    def __init__(self):
+        self.upserts = []
+        self.running = 0
+        self.max_running = 0
+
+    async def upsert(self, collection_name, points, wait):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        self.upserts.append((len(points), wait))
+
+
+def _document_store(write_batch_size: int = 2, write_concurrency: int = 2):
+    # the store is set up without a Qdrant server
+    document_store = object.__new__(AsyncQdrantDocumentStore)
+    document_store.index = "Document"
+    document_store.async_client = AsyncClient()
+    document_store.write_batch_size = write_batch_size
+    document_store.embedding_dim = 2
+    document_store.similarity = "cosine"
+    document_store.use_sparse_embeddings = False
+    document_store.sparse_idf = False
+    document_store.on_disk = False
+    document_store.payload_fields_to_index = None
+    document_store.progress_bar = False
+    document_store.wait_result_from_api = True
+    document_store._write_concurrency = write_concurrency
+    document_store._collection_ready = False
+    document_store._collection_lock = asyncio.Lock()
+    document_store.setups = 0
+
+    def _set_up_collection(*args):
+        document_store.setups += 1
+
+    document_store._set_up_collection = _set_up_collection
+    return document_store
+
+
+def _documents(count: int):
+    return [
+        Document(id=str(i), content=f"document {i}", embedding=[0.1, 0.2])
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_write_documents_in_concurrent_batches():
+    document_store = _document_store(write_batch_size=2, write_concurrency=2)
+
+    written = await document_store.write_documents(
+        _documents(7), policy=DuplicatePolicy.OVERWRITE
+    )
+
+    assert written == 7
+    upserts = document_store.async_client.upserts
+    assert sorted(size for size, _ in upserts) == [1, 2, 2, 2]
+    # every batch is acknowledged once applied, whatever the shard of its points
+    assert all(wait for _, wait in upserts)
+    assert document_store.async_client.max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_collection_is_set_up_once():
+    document_store = _document_store()
+
+    await asyncio.gather(
+        *[
+            document_store.write_documents(
+                _documents(3), policy=DuplicatePolicy.OVERWRITE
+            )
+            for _ in range(5)
+        ]
+    )
+
+    assert document_store.setups == 1
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+from haystack.dataclasses import StreamingChunk
+
+from src.pipelines.generation.sql_answer import SQLAnswer
+from src.providers.llm.litellm import _close_stream
+from src.web.v1.services import QueryTasks
+from src.web.v1.services.chart import (
+    ChartRequest,
+    ChartResultRequest,
+    ChartService,
+    StopChartRequest,
+)
+
+
+async def _collect(results):
+    return [result async for result in results]
+
+
+class SlowPipeline:
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def run(self, **kwargs):
+        self.started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+class LLMProviderMock:
+    def get_generator(self, **kwargs):
+        return None
+
+    def get_model(self):
+        return "model"
+
+
+@pytest.mark.asyncio
+async def test_stopped_query_returns_none():
+    tasks = QueryTasks()
+
+    run = asyncio.create_task(tasks.run("query", asyncio.sleep(10, result="done")))
+    await asyncio.sleep(0)
+    assert "query" in tasks
+
+    assert tasks.cancel("query") == 1
+    assert await run is None
+    assert "query" not in tasks
+
+
+@pytest.mark.asyncio
+async def test_finished_tasks_are_forgotten():
+    tasks = QueryTasks()
+
+    assert await tasks.run("query", asyncio.sleep(0, result="done")) == "done"
+    await asyncio.sleep(0)
+    assert "query" not in tasks
+    assert tasks.cancel("query") == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_is_not_swallowed():
+    tasks = QueryTasks()
+
+    run = asyncio.create_task(tasks.run("query", asyncio.sleep(10)))
+    await asyncio.sleep(0)
+    run.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await run
+
+
+@pytest.mark.asyncio
+async def test_stop_chart_cancels_the_generation():
+    pipeline = SlowPipeline()
+    service = ChartService(pipelines={"chart_generation": pipeline})
+
+    chart_request = ChartRequest(query="q", sql="SELECT 1", data={"a": 1})
+    chart_request.query_id = "query"
+    chart = asyncio.create_task(service.chart(chart_request))
+    await pipeline.started.wait()
+
+    stop_chart_request = StopChartRequest(status="stopped")
+    stop_chart_request.query_id = "query"
+    service.stop_chart(stop_chart_request)
+
+    assert await chart is None
+    assert pipeline.cancelled
+    assert (
+        service.get_chart_result(ChartResultRequest(query_id="query")).status
+        == "stopped"
+    )
+
+
+@pytest.mark.asyncio
+async def test_close_stream():
+    class Stream:
+        closed = False
+
+        async def close(self):
+            self.closed = True
+
+    class Completion:
+        completion_stream = Stream()
+
+    completion = Completion()
+    await _close_stream(completion)
+    assert completion.completion_stream.closed
+
+    # streams without a close are left as they are
+    await _close_stream(object())
+
+
+@pytest.mark.asyncio
+async def test_stop_streaming_results_drops_the_queue():
+    pipeline = SQLAnswer(llm_provider=LLMProviderMock())
+
+    # a client waiting for the results is released
+    results = asyncio.create_task(_collect(pipeline.get_streaming_results("waiting")))
+    await asyncio.sleep(0)
+    pipeline.stop_streaming_results("waiting")
+    assert await results == []
+    assert "waiting" not in pipeline._user_queues
+
+    # the queue is dropped without a client, and isn't created again by late chunks
+    pipeline._streaming_callback(StreamingChunk(content="a"), "unread")
+    pipeline.stop_streaming_results("unread")
+    pipeline._streaming_callback(StreamingChunk(content="b"), "unread")
+    await asyncio.sleep(0)
+    assert "unread" not in pipeline._user_queues
+    assert await _collect(pipeline.get_streaming_results("unread")) == []
@@ -0,0 +1,335 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.core.generations import IndexGenerations
+from src.pipelines.generation.utils.sql import SQLValidator
+from src.pipelines.indexing import ParsedMDL
+from src.web.v1.services.semantics_preparation import (
+    SemanticsPreparationRequest,
+    SemanticsPreparationService,
+    SemanticsPreparationStatusRequest,
+)
+
+PIPELINES = [
+    "db_schema",
+    "historical_question",
+    "table_description",
+    "sql_pairs",
+    "project_meta",
+]
+
+
+class IndexingPipelineMock:
+    def __init__(self, name: str, calls: list, running: list, delay: float = 0.05):
+        self._name = name
+        self._calls = calls
+        self._running = running
+        self._delay = delay
+        self.generations = []
+        self.cleaned = []
+
+    async def run(self, mdl: dict, project_id: str = None, generation: str = None):
+        self._calls.append((self._name, mdl.get("name"), project_id))
+        self.generations.append(generation)
+        self._running.append(project_id)
+        try:
+            await asyncio.sleep(self._delay)
+        finally:
+            self._running.remove(project_id)
+        if mdl.get("name") == "fail" and self._name == "db_schema":
+            raise Exception("indexing error")
+
+    async def clean(self, project_id: str = None, **kwargs):
+        self.cleaned.append((project_id, kwargs))
+
+
+def _service(calls: list, running: list, **kwargs) -> SemanticsPreparationService:
+    return SemanticsPreparationService(
+        pipelines={
+            name: IndexingPipelineMock(name, calls, running) for name in PIPELINES
+        },
+        **kwargs,
+    )
+
+
+def _status(service: SemanticsPreparationService, mdl_hash: str):
+    return service.get_prepare_semantics_status(
+        SemanticsPreparationStatusRequest(mdl_hash=mdl_hash)
+    )
+
+
+@pytest.mark.asyncio
+async def test_enqueue_reports_progress():
+    calls, running = [], []
+    service = _service(calls, running)
+
+    await service.enqueue(
+        SemanticsPreparationRequest(mdl='{"name": "mdl"}', mdl_hash="1")
+    )
+    assert _status(service, "1").status == "indexing"
+    assert set(_status(service, "1").progress) == set(PIPELINES)
+    assert set(_status(service, "1").progress.values()) <= {"pending", "indexing"}
+
+    await service._job_queue.join()
+
+    status = _status(service, "1")
+    assert status.status == "finished"
+    assert status.progress == {name: "finished" for name in PIPELINES}
+    assert len(calls) == len(PIPELINES)
+
+
+@pytest.mark.asyncio
+async def test_enqueue_failed_pipeline():
+    calls, running = [], []
+    service = _service(calls, running)
+
+    await service.enqueue(
+        SemanticsPreparationRequest(mdl='{"name": "fail"}', mdl_hash="1")
+    )
+    await service._job_queue.join()
+
+    status = _status(service, "1")
+    assert status.status == "failed"
+    assert "indexing error" in status.error.message
+    assert service._job_queue.store.get("1").progress["db_schema"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_enqueue_coalesces_superseded_jobs():
+    calls, running = [], []
+    service = _service(calls, running)
+
+    for mdl_hash in ["1", "2", "3", "3"]:
+        await service.enqueue(
+            SemanticsPreparationRequest(
+                mdl=f'{{"name": "mdl-{mdl_hash}"}}', mdl_hash=mdl_hash, project_id="p"
+            )
+        )
+        # let the first job start running
+        await asyncio.sleep(0.01 if mdl_hash == "1" else 0)
+    await service._job_queue.join()
+
+    # the first job was already running, the second one is superseded by the third one
+    assert {mdl for _, mdl, _ in calls} == {"mdl-1", "mdl-3"}
+    assert len(calls) == 2 * len(PIPELINES)
+    assert _status(service, "1").status == "finished"
+    assert _status(service, "2").status == "failed"
+    assert "Superseded" in _status(service, "2").error.message
+    assert _status(service, "3").status == "finished"
+
+
+@pytest.mark.asyncio
+async def test_enqueue_limits_concurrency():
+    calls, running = [], []
+    service = _service(calls, running, max_concurrency=2)
+    max_projects = 0
+
+    async def _watch():
+        nonlocal max_projects
+        while True:
+            max_projects = max(max_projects, len(set(running)))
+            await asyncio.sleep(0.001)
+
+    watcher = asyncio.create_task(_watch())
+    for project_id in ["a", "b", "c", "d"]:
+        await service.enqueue(
+            SemanticsPreparationRequest(
+                mdl='{"name": "mdl"}', mdl_hash=project_id, project_id=project_id
+            )
+        )
+    await service._job_queue.join()
+    watcher.cancel()
+
+    assert max_projects == 2
+    assert len(calls) == 4 * len(PIPELINES)
+
+
+@pytest.mark.asyncio
+async def test_resume_jobs_after_restart(tmp_path):
+    path = str(tmp_path / "indexing_jobs.db")
+    calls, running = [], []
+
+    service = _service(calls, running, job_store_path=path)
+    await service.enqueue(
+        SemanticsPreparationRequest(mdl='{"name": "mdl"}', mdl_hash="1")
+    )
+    # simulate a restart while the job is still running
+    await asyncio.sleep(0.01)
+    for task in list(service._job_queue._workers.values()):
+        task.cancel()
+    await service._job_queue.join()
+
+    restarted = _service(calls, running, job_store_path=path)
+    assert _status(restarted, "1").status == "indexing"
+
+    await restarted.resume_jobs()
+    await restarted._job_queue.join()
+
+    assert _status(restarted, "1").status == "finished"
+    assert restarted._job_queue.store.get("1").status == "finished"
+
+
+@pytest.mark.asyncio
+async def test_prepare_semantics_flips_generation():
+    calls, running = [], []
+    generations = IndexGenerations()
+    service = _service(calls, running, generations=generations)
+
+    await service.enqueue(
+        SemanticsPreparationRequest(mdl='{"name": "mdl"}', mdl_hash="1", project_id="p")
+    )
+    # the new generation is hidden while it's being written
+    await asyncio.sleep(0.01)
+    assert len(generations.staged) == 1
+    assert generations.retiring == {}
+
+    await service._job_queue.join()
+
+    generation = service._job_queue.store.get("1").generation
+    assert generations.staged == frozenset()
+    assert service._pipelines["db_schema"].generations == [generation]
+    assert service._pipelines["sql_pairs"].generations == [None]
+
+    # the old generations are collected in the background
+    await asyncio.gather(*service._background_tasks)
+    assert generations.retiring == {}
+    assert service._pipelines["db_schema"].cleaned == [("p", {"retain": generation})]
+    assert service._pipelines["sql_pairs"].cleaned == []
+    assert service._job_queue.store.active()[0].generation == generation
+
+
+@pytest.mark.asyncio
+async def test_active_generation_is_restored_after_restart(tmp_path):
+    path = str(tmp_path / "indexing_jobs.db")
+    calls, running = [], []
+
+    service = _service(calls, running, job_store_path=path)
+    await service.enqueue(
+        SemanticsPreparationRequest(mdl='{"name": "mdl"}', mdl_hash="1", project_id="p")
+    )
+    await service._job_queue.join()
+    generation = service._job_queue.store.get("1").generation
+
+    # the documents of other generations are hidden and collected again
+    generations = IndexGenerations()
+    restarted = _service(calls, running, job_store_path=path, generations=generations)
+    await restarted.resume_jobs()
+    await asyncio.gather(*restarted._background_tasks)
+
+    assert generations.retiring == {}
+    assert restarted._pipelines["db_schema"].cleaned == [("p", {"retain": generation})]
+
+
+@pytest.mark.asyncio
+async def test_prepare_semantics_discards_failed_generation():
+    calls, running = [], []
+    generations = IndexGenerations()
+    service = _service(calls, running, generations=generations)
+
+    await service.enqueue(
+        SemanticsPreparationRequest(
+            mdl='{"name": "fail"}', mdl_hash="1", project_id="p"
+        )
+    )
+    await service._job_queue.join()
+    await asyncio.gather(*service._background_tasks)
+
+    generation = service._job_queue.store.get("1").generation
+    assert generations.staged == frozenset()
+    assert generations.retiring == {}
+    assert service._pipelines["table_description"].cleaned == [
+        ("p", {"generation": generation})
+    ]
+    assert service._job_queue.store.active() == []
+
+
+@pytest.mark.asyncio
+async def test_enqueue_parses_mdl_once(monkeypatch):
+    parse = ParsedMDL.parse.__func__
+    parsed = []
+
+    def _parse(cls, mdl):
+        parsed.append(mdl)
+        return parse(cls, mdl)
+
+    monkeypatch.setattr(ParsedMDL, "parse", classmethod(_parse))
+    validator = SQLValidator()
+    calls, running = [], []
+    service = _service(calls, running, sql_validator=validator)
+
+    await service.enqueue(
+        SemanticsPreparationRequest(
+            mdl='{"name": "mdl", "models": [{"name": "t", "columns": []}]}',
+            mdl_hash="1",
+            project_id="project",
+        )
+    )
+    await service._job_queue.join()
+
+    assert len(parsed) == 1
+    assert validator.validate("SELECT * FROM missing", project_id="project")
+
+
+@pytest.mark.asyncio
+async def test_job_updates_are_written_off_the_event_loop():
+    calls, running = [], []
+    service = _service(calls, running)
+    store = service._job_queue.store
+    update = store.update
+    threads = []
+
+    def _update(job):
+        threads.append(threading.get_ident())
+        update(job)
+
+    store.update = _update
+    await service.enqueue(
+        SemanticsPreparationRequest(mdl='{"name": "mdl"}', mdl_hash="1")
+    )
+    await service._job_queue.join()
+
+    # indexing, the generation of the job and finished, but not every progress
+    assert len(threads) == 3
+    assert threading.get_ident() not in threads
+    assert store.get("1").progress == {name: "finished" for name in PIPELINES}
+
+
+@pytest.mark.asyncio
+async def test_enqueue_of_a_queued_mdl_keeps_its_progress():
+    calls, running = [], []
+    service = _service(calls, running)
+    request = SemanticsPreparationRequest(mdl='{"name": "mdl"}', mdl_hash="1")
+
+    await service.enqueue(request)
+    await asyncio.sleep(0.01)
+    status = _status(service, "1")
+    assert set(status.progress.values()) == {"indexing"}
+
+    await service.enqueue(request)
+    assert _status(service, "1") is status
+
+    await service._job_queue.join()
+    assert _status(service, "1").status == "finished"
+    assert len(calls) == len(PIPELINES)
+
+
+@pytest.mark.asyncio
+async def test_enqueue_of_a_running_mdl_keeps_the_validator_schema():
+    validator = SQLValidator()
+    calls, running = [], []
+    service = _service(calls, running, sql_validator=validator)
+    request = SemanticsPreparationRequest(
+        mdl='{"name": "mdl", "models": [{"name": "t", "columns": []}]}',
+        mdl_hash="1",
+        project_id="project",
+    )
+
+    await service.enqueue(request)
+    await asyncio.sleep(0.01)
+    assert validator.validate("SELECT * FROM missing", project_id="project")
+
+    await service.enqueue(request)
+    await service._job_queue.join()
+    assert validator.validate("SELECT * FROM missing", project_id="project")
@@ -0,0 +1,109 @@
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from src.core import arrow  # noqa: E402
+from src.core.result_cache import QueryResultCache  # noqa: E402
+from src.pipelines.generation.utils.chart import ChartDataPreprocessor  # noqa: E402
+from src.pipelines.retrieval.preprocess_sql_data import preprocess  # noqa: E402
+from src.pipelines.retrieval.sql_executor import SQLExecutor  # noqa: E402
+
+SQL_DATA = {
+    "columns": [{"name": "city", "type": "VARCHAR"}, {"name": "sales"}, "mixed"],
+    "data": [
+        ["Taipei", 10, 1],
+        ["Tokyo", 20.5, "a"],
+        ["Taipei", None, None],
+    ],
+}
+
+
+class WhitespaceEncoding:
+    def encode(self, text: str) -> list[str]:
+        return text.split()
+
+
+class FakeEngine:
+    def __init__(self):
+        self.calls = []
+
+    async def execute_sql(self, sql, session, dry_run=True, **kwargs):
+        self.calls.append(kwargs)
+        return True, SQL_DATA, None
+
+
+def test_from_json_decodes_columns():
+    table = arrow.from_json(SQL_DATA)
+
+    assert table.column_names == ["city", "sales", "mixed"]
+    assert table.column("sales").type == pa.float64()
+    assert table.column("mixed").to_pylist() == ["1", "a", None]
+    assert arrow.to_sql_data(table)["data"][0] == ["Taipei", 10.0, "1"]
+    assert arrow.from_ipc(arrow.to_ipc(table)).equals(table)
+    assert arrow.from_json({}).num_rows == 0
+
+
+def test_chart_data_preprocessor_on_arrow():
+    result = ChartDataPreprocessor().run(
+        arrow.from_json(SQL_DATA), sample_data_count=2, sample_column_size=1
+    )
+
+    assert len(result["sample_data"]) == 2
+    assert set(result["sample_data"][0]) == {"city", "sales", "mixed"}
+    assert result["sample_column_values"] == {
+        "city": ["Taipei"],
+        "sales": [10.0],
+        "mixed": ["1"],
+    }
+
+
+def test_preprocess_fits_rows_in_context_window():
+    encoding = WhitespaceEncoding()
+    table = pa.table(
+        {"id": list(range(1000)), "name": [f"name {i}" for i in range(1000)]}
+    )
+    count = lambda table: len(encoding.encode(str(arrow.to_sql_data(table))))  # noqa: E731
+
+    result = preprocess(table, encoding, context_window_size=2000)
+
+    num_rows = result["num_rows_used_in_llm"]
+    assert len(result["sql_data"]["data"]) == num_rows
+    assert result["tokens"] == count(table.slice(0, num_rows)) <= 2000
+    assert count(table.slice(0, num_rows + 1)) > 2000
+
+
+@pytest.mark.asyncio
+async def test_columnar_executor_caches_ipc():
+    engine = FakeEngine()
+    cache = QueryResultCache()
+    executor = SQLExecutor(engine=engine, result_cache=cache, columnar=True)
+
+    first = (await executor.run(sql="SELECT * FROM sales"))["execute_sql"]["results"]
+    second = (await executor.run(sql="SELECT * FROM sales"))["execute_sql"]["results"]
+
+    assert [call["result_format"] for call in engine.calls] == ["arrow"]
+    assert arrow.is_table(first) and first.equals(second)
+
+    # the executors which aren't columnar get the dictionaries
+    rows = (
+        await SQLExecutor(engine=engine, result_cache=cache).run(
+            sql="SELECT * FROM sales"
+        )
+    )["execute_sql"]["results"]
+    assert rows["data"][1] == ["Tokyo", 20.5, "a"]
+
+
+def test_chart_data_preprocessor_covers_arrow_strata():
+    table = pa.table(
+        {
+            "day": [f"2024-01-{day:02d}" for day in range(28, 0, -1)],
+            "region": ["north"] * 27 + ["south"],
+        }
+    )
+
+    result = ChartDataPreprocessor().run(table, sample_data_count=4, seed=1)
+
+    assert result == ChartDataPreprocessor().run(table, sample_data_count=4, seed=1)
+    days = [row["day"] for row in result["sample_data"]]
+    assert {"2024-01-01", "2024-01-28"} <= set(days)
+    assert {row["region"] for row in result["sample_data"]} == {"north", "south"}
@@ -26,6 +26,8 @@ def test_settings_default_values():
 
         assert settings.config_path == "config.yaml"
 
+        assert settings.indexing_job_store_path == "indexing_jobs.db"
+
 
 def test_settings_env_var_override():
     env_vars = {
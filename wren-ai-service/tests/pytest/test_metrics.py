@@ -0,0 +1,146 @@
+import sys
+import types
+
+import pytest
+from hamilton import base
+from hamilton.async_driver import AsyncDriver
+
+from src.core import metrics
+from src.utils import observe
+
+
+def test_histogram_render():
+    histogram = metrics.Histogram(
+        "test_duration_seconds",
+        "test histogram",
+        ("stage",),
+        buckets=(0.1, 1.0),
+        registry=None,
+    )
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5, stage="a")
+
+    assert histogram.count(stage="a") == 3
+    assert histogram.sum(stage="a") == pytest.approx(5.55)
+    assert histogram.render() == [
+        'test_duration_seconds_bucket{stage="a",le="0.1"} 1',
+        'test_duration_seconds_bucket{stage="a",le="1"} 2',
+        'test_duration_seconds_bucket{stage="a",le="+Inf"} 3',
+        'test_duration_seconds_sum{stage="a"} 5.55',
+        'test_duration_seconds_count{stage="a"} 3',
+    ]
+
+
+def test_registry_render():
+    registry = metrics.Registry()
+    counter = metrics.Counter(
+        "test_total", "test counter", ("result",), registry=registry
+    )
+    counter.inc(result='with "quotes"')
+
+    assert registry.render() == (
+        "# HELP test_total test counter\n"
+        "# TYPE test_total counter\n"
+        'test_total{result="with \\"quotes\\""} 1\n'
+    )
+
+    with pytest.raises(ValueError):
+        metrics.Counter("test_total", "duplicated", registry=registry)
+
+
+@pytest.mark.asyncio
+async def test_observe_records_hamilton_nodes():
+    module = types.ModuleType("metrics_test_pipeline")
+
+    @observe(capture_input=False)
+    def prompt(query: str) -> str:
+        return f"prompt: {query}"
+
+    @observe(capture_input=False)
+    async def generate(prompt: str) -> str:
+        return prompt.upper()
+
+    prompt.__module__ = generate.__module__ = module.__name__
+    module.prompt, module.generate = prompt, generate
+    sys.modules[module.__name__] = module
+
+    before = metrics.STAGE_DURATION.count(
+        module="test_metrics", stage="generate", status="success"
+    )
+
+    driver = AsyncDriver({}, module, result_builder=base.DictResult())
+    result = await driver.execute(["generate"], inputs={"query": "q"})
+
+    assert result["generate"] == "PROMPT: Q"
+    assert (
+        metrics.STAGE_DURATION.count(
+            module="test_metrics", stage="generate", status="success"
+        )
+        == before + 1
+    )
+
+
+@pytest.mark.asyncio
+async def test_track_provider_records_tokens_and_errors():
+    @metrics.track_provider("llm", "litellm_llm", "completion", model="test-model")
+    async def run(fail: bool = False):
+        if fail:
+            raise RuntimeError("failed")
+        return {
+            "replies": ["ok"],
+            "meta": [{"model": "test-model", "usage": {"prompt_tokens": 10}}],
+        }
+
+    tokens = metrics.TOKENS.get(
+        provider="llm", model="test-model", type="prompt_tokens"
+    )
+
+    await run()
+    with pytest.raises(RuntimeError):
+        await run(fail=True)
+
+    assert (
+        metrics.TOKENS.get(provider="llm", model="test-model", type="prompt_tokens")
+        == tokens + 10
+    )
+    assert (
+        metrics.PROVIDER_DURATION.count(
+            provider="llm",
+            name="litellm_llm",
+            model="test-model",
+            operation="completion",
+            status="error",
+        )
+        == 1
+    )
+
+
+def test_status_tracking_cache():
+    class Result:
+        def __init__(self, status: str):
+            self.status = status
+
+    cache = metrics.StatusTrackingCache(service="test", maxsize=10, ttl=60)
+
+    cache["1"] = Result("understanding")
+    cache["1"] = Result("searching")
+    cache["2"] = Result("understanding")
+
+    assert metrics.IN_PROGRESS.get(service="test", status="searching") == 1
+    assert metrics.IN_PROGRESS.get(service="test", status="understanding") == 1
+    assert metrics.STATUS_DURATION.count(service="test", status="understanding") == 1
+
+    cache["1"] = Result("finished")
+
+    assert metrics.IN_PROGRESS.get(service="test", status="searching") == 0
+    assert metrics.STATUS_TRANSITIONS.get(service="test", status="finished") == 1
+    assert metrics.STATUS_DURATION.count(service="test", status="searching") == 1
+
+
+def test_metric_must_render():
+    class Untyped(metrics._Metric):
+        pass
+
+    with pytest.raises(TypeError):
+        Untyped("wren_ai_untyped", "A metric without render", registry=None)
@@ -0,0 +1,115 @@
+import numpy as np
+
+from src.core.profile import (
+    HeavyHitters,
+    HyperLogLog,
+    hash_values,
+    profile_column,
+    sample_indices,
+)
+from src.pipelines.retrieval.preprocess_sql_data import preprocess, summarize
+
+
+class WhitespaceEncoding:
+    def encode(self, text: str) -> list[str]:
+        return text.split()
+
+
+def _sql_data(num_rows: int) -> dict:
+    return {
+        "columns": [{"name": "id"}, {"name": "city"}, {"name": "amount"}],
+        "data": [
+            [i, f"city{i % 3}", None if i % 10 == 0 else i * 1.5]
+            for i in range(num_rows)
+        ],
+    }
+
+
+def test_hyperloglog_estimates_distinct_values():
+    values = np.random.default_rng(0).integers(0, 50_000, size=100_000)
+    sketch = HyperLogLog()
+    sketch.add(hash_values(values))
+
+    assert abs(sketch.count() - len(np.unique(values))) / len(np.unique(values)) < 0.05
+
+
+def test_heavy_hitters_keep_frequent_values():
+    values = np.array(["a"] * 300 + ["b"] * 200 + [str(i) for i in range(2000)])
+    hitters = HeavyHitters(capacity=16)
+    for batch in np.array_split(values, 7):
+        batch = batch.astype(object)
+        hitters.add(hash_values(batch), batch)
+
+    (a, a_count), (b, b_count) = hitters.top(2)
+    assert (a, b) == ("a", "b")
+    # underestimated by at most n / (capacity + 1)
+    assert 300 - len(values) / 17 <= a_count <= 300
+    assert 200 - len(values) / 17 <= b_count <= 200
+
+
+def test_profile_column():
+    profile = profile_column("amount", np.array([3, 1, None, 2, 2], dtype=object))
+
+    assert profile == {
+        "name": "amount",
+        "type": "integer",
+        "count": 5,
+        "nulls": 1,
+        "distinct": 3,
+        "min": 1,
+        "max": 3,
+        "mean": 2.0,
+        "quantiles": {"p5": 1.15, "p25": 1.75, "p50": 2.0, "p75": 2.25, "p95": 2.85},
+        "top_values": [{"value": 2, "count": 2}],
+    }
+
+
+def test_sample_indices_keep_the_first_rows():
+    assert sample_indices(5, 10).tolist() == [0, 1, 2, 3, 4]
+    assert sample_indices(1000, 8, head=3).tolist() == [0, 1, 2, 3, 252, 501, 750, 999]
+
+
+def test_large_results_are_summarized():
+    small = summarize(_sql_data(20), summary_row_threshold=50, summary_sample_size=10)
+    assert small == _sql_data(20)
+
+    result = preprocess(
+        summarize(_sql_data(5000), summary_row_threshold=50, summary_sample_size=10),
+        WhitespaceEncoding(),
+        context_window_size=100_000,
+    )
+
+    sql_data = result["sql_data"]
+    assert result["num_rows_used_in_llm"] == sql_data["row_count"] == 5000
+    assert len(sql_data["data"]) == 10
+    assert [profile["name"] for profile in sql_data["column_profiles"]] == [
+        "id",
+        "city",
+        "amount",
+    ]
+    top_values = sql_data["column_profiles"][1]["top_values"]
+    assert sorted(top_values, key=lambda top_value: top_value["value"]) == [
+        {"value": "city0", "count": 1667},
+        {"value": "city1", "count": 1667},
+        {"value": "city2", "count": 1666},
+    ]
+    assert sql_data["column_profiles"][2]["nulls"] == 500
+
+
+def test_list_and_dict_columns_are_profiled():
+    sql_data = {
+        "columns": ["id", "tags", "attributes"],
+        "data": [[i, [1, i % 2], {"k": i % 3}] for i in range(60)],
+    }
+
+    profiles = summarize(sql_data, summary_row_threshold=50, summary_sample_size=10)[
+        "column_profiles"
+    ]
+
+    assert profiles[1]["distinct"] == 2
+    assert profiles[1]["top_values"] == [
+        {"value": [1, 0], "count": 30},
+        {"value": [1, 1], "count": 30},
+    ]
+    assert profiles[2]["distinct"] == 3
+    assert {"value": {"k": 0}, "count": 20} in profiles[2]["top_values"]
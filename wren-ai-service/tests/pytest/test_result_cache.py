@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import orjson
+import pytest
+
+from src.core.result_cache import QueryResultCache
+from src.pipelines.retrieval.sql_executor import SQLExecutor
+
+
+class FakeEngine:
+    def __init__(self, success: bool = True):
+        self.calls = []
+        self._success = success
+
+    async def execute_sql(self, sql, session, dry_run=True, **kwargs):
+        self.calls.append(sql)
+        await asyncio.sleep(0.01)
+        if not self._success:
+            return False, None, "error"
+        return True, {"columns": [{"name": "n"}], "data": [[len(self.calls)]]}, None
+
+
+def test_evicts_least_recently_used_and_expired(monkeypatch):
+    value = {"data": [["x" * 20]]}
+    cache = QueryResultCache(max_size=2 * len(orjson.dumps(value)), ttl=60)
+
+    cache.set("a", value)
+    cache.set("b", value)
+    assert cache.get("a") == value
+    cache.set("c", value)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == value
+    assert cache.get("c") == value
+    assert cache.size == 2 * len(orjson.dumps(value))
+
+    now = time.monotonic()
+    monkeypatch.setattr("time.monotonic", lambda: now + 61)
+    assert cache.get("a") is None
+
+
+def test_key_follows_the_deployed_mdl():
+    cache = QueryResultCache()
+    cache.set_mdl_hash("project", "mdl-1")
+    key = cache.key("project", "SELECT 1", 500)
+    cache.set(key, {"data": []})
+
+    assert cache.key("project", " SELECT   1; ", 500) == key
+    assert cache.key("project", "SELECT 1", 100) != key
+    assert cache.key("other", "SELECT 1", 500) != key
+
+    cache.set_mdl_hash("project", "mdl-2")
+    assert cache.get(key) is None
+    assert cache.key("project", "SELECT 1", 500) != key
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fetches_hit_the_engine_once():
+    engine = FakeEngine()
+    executor = SQLExecutor(engine=engine, result_cache=QueryResultCache())
+
+    results = await asyncio.gather(
+        *[executor.run(sql="SELECT n FROM t", project_id="project") for _ in range(3)]
+    )
+    results.append(await executor.run(sql="SELECT n\nFROM t", project_id="project"))
+
+    assert len(engine.calls) == 1
+    assert all(result["execute_sql"]["results"]["data"] == [[1]] for result in results)
+
+    # every caller gets its own copy
+    results[0]["execute_sql"]["results"]["data"].clear()
+    result = await executor.run(sql="SELECT n FROM t", project_id="project")
+    assert result["execute_sql"]["results"]["data"] == [[1]]
+
+
+@pytest.mark.asyncio
+async def test_failed_queries_are_not_cached():
+    engine = FakeEngine(success=False)
+    executor = SQLExecutor(engine=engine, result_cache=QueryResultCache())
+
+    await executor.run(sql="SELECT n FROM t")
+    await executor.run(sql="SELECT n FROM t")
+
+    assert len(engine.calls) == 2
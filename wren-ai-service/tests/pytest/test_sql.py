@@ -0,0 +1,57 @@
+import pytest
+import sqlglot
+
+from src.core.sql import SQLParseCache, normalize_sql
+
+
+def test_normalize_sql():
+    assert (
+        normalize_sql("SELECT  *\n  FROM \"my  table\"\tWHERE a = 'x  y' ;")
+        == "SELECT * FROM \"my  table\" WHERE a = 'x  y'"
+    )
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "select o.a, count(*) c from orders o where o.b = 'q' group by 1",
+        "SELECT 1; SELECT 2",
+        "",
+    ],
+)
+def test_quote_is_transpile(sql):
+    cache = SQLParseCache()
+
+    assert cache.quote(sql) == sqlglot.transpile(sql, read="trino", identify=True)[0]
+    assert cache.quote(sql) == cache.quote(cache.quote(sql))
+
+
+def test_parsed_expressions_are_copied_and_bounded():
+    cache = SQLParseCache(max_size=2)
+
+    expression = cache.parse("SELECT a FROM t")
+    expression.set("expressions", [])
+    assert cache.parse("SELECT a FROM t").sql() == "SELECT a FROM t"
+
+    cache.parse("SELECT b FROM t")
+    cache.parse("SELECT c FROM t")
+    assert len(cache) == 2
+
+
+def test_parse_errors_are_raised_again():
+    cache = SQLParseCache()
+
+    for _ in range(2):
+        with pytest.raises(sqlglot.errors.ParseError):
+            cache.quote("SELECT (a FROM t")
+
+
+def test_fingerprint():
+    cache = SQLParseCache()
+    fingerprint = cache.fingerprint("SELECT a FROM t WHERE b = 1")
+
+    assert cache.fingerprint('select "a"  from "t" where "b" = 1;') == fingerprint
+    assert cache.fingerprint("SELECT a FROM t WHERE b = 2") != fingerprint
+    assert cache.fingerprint("SELECT (a FROM t") == cache.fingerprint(
+        "SELECT  (a FROM t;"
+    )
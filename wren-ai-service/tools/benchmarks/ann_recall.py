@@ -0,0 +1,225 @@
+"""
+ANN recall/latency harness for the Qdrant vector index settings.
+
+Copies the points of a collection into one temporary collection per configuration,
+replays the queries against each of them and reports recall@k against the exact
+(brute force) results together with the search latency. The configurations use the
+same schema as the `collections` settings of the qdrant document store in
+config.yaml, e.g.
+
+    global_hnsw:
+      hnsw: {m: 16, payload_m: 16, ef_construct: 100}
+      quantization: {type: scalar, quantile: 0.99}
+      search: {hnsw_ef: 128, oversampling: 2.0}
+
+The queries are a JSON lines file of recorded query embeddings, one
+{"embedding": [...], "project_id": "..."} per line, where project_id is optional;
+without it, stored vectors are sampled as queries.
+
+Usage:
+    poetry run python -m tools.benchmarks.ann_recall --url http://localhost:6333 \\
+        --collection Document --configs configs.yaml --queries queries.jsonl
+"""
+
+import argparse
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import orjson
+import yaml
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as rest
+
+from src.providers.document_store.qdrant import (
+    build_quantization_config,
+    build_search_params,
+)
+
+DEFAULT_CONFIGS = {
+    "payload_only": {"hnsw": {"m": 0, "payload_m": 16}},
+    "global_hnsw": {"hnsw": {"m": 16, "payload_m": 16}},
+    "global_hnsw_scalar": {
+        "hnsw": {"m": 16, "payload_m": 16},
+        "quantization": {"type": "scalar", "quantile": 0.99},
+    },
+    "global_hnsw_binary": {
+        "hnsw": {"m": 16, "payload_m": 16},
+        "quantization": {"type": "binary"},
+    },
+    "global_hnsw_product": {
+        "hnsw": {"m": 16, "payload_m": 16},
+        "quantization": {"type": "product", "compression": "x16"},
+    },
+}
+
+
+def load_points(
+    client: QdrantClient, collection: str, limit: Optional[int]
+) -> List[rest.Record]:
+    points, offset = [], None
+    while True:
+        batch, offset = client.scroll(
+            collection_name=collection,
+            offset=offset,
+            limit=1000,
+            with_payload=["project_id"],
+            with_vectors=True,
+        )
+        points.extend(batch)
+        if offset is None or (limit and len(points) >= limit):
+            return points[:limit] if limit else points
+
+
+def load_queries(
+    path: Optional[str], points: List[rest.Record], sample: int, seed: int
+) -> List[Dict[str, Any]]:
+    if path:
+        with open(path, "rb") as file:
+            return [orjson.loads(line) for line in file if line.strip()]
+
+    return [
+        {"embedding": point.vector, "project_id": point.payload.get("project_id")}
+        for point in random.Random(seed).sample(points, min(sample, len(points)))
+    ]
+
+
+def exact_top_k(
+    vectors: np.ndarray,
+    project_ids: np.ndarray,
+    query: Dict[str, Any],
+    top_k: int,
+) -> set:
+    embedding = np.asarray(query["embedding"], dtype=np.float32)
+    scores = vectors @ (embedding / np.linalg.norm(embedding))
+    if query.get("project_id"):
+        scores = np.where(project_ids == query["project_id"], scores, -np.inf)
+    candidates = np.argpartition(-scores, min(top_k, len(scores) - 1))[:top_k]
+    return {int(i) for i in candidates if np.isfinite(scores[i])}
+
+
+def _query_filter(query: Dict[str, Any]) -> Optional[rest.Filter]:
+    if not query.get("project_id"):
+        return None
+    return rest.Filter(
+        must=[
+            rest.FieldCondition(
+                key="project_id", match=rest.MatchValue(value=query["project_id"])
+            )
+        ]
+    )
+
+
+def benchmark(
+    client: QdrantClient,
+    points: List[rest.Record],
+    queries: List[Dict[str, Any]],
+    truths: List[set],
+    name: str,
+    config: Dict[str, Any],
+    top_k: int,
+) -> Dict[str, Any]:
+    dim = len(points[0].vector)
+    collection = f"ann_recall_{name}_{uuid.uuid4().hex[:8]}"
+    quantization_config = build_quantization_config(config.get("quantization"), dim)
+
+    client.create_collection(
+        collection_name=collection,
+        vectors_config=rest.VectorParams(
+            size=dim,
+            distance=rest.Distance.COSINE,
+            on_disk=config.get("on_disk", True),
+        ),
+        hnsw_config=rest.HnswConfigDiff(**config.get("hnsw", {})),
+        quantization_config=quantization_config,
+    )
+    try:
+        client.create_payload_index(
+            collection_name=collection, field_name="project_id", field_schema="keyword"
+        )
+        # the point ids are the positions in `points`, to compare with the exact results
+        client.upload_points(
+            collection_name=collection,
+            points=[
+                rest.PointStruct(id=i, vector=point.vector, payload=point.payload)
+                for i, point in enumerate(points)
+            ],
+            wait=True,
+        )
+        while client.get_collection(collection).status != rest.CollectionStatus.GREEN:
+            time.sleep(0.5)
+
+        search_params = build_search_params(
+            config.get("search"), quantized=quantization_config is not None
+        )
+        latencies, recalls = [], []
+        for query, truth in zip(queries, truths):
+            start = time.perf_counter()
+            results = client.search(
+                collection_name=collection,
+                query_vector=query["embedding"],
+                query_filter=_query_filter(query),
+                search_params=search_params,
+                limit=top_k,
+            )
+            latencies.append(time.perf_counter() - start)
+            if truth:
+                recalls.append(
+                    len({point.id for point in results} & truth) / len(truth)
+                )
+    finally:
+        client.delete_collection(collection)
+
+    return {
+        "name": name,
+        "recall": float(np.mean(recalls)) if recalls else float("nan"),
+        "p50": float(np.percentile(latencies, 50)) * 1000,
+        "p95": float(np.percentile(latencies, 95)) * 1000,
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    client = QdrantClient(url=args.url, timeout=120)
+    configs = DEFAULT_CONFIGS
+    if args.configs:
+        with open(args.configs) as file:
+            configs = yaml.safe_load(file)
+
+    points = load_points(client, args.collection, args.max_points)
+    if not points:
+        raise ValueError(f"Collection {args.collection} has no points")
+    queries = load_queries(args.queries, points, args.sample, args.seed)
+
+    vectors = np.asarray([point.vector for point in points], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    project_ids = np.asarray(
+        [point.payload.get("project_id") or "" for point in points], dtype=object
+    )
+    truths = [exact_top_k(vectors, project_ids, query, args.top_k) for query in queries]
+
+    print(
+        f"{len(points)} points, {len(queries)} queries, dimension {vectors.shape[1]}\n"
+    )
+    print(f"{'config':<24} {f'recall@{args.top_k}':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, config in configs.items():
+        result = benchmark(client, points, queries, truths, name, config, args.top_k)
+        print(
+            f"{result['name']:<24} {result['recall']:>10.4f} "
+            f"{result['p50']:>8.2f} {result['p95']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:6333")
+    parser.add_argument("--collection", default="Document")
+    parser.add_argument("--configs", help="YAML file of the configurations to compare")
+    parser.add_argument("--queries", help="JSON lines file of recorded queries")
+    parser.add_argument("--sample", type=int, default=200)
+    parser.add_argument("--max-points", type=int, default=None)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+
+    main(parser.parse_args())
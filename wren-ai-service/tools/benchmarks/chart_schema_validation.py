@@ -0,0 +1,85 @@
+"""
+Timing report for the validation of the chart schemas against the Vega-Lite schema.
+
+Compares `jsonschema.validate`, which checks the Vega-Lite schema and builds a validator
+on every call, as the chart post-processor did, with `ChartSchemaValidator`, compiled
+once, on a chart schema which is an instance of its chart model, which skips the
+Vega-Lite schema, and on one which isn't. The compiled validator is generated by
+fastjsonschema when it is installed.
+
+Usage:
+    poetry run python -m tools.benchmarks.chart_schema_validation --repeat 20
+"""
+
+import argparse
+import copy
+import time
+from typing import Any, Callable, Dict
+
+import jsonschema
+import orjson
+
+from src.pipelines.generation.utils.chart import (
+    VEGA_LITE_SCHEMA_PATH,
+    ChartSchemaValidator,
+)
+
+CHART_SCHEMA = {
+    "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+    "title": "Monthly sales by region",
+    "mark": {"type": "line"},
+    "encoding": {
+        "x": {
+            "field": "month",
+            "type": "temporal",
+            "timeUnit": "yearmonth",
+            "title": "Month",
+        },
+        "y": {"field": "sales", "type": "quantitative", "title": "Sales"},
+        "color": {"field": "region", "type": "nominal", "title": "Region"},
+    },
+    "data": {
+        "values": [
+            {"month": f"2024-{month:02d}-01", "sales": month * 10, "region": region}
+            for month in range(1, 13)
+            for region in ("north", "south")
+        ][:15]
+    },
+}
+
+
+def timeit(fn: Callable[[], Any], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(args: argparse.Namespace) -> None:
+    with open(VEGA_LITE_SCHEMA_PATH, "r") as f:
+        vega_schema: Dict[str, Any] = orjson.loads(f.read())
+
+    start = time.perf_counter()
+    validator = ChartSchemaValidator(vega_schema)
+    print(f"compile: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    # a valid chart schema which isn't an instance of the line chart model
+    other = copy.deepcopy(CHART_SCHEMA)
+    other["width"] = 400
+
+    for name, fn in [
+        (
+            "jsonschema.validate",
+            lambda: jsonschema.validate(CHART_SCHEMA, schema=vega_schema),
+        ),
+        ("compiled, chart model", lambda: validator.validate(CHART_SCHEMA, "line")),
+        ("compiled, vega-lite schema", lambda: validator.validate(other, "line")),
+    ]:
+        print(f"{name:>28}: {timeit(fn, args.repeat) * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=20)
+
+    main(parser.parse_args())
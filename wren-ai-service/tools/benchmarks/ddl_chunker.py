@@ -0,0 +1,91 @@
+"""
+Benchmark of the DDL chunking of the db schema indexing pipeline.
+
+Chunks synthetic MDLs of growing size, with about 2.5 relationships per model, and
+reports the time per model. The time per model should stay roughly flat as the MDL
+grows, since the relationships are looked up by model instead of being scanned for
+every model.
+
+Usage:
+    poetry run python -m tools.benchmarks.ddl_chunker --sizes 100 200 400 800
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from src.pipelines.indexing import ParsedMDL
+from src.pipelines.indexing.db_schema import DDLChunker
+
+
+def synthetic_mdl(models: int, columns: int = 20, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    names = [f"model_{i}" for i in range(models)]
+
+    relationships = []
+    for i in range(int(models * 2.5)):
+        source, target = rng.sample(names, 2)
+        relationships.append(
+            {
+                "name": f"relationship_{i}",
+                "models": [source, target],
+                "joinType": rng.choice(["MANY_TO_ONE", "ONE_TO_MANY", "ONE_TO_ONE"]),
+                "condition": f"{source}.column_1 = {target}.column_0",
+            }
+        )
+
+    return {
+        "models": [
+            {
+                "name": name,
+                "primaryKey": "column_0",
+                "properties": {"description": f"synthetic table {name}"},
+                "columns": [
+                    {
+                        "name": f"column_{j}",
+                        "type": "INTEGER",
+                        "properties": {"description": f"column {j}"},
+                    }
+                    for j in range(columns)
+                ],
+            }
+            for name in names
+        ],
+        "relationships": relationships,
+        "views": [],
+        "metrics": [],
+    }
+
+
+async def _measure(chunker: DDLChunker, mdl: dict, repeat: int) -> tuple[float, int]:
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        documents = await chunker.run(ParsedMDL.parse(dict(mdl)), column_batch_size=50)
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed), len(documents["documents"])
+
+
+async def main(sizes: list[int], repeat: int) -> None:
+    chunker = DDLChunker()
+
+    print(
+        f"{'models':>8} {'relationships':>14} {'documents':>10} {'ms':>10} {'ms/model':>10}"
+    )
+    for size in sizes:
+        mdl = synthetic_mdl(size)
+        elapsed, documents = await _measure(chunker, mdl, repeat)
+        print(
+            f"{size:>8} {len(mdl['relationships']):>14} {documents:>10} "
+            f"{elapsed * 1000:>10.1f} {elapsed * 1000 / size:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 200, 400, 800])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.sizes, args.repeat))
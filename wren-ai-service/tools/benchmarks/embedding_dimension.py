@@ -0,0 +1,115 @@
+"""
+Recall/size report for truncated and quantized embeddings.
+
+Loads the points of a collection, which were indexed with the full embedding model
+dimension, and replays the queries with the embeddings truncated to each target
+dimension (see `truncate_embeddings`) and stored as float32, float16 or int8. The
+recall@k is measured against the exact results of the full float32 embeddings, next to
+the bytes per vector, so a `target_dimension` and `datatype` can be picked for the
+embedder and the collections.
+
+The queries are a JSON lines file of recorded query embeddings of the eval set, one
+{"embedding": [...], "project_id": "..."} per line, where project_id is optional;
+without it, stored vectors are sampled as queries.
+
+Usage:
+    poetry run python -m tools.benchmarks.embedding_dimension --url http://localhost:6333 \\
+        --collection Document --queries queries.jsonl --dimensions 3072,1536,1024,512,256
+"""
+
+import argparse
+from typing import Dict, List
+
+import numpy as np
+from qdrant_client import QdrantClient
+
+from src.providers.embedder.litellm import truncate_embeddings
+from tools.benchmarks.ann_recall import exact_top_k, load_points, load_queries
+
+DATATYPES = ["float32", "float16", "int8"]
+
+
+def store(vectors: np.ndarray, datatype: str) -> np.ndarray:
+    """
+    The vectors as they are compared after being stored with the datatype.
+    """
+    if datatype == "float16":
+        return vectors.astype(np.float16).astype(np.float32)
+    if datatype == "int8":
+        return np.round(vectors * 127).astype(np.int8).astype(np.float32) / 127
+    return vectors
+
+
+def recall(
+    vectors: np.ndarray,
+    project_ids: np.ndarray,
+    queries: List[Dict],
+    truths: List[set],
+    top_k: int,
+) -> float:
+    recalls = [
+        len(exact_top_k(vectors, project_ids, query, top_k) & truth) / len(truth)
+        for query, truth in zip(queries, truths)
+        if truth
+    ]
+    return float(np.mean(recalls)) if recalls else float("nan")
+
+
+def main(args: argparse.Namespace) -> None:
+    client = QdrantClient(url=args.url, timeout=120)
+    points = load_points(client, args.collection, args.max_points)
+    if not points:
+        raise ValueError(f"Collection {args.collection} has no points")
+    queries = load_queries(args.queries, points, args.sample, args.seed)
+
+    embeddings = [point.vector for point in points]
+    project_ids = np.asarray(
+        [point.payload.get("project_id") or "" for point in points], dtype=object
+    )
+    full = np.asarray(truncate_embeddings(embeddings, len(embeddings[0])))
+    truths = [exact_top_k(full, project_ids, query, args.top_k) for query in queries]
+
+    dimensions = [int(dimension) for dimension in args.dimensions.split(",")]
+    print(f"{len(points)} points, {len(queries)} queries, dimension {full.shape[1]}\n")
+    print(
+        f"{'dimension':>9} {'datatype':>8} {f'recall@{args.top_k}':>10} "
+        f"{'bytes/vector':>12} {'total MB':>9}"
+    )
+    for dimension in dimensions:
+        if dimension > full.shape[1]:
+            continue
+        vectors = np.asarray(truncate_embeddings(embeddings, dimension))
+        truncated_queries = [
+            {
+                **query,
+                "embedding": truncate_embeddings([query["embedding"]], dimension)[0],
+            }
+            for query in queries
+        ]
+        for datatype in DATATYPES:
+            size = dimension * np.dtype(datatype).itemsize
+            result = recall(
+                store(vectors, datatype),
+                project_ids,
+                truncated_queries,
+                truths,
+                args.top_k,
+            )
+            print(
+                f"{dimension:>9} {datatype:>8} {result:>10.4f} "
+                f"{size:>12} {size * len(points) / 2**20:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:6333")
+    parser.add_argument("--collection", default="Document")
+    parser.add_argument("--queries", help="JSON lines file of recorded queries")
+    parser.add_argument("--dimensions", default="3072,1536,1024,768,512,256")
+    parser.add_argument("--sample", type=int, default=200)
+    parser.add_argument("--max-points", type=int, default=None)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+
+    main(parser.parse_args())
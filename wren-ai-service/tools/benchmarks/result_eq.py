@@ -0,0 +1,128 @@
+"""
+Timing report for the comparison of the result sets in the spider execution accuracy.
+
+Compares `result_eq`, which matches the columns by their values and only permutes the
+columns with the same values, with the previous search over the column permutations
+on synthetic result sets: equal ones with shuffled rows and columns, and ones with a
+single changed value. Both must agree on every case.
+
+Usage:
+    poetry run python -m tools.benchmarks.result_eq --rows 200 --columns 2,4,6,8
+"""
+
+import argparse
+import random
+import time
+from itertools import product
+from typing import Callable, List, Set, Tuple
+
+from eval.metrics.spider import multiset_eq, permute_tuple, quick_rej, result_eq
+
+
+def previous_result_eq(
+    result1: List[Tuple], result2: List[Tuple], order_matters: bool
+) -> bool:
+    """
+    The previous implementation of `result_eq`, which enumerates the column
+    permutations constrained by the values of 20 sampled rows.
+    """
+    if len(result1) == 0 and len(result2) == 0:
+        return True
+    if len(result1) != len(result2) or len(result2[0]) != len(result1[0]):
+        return False
+    if not quick_rej(result1, result2, order_matters):
+        return False
+
+    num_cols = len(result1[0])
+    tab1_sets_by_columns: List[Set] = [
+        {row[i] for row in result1} for i in range(num_cols)
+    ]
+    perm_constraints = [set(range(num_cols)) for _ in range(num_cols)]
+    if num_cols > 3:
+        for _ in range(20):
+            random_tab2_row = random.choice(result2)
+            for tab1_col in range(num_cols):
+                for tab2_col in set(perm_constraints[tab1_col]):
+                    if random_tab2_row[tab2_col] not in tab1_sets_by_columns[tab1_col]:
+                        perm_constraints[tab1_col].remove(tab2_col)
+
+    for perm in product(*perm_constraints):
+        if len(perm) != len(set(perm)):
+            continue
+        result2_perm = [permute_tuple(element, perm) for element in result2]
+        if order_matters:
+            if result1 == result2_perm:
+                return True
+        elif set(result1) == set(result2_perm) and multiset_eq(result1, result2_perm):
+            return True
+    return False
+
+
+def make_case(
+    rng: random.Random, rows: int, columns: int, distinct: int, equal: bool
+) -> Tuple[List[Tuple], List[Tuple]]:
+    result1 = [
+        tuple(rng.randrange(distinct) for _ in range(columns)) for _ in range(rows)
+    ]
+    perm = rng.sample(range(columns), columns)
+    result2 = rng.sample([permute_tuple(row, perm) for row in result1], rows)
+    if not equal:
+        row, col = rng.randrange(rows), rng.randrange(columns)
+        result2[row] = (
+            result2[row][:col]
+            + (result2[row][col] + distinct,)
+            + result2[row][col + 1 :]
+        )
+    return result1, result2
+
+
+def measure(
+    function: Callable, cases: List[Tuple[List[Tuple], List[Tuple]]]
+) -> Tuple[float, List[bool]]:
+    start = time.perf_counter()
+    results = [function(result1, result2, False) for result1, result2 in cases]
+    return time.perf_counter() - start, results
+
+
+def main(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+
+    print(
+        f"{'columns':>7} {'distinct':>8} {'previous ms':>11} {'result_eq ms':>12} "
+        f"{'speedup':>7}"
+    )
+    for columns, distinct in product(
+        [int(column) for column in args.columns.split(",")],
+        [int(distinct) for distinct in args.distinct.split(",")],
+    ):
+        cases = [
+            make_case(rng, args.rows, columns, distinct, equal=i % 2 == 0)
+            for i in range(args.cases)
+        ]
+        previous, expected = measure(previous_result_eq, cases)
+        current, results = measure(result_eq, cases)
+        if results != expected:
+            raise AssertionError(
+                f"result_eq disagrees with the previous implementation for "
+                f"{columns} columns of {distinct} distinct values"
+            )
+        print(
+            f"{columns:>7} {distinct:>8} {previous * 1000 / args.cases:>11.2f} "
+            f"{current * 1000 / args.cases:>12.2f} {previous / current:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--columns", default="2,4,6,8")
+    parser.add_argument(
+        "--distinct",
+        default="2,1000",
+        help="Number of distinct values per column; few values make ambiguous columns",
+    )
+    parser.add_argument("--cases", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+
+    main(parser.parse_args())
@@ -0,0 +1,102 @@
+"""
+Latency/tokens report of the SQL data sent to the SQL answer prompt.
+
+Runs the SQL data preprocessing of `PreprocessSqlData` on synthetic results of
+increasing size, once with the raw rows only trimmed to the context window, as before
+the column profiles, and once summarized into column profiles and a sample of rows,
+see `summarize_sql_data`. The tokens of the summarized data grow with the number of
+columns rather than the number of rows.
+
+Usage:
+    poetry run python -m tools.benchmarks.sql_answer_summary --rows 50,500,5000 \\
+        --columns 4,16 --context-window-size 128000
+"""
+
+import argparse
+import copy
+import random
+import time
+from itertools import product
+from typing import Any, Dict
+
+import tiktoken
+
+from src.pipelines.retrieval.preprocess_sql_data import preprocess, summarize
+
+
+def make_sql_data(rng: random.Random, rows: int, columns: int) -> Dict[str, Any]:
+    kinds = ["int", "float", "category", "text"]
+    names = [f"{kinds[i % len(kinds)]}_{i}" for i in range(columns)]
+
+    def value(kind: str, row: int) -> Any:
+        if rng.random() < 0.05:
+            return None
+        if kind == "int":
+            return rng.randrange(10_000)
+        if kind == "float":
+            return round(rng.gauss(1_000, 250), 2)
+        if kind == "category":
+            return rng.choice(["north", "south", "east", "west", "central"])
+        return f"customer {row} {rng.randrange(10**6)}"
+
+    return {
+        "columns": [{"name": name, "type": "VARCHAR"} for name in names],
+        "data": [
+            [value(name.split("_")[0], row) for name in names] for row in range(rows)
+        ],
+    }
+
+
+def run(
+    sql_data: Dict[str, Any],
+    encoding: tiktoken.Encoding,
+    context_window_size: int,
+    summary_row_threshold: int | None,
+) -> Dict[str, Any]:
+    start = time.perf_counter()
+    result = preprocess(
+        summarize(
+            copy.deepcopy(sql_data),
+            summary_row_threshold=summary_row_threshold,
+            summary_sample_size=10,
+        ),
+        encoding,
+        context_window_size,
+    )
+    return {**result, "seconds": time.perf_counter() - start}
+
+
+def main(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    encoding = tiktoken.get_encoding(args.encoding)
+
+    print(
+        f"{'rows':>6} {'columns':>7} {'raw tokens':>10} {'raw rows':>8} {'raw ms':>8} "
+        f"{'summary tokens':>14} {'summary ms':>10}"
+    )
+    for rows, columns in product(
+        [int(rows) for rows in args.rows.split(",")],
+        [int(columns) for columns in args.columns.split(",")],
+    ):
+        sql_data = make_sql_data(rng, rows, columns)
+        raw = run(sql_data, encoding, args.context_window_size, None)
+        summary = run(
+            sql_data, encoding, args.context_window_size, args.summary_row_threshold
+        )
+        print(
+            f"{rows:>6} {columns:>7} {raw['tokens']:>10} "
+            f"{raw['num_rows_used_in_llm']:>8} {raw['seconds'] * 1000:>8.1f} "
+            f"{summary['tokens']:>14} {summary['seconds'] * 1000:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", default="50,500,5000")
+    parser.add_argument("--columns", default="4,16")
+    parser.add_argument("--context-window-size", type=int, default=128_000)
+    parser.add_argument("--summary-row-threshold", type=int, default=50)
+    parser.add_argument("--encoding", default="o200k_base")
+    parser.add_argument("--seed", type=int, default=0)
+
+    main(parser.parse_args())
@@ -0,0 +1,131 @@
+"""
+Latency report of the SQL correction of failing SQLs with concurrent candidates.
+
+Runs the `SQLCorrection` pipeline in the retry loop of the ask service on simulated
+failing cases: every correction takes a lognormal LLM latency and a fixed dry run
+latency, and is valid with a fixed probability. Compares one candidate per retry,
+the previous behavior, with several concurrent candidates per retry, and reports the
+p50/p95 time to a valid SQL, infinite for the cases which aren't corrected within the
+retries, the p95 of the corrected cases, the share of corrected cases and the number
+of LLM calls per case, counting the cancelled ones.
+
+Usage:
+    poetry run python -m tools.benchmarks.sql_correction_candidates \\
+        --candidates 1,2,3 --success-rate 0.4 --cases 200
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Dict, List
+
+import orjson
+
+from src.pipelines.generation.sql_correction import SQLCorrection
+from src.providers.mock import LatencyModel
+
+
+class SimulatedLLMProvider:
+    def __init__(self, args: argparse.Namespace, rng: random.Random):
+        self._latency = LatencyModel(
+            distribution="lognormal",
+            mean=args.llm_latency * args.time_scale,
+            stddev=args.llm_latency_stddev * args.time_scale,
+        )
+        self._success_rate = args.success_rate
+        self._rng = rng
+        self.calls = 0
+
+    def get_generator(self, **kwargs):
+        async def generator(prompt: str, **kwargs) -> Dict[str, Any]:
+            self.calls += 1
+            valid = self._rng.random() < self._success_rate
+            await self._latency.wait(self._rng)
+            sql = "SELECT valid" if valid else "SELECT invalid"
+            return {"replies": [orjson.dumps({"sql": sql}).decode()], "meta": []}
+
+        return generator
+
+    def get_model(self) -> str:
+        return "simulated"
+
+
+class SimulatedEngine:
+    def __init__(self, latency: float):
+        self._latency = latency
+
+    async def execute_sql(self, sql: str, session: Any, **kwargs):
+        await asyncio.sleep(self._latency)
+        if "invalid" in sql:
+            return False, None, {"error_message": "Column 'x' cannot be resolved"}
+        return True, None, {"correlation_id": ""}
+
+
+async def correct(pipeline: SQLCorrection, retries: int) -> bool:
+    invalid_generation_result = {"sql": "SELECT x", "error": "error", "type": "DRY_RUN"}
+    for _ in range(retries):
+        result = (
+            await pipeline.run(
+                contexts=[], invalid_generation_result=invalid_generation_result
+            )
+        )["post_process"]
+        if result["valid_generation_result"]:
+            return True
+        invalid_generation_result = result["invalid_generation_result"]
+    return False
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)] if values else 0.0
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(
+        f"{'candidates':>10} {'corrected':>9} {'p50 s':>7} {'p95 s':>7} "
+        f"{'p95 corrected s':>17} {'llm calls':>9}"
+    )
+    for candidates in [int(candidates) for candidates in args.candidates.split(",")]:
+        rng = random.Random(args.seed)
+        llm_provider = SimulatedLLMProvider(args, rng)
+        pipeline = SQLCorrection(
+            llm_provider=llm_provider,
+            engine=SimulatedEngine(args.engine_latency * args.time_scale),
+            candidates=candidates,
+        )
+
+        # the cases which aren't corrected within the retries never get a valid SQL
+        durations = []
+        for _ in range(args.cases):
+            start = time.perf_counter()
+            corrected = await correct(pipeline, args.retries)
+            durations.append(
+                (time.perf_counter() - start) / args.time_scale
+                if corrected
+                else float("inf")
+            )
+        corrected = [duration for duration in durations if duration != float("inf")]
+
+        print(
+            f"{candidates:>10} {len(corrected) / args.cases:>9.1%} "
+            f"{percentile(durations, 0.5):>7.2f} {percentile(durations, 0.95):>7.2f} "
+            f"{percentile(corrected, 0.95):>17.2f} "
+            f"{llm_provider.calls / args.cases:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--candidates", default="1,2,3")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--success-rate", type=float, default=0.4)
+    parser.add_argument("--llm-latency", type=float, default=3.0)
+    parser.add_argument("--llm-latency-stddev", type=float, default=1.5)
+    parser.add_argument("--engine-latency", type=float, default=0.3)
+    parser.add_argument("--cases", type=int, default=200)
+    # the simulated latencies are scaled down, the reported ones are scaled back
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+
+    asyncio.run(main(parser.parse_args()))
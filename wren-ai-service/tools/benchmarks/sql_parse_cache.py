@@ -0,0 +1,70 @@
+"""
+Timing report for the memoized sqlglot parsing of the SQLs, see `SQLParseCache`.
+
+Quotes synthetic SQLs of increasing size with `sqlglot.transpile`, as `add_quotes`
+did, and with the cache, once on a miss and then on the repeated SQL, as for the
+corrections and the SQL keyed caches; then parses the quoted SQL for the SQL
+validator, which copies the cached expression.
+
+Usage:
+    poetry run python -m tools.benchmarks.sql_parse_cache --columns 10,100,500
+"""
+
+import argparse
+import time
+from typing import Any, Callable
+
+import sqlglot
+
+from src.core.sql import SQLParseCache
+
+
+def make_sql(columns: int) -> str:
+    return (
+        "WITH a AS (SELECT "
+        + ", ".join(f"col{i}" for i in range(columns))
+        + " FROM t WHERE "
+        + " AND ".join(f"col{i} > {i}" for i in range(columns // 2 or 1))
+        + ") SELECT a.*, b.name FROM a JOIN b ON a.col0 = b.id ORDER BY a.col0"
+    )
+
+
+def timeit(fn: Callable[[], Any], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(args: argparse.Namespace) -> None:
+    print(
+        f"{'columns':>7} {'transpile ms':>12} {'miss ms':>8} {'hit ms':>8} "
+        f"{'parse hit ms':>12}"
+    )
+    for columns in [int(columns) for columns in args.columns.split(",")]:
+        sql = make_sql(columns)
+        transpile = timeit(
+            lambda: sqlglot.transpile(sql, read="trino", identify=True)[0],
+            args.repeat,
+        )
+
+        cache = SQLParseCache()
+        start = time.perf_counter()
+        quoted_sql = cache.quote(sql)
+        miss = time.perf_counter() - start
+        hit = timeit(lambda: cache.quote(sql), args.repeat)
+        cache.parse(quoted_sql)
+        parse_hit = timeit(lambda: cache.parse(quoted_sql), args.repeat)
+
+        print(
+            f"{columns:>7} {transpile * 1000:>12.2f} {miss * 1000:>8.2f} "
+            f"{hit * 1000:>8.4f} {parse_hit * 1000:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--columns", default="10,100,500")
+    parser.add_argument("--repeat", type=int, default=20)
+
+    main(parser.parse_args())
@@ -0,0 +1,185 @@
+"""
+Report of the generated SQLs which `SQLValidator` rejects before the engine dry run.
+
+Injects synthetic faults into gold SQLs over an MDL: a misspelled column, an unknown
+table and an unqualified column of two joined tables, which the validator should
+catch, and an unknown function and a type mismatch, which only the engine can catch.
+Reports the share of each kind of fault which is caught, the gold SQLs which are
+wrongly rejected, and the validation latency.
+
+In production, the share of the failed generated SQLs which are caught is
+rejected / (rejected + dry_run) of the `wren_ai_sql_validations_total` counter.
+
+Usage:
+    poetry run python -m tools.benchmarks.sql_prevalidation \\
+        --dataset eval/dataset/spider_car_1_eval_dataset.toml
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+import orjson
+import sqlglot
+import toml
+from sqlglot import exp
+
+from src.core.engine import add_quotes
+from src.pipelines.generation.utils.sql import SQLValidator, mdl_sql_schema
+
+GOLD_SQLS = [
+    "SELECT Title, Writer FROM book WHERE Issues > 10",
+    "SELECT Writer, COUNT(*) AS books FROM book GROUP BY Writer ORDER BY books DESC",
+    "SELECT b.Title, p.Publisher FROM book b JOIN publication p ON b.Book_ID = p.Book_ID",
+    "SELECT Publisher, AVG(Price) FROM publication GROUP BY Publisher",
+    "SELECT Title FROM book WHERE Book_ID NOT IN (SELECT Book_ID FROM publication)",
+    "WITH prices AS (SELECT Book_ID, MAX(Price) AS price FROM publication "
+    "GROUP BY Book_ID) SELECT b.Title, prices.price FROM book b "
+    "JOIN prices ON b.Book_ID = prices.Book_ID",
+]
+
+
+def misspelled_column(tree: exp.Expression, rng: random.Random) -> bool:
+    columns = [column for column in tree.find_all(exp.Column) if len(column.name) > 2]
+    if not columns:
+        return False
+    column = rng.choice(columns)
+    name = column.name
+    i = rng.randrange(len(name))
+    column.set("this", exp.to_identifier(name[:i] + name[i + 1 :]))
+    return True
+
+
+def unknown_table(tree: exp.Expression, rng: random.Random) -> bool:
+    tables = list(tree.find_all(exp.Table))
+    if not tables:
+        return False
+    table = rng.choice(tables)
+    table.set("this", exp.to_identifier(f"{table.name}_archive"))
+    return True
+
+
+def ambiguous_column(tree: exp.Expression, rng: random.Random) -> bool:
+    for join in tree.find_all(exp.Join):
+        select = join.parent_select
+        sources = {
+            column.table for column in select.find_all(exp.Column) if column.table
+        }
+        names: Dict[str, set] = {}
+        for column in select.find_all(exp.Column):
+            if column.table in sources:
+                names.setdefault(column.name.lower(), set()).add(column.table)
+        shared = [
+            column
+            for column in select.find_all(exp.Column)
+            if column.table in sources and len(names[column.name.lower()]) > 1
+        ]
+        if shared:
+            rng.choice(shared).set("table", None)
+            return True
+    return False
+
+
+def unknown_function(tree: exp.Expression, rng: random.Random) -> bool:
+    columns = list(tree.find_all(exp.Column))
+    if not columns:
+        return False
+    column = rng.choice(columns)
+    column.replace(exp.Anonymous(this="to_title_case", expressions=[column.copy()]))
+    return True
+
+
+def type_mismatch(tree: exp.Expression, rng: random.Random) -> bool:
+    columns = list(tree.find_all(exp.Column))
+    if not columns:
+        return False
+    column = rng.choice(columns)
+    column.replace(exp.Add(this=column.copy(), expression=exp.Literal.string("x")))
+    return True
+
+
+FAULTS: Dict[str, Callable[[exp.Expression, random.Random], bool]] = {
+    "misspelled column": misspelled_column,
+    "unknown table": unknown_table,
+    "ambiguous column": ambiguous_column,
+    "unknown function (engine only)": unknown_function,
+    "type mismatch (engine only)": type_mismatch,
+}
+
+
+def inject(sql: str, fault: str, rng: random.Random) -> Optional[str]:
+    tree = sqlglot.parse_one(sql, dialect="trino")
+    if not FAULTS[fault](tree, rng):
+        return None
+    return tree.sql(dialect="trino")
+
+
+def validate(validator: SQLValidator, sql: str) -> tuple[Optional[str], float]:
+    quoted_sql, error = add_quotes(sql)
+    if error:
+        return error, 0.0
+    start = time.perf_counter()
+    error = validator.validate(quoted_sql, "benchmark")
+    return error, time.perf_counter() - start
+
+
+def main(args: argparse.Namespace) -> None:
+    if args.dataset:
+        dataset = toml.load(args.dataset)
+        mdl = dataset["mdl"]
+        gold_sqls: List[str] = [element["sql"] for element in dataset["eval_dataset"]]
+    else:
+        with open(args.mdl, "rb") as f:
+            mdl = orjson.loads(f.read())
+        gold_sqls = GOLD_SQLS
+
+    validator = SQLValidator()
+    validator.set_mdl("benchmark", mdl)
+    views = [table for table, columns in mdl_sql_schema(mdl).items() if columns is None]
+    print(f"tables whose columns aren't checked: {', '.join(views) or '-'}\n")
+    rng = random.Random(args.seed)
+
+    latencies = []
+    rejected = []
+    for sql in gold_sqls:
+        error, seconds = validate(validator, sql)
+        latencies.append(seconds)
+        if error:
+            rejected.append((sql, error))
+
+    print(f"{'fault':>32} {'sqls':>5} {'caught':>7}")
+    for fault in FAULTS:
+        faulty_sqls = [
+            faulty_sql
+            for sql in gold_sqls
+            if (faulty_sql := inject(sql, fault, rng)) is not None
+        ]
+        caught = 0
+        for faulty_sql in faulty_sqls:
+            error, seconds = validate(validator, faulty_sql)
+            latencies.append(seconds)
+            caught += error is not None
+        share = caught / len(faulty_sqls) if faulty_sqls else 0.0
+        print(f"{fault:>32} {len(faulty_sqls):>5} {share:>7.1%}")
+
+    latencies.sort()
+    print(f"\nfalse positives: {len(rejected)} / {len(gold_sqls)} gold sqls")
+    for sql, error in rejected[: args.show]:
+        print(f"  {error}: {sql}")
+    print(
+        f"latency: p50 {latencies[len(latencies) // 2] * 1000:.2f}ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mdl", default="tests/data/book_2_mdl.json")
+    parser.add_argument(
+        "--dataset", help="evaluation dataset with an mdl and its gold sqls"
+    )
+    parser.add_argument("--show", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+
+    main(parser.parse_args())